@@ -0,0 +1,24 @@
+-- Recently viewed cards, one of the hot set sources of the daily import (scripts/hot_set.py).
+-- CardDetails inserts a row per visit; the import reads the last HOT_VIEW_DAYS days and
+-- scripts/price_retention.py deletes rows older than VIEW_RETENTION_DAYS.
+-- The "hot set fresh" marker lives in system_settings (key 'prices_hot_set_fresh', JSON value).
+
+create table if not exists public.card_views (
+  id bigint generated always as identity primary key,
+  card_id bigint not null,
+  user_id uuid default auth.uid() references auth.users on delete cascade,
+  viewed_at timestamp with time zone default now() not null
+);
+
+create index if not exists idx_card_views_viewed_at on public.card_views(viewed_at desc);
+
+alter table public.card_views enable row level security;
+
+drop policy if exists "Users can insert own card views" on public.card_views;
+create policy "Users can insert own card views"
+on public.card_views
+for insert
+with check (auth.uid() = user_id);
+
+grant all on public.card_views to service_role;
+grant insert on public.card_views to authenticated;
@@ -0,0 +1,68 @@
+-- Precomputed opportunities table (replaces reading all_opportunities_view on every page load)
+-- Populated by scripts/build_opportunities.py after each price import.
+-- The view joined all_cards to card_prices on mtgjson_uuid::text, which defeats index use
+-- and was recomputed for every visitor. The batch job does the join + math once and
+-- writes a ranked top-N here.
+
+CREATE TABLE IF NOT EXISTS public.opportunities (
+    id BIGINT PRIMARY KEY,              -- all_cards.id
+    name TEXT,
+    set_name TEXT,
+    set_code TEXT,
+    collector_number TEXT,
+    collector_number_normalized TEXT,
+    liga_magic_url TEXT,
+    mtgjson_uuid TEXT,
+    is_foil BOOLEAN DEFAULT FALSE,
+
+    -- Base prices (same column names as all_opportunities_view), all for the row's finish
+    ck_buylist_usd NUMERIC,
+    lm_sell_brl NUMERIC,
+    tcgplayer_market_usd NUMERIC,
+    cardmarket_avg_eur NUMERIC,
+
+    -- FX used for this run
+    usd_brl NUMERIC,
+    eur_brl NUMERIC,
+
+    -- Derived (BRL): buy at LigaMagic, sell to Card Kingdom buylist
+    revenue_brl NUMERIC,
+    cost_brl NUMERIC,
+    profit_brl NUMERIC,
+    roi NUMERIC,
+    ck_tcg_ratio NUMERIC,        -- CK buylist / TCGplayer market (both USD)
+    ck_cardmarket_ratio NUMERIC, -- CK buylist / Cardmarket avg (both in BRL)
+
+    rank INTEGER NOT NULL,
+    price_updated_at TIMESTAMP WITH TIME ZONE,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_opportunities_rank ON public.opportunities(rank);
+CREATE INDEX IF NOT EXISTS idx_opportunities_roi ON public.opportunities(roi DESC);
+CREATE INDEX IF NOT EXISTS idx_opportunities_computed_at ON public.opportunities(computed_at);
+
+GRANT ALL ON public.opportunities TO postgres;
+GRANT ALL ON public.opportunities TO service_role;
+GRANT SELECT ON public.opportunities TO anon;
+GRANT SELECT ON public.opportunities TO authenticated;
+
+-- Whole-ranking swap in one transaction: readers keep seeing the previous run until commit
+CREATE OR REPLACE FUNCTION public.replace_opportunities(p_rows JSON)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    -- DELETE, not TRUNCATE: no ACCESS EXCLUSIVE lock blocking the site's reads
+    DELETE FROM opportunities;
+    INSERT INTO opportunities
+    SELECT * FROM json_populate_recordset(NULL::opportunities, p_rows);
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.replace_opportunities(JSON) TO service_role;
@@ -0,0 +1,145 @@
+-- Price alerts for tracked cards, evaluated in bulk after each import
+-- scripts/price_alerts.py collects the card_ids whose price changed in the import
+-- and calls evaluate_price_alerts() once per chunk; only the watched ones among
+-- them are read from price_history (two rows each).
+
+-- 1. Thresholds (all optional). Prices are the source's raw currency (CK = USD).
+ALTER TABLE public.user_tracked_cards
+ADD COLUMN IF NOT EXISTS alert_above_usd NUMERIC,   -- buylist reached/crossed upward
+ADD COLUMN IF NOT EXISTS alert_below_usd NUMERIC,   -- buylist dropped/crossed downward
+ADD COLUMN IF NOT EXISTS alert_change_pct NUMERIC;  -- |day-over-day change| >= N %
+
+ALTER TABLE public.user_tracked_sets
+ADD COLUMN IF NOT EXISTS alert_change_pct NUMERIC;  -- applies to every card of the set
+
+-- 2. Triggered alerts
+CREATE TABLE IF NOT EXISTS public.price_alerts (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES auth.users ON DELETE CASCADE,
+    card_id BIGINT NOT NULL,
+    rule TEXT NOT NULL CHECK (rule IN ('above', 'below', 'change')),
+    source TEXT NOT NULL,
+    price_type TEXT NOT NULL,
+    previous_price NUMERIC,
+    current_price NUMERIC NOT NULL,
+    change_pct NUMERIC,
+    threshold NUMERIC,
+    scraped_at DATE NOT NULL,
+    seen BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    -- Re-running the same import must not duplicate alerts
+    UNIQUE (user_id, card_id, rule, source, price_type, scraped_at)
+);
+
+CREATE INDEX IF NOT EXISTS idx_price_alerts_user_unseen ON public.price_alerts(user_id, seen, created_at DESC);
+
+ALTER TABLE public.price_alerts ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own alerts" ON public.price_alerts;
+CREATE POLICY "Users can view own alerts"
+ON public.price_alerts
+FOR SELECT
+USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Users can update own alerts" ON public.price_alerts;
+CREATE POLICY "Users can update own alerts"
+ON public.price_alerts
+FOR UPDATE
+USING (auth.uid() = user_id);
+
+GRANT ALL ON public.price_alerts TO postgres, service_role;
+GRANT SELECT, UPDATE ON public.price_alerts TO authenticated;
+
+-- 3. Bulk evaluation for a set of changed cards
+CREATE OR REPLACE FUNCTION public.evaluate_price_alerts(
+    p_card_ids BIGINT[],
+    p_source TEXT DEFAULT 'CardKingdom',
+    p_price_type TEXT DEFAULT 'buy',
+    p_lookback_days INTEGER DEFAULT 90
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    -- Watchers first: only cards someone has a threshold on ever touch price_history
+    WITH watchers AS (
+        SELECT utc.user_id, utc.card_id, utc.alert_above_usd, utc.alert_below_usd, utc.alert_change_pct
+        FROM user_tracked_cards utc
+        WHERE utc.card_id = ANY(p_card_ids)
+          AND (utc.alert_above_usd IS NOT NULL OR utc.alert_below_usd IS NOT NULL OR utc.alert_change_pct IS NOT NULL)
+        UNION ALL
+        SELECT uts.user_id, c.id, NULL, NULL, uts.alert_change_pct
+        FROM user_tracked_sets uts
+        JOIN cards c ON c.set_code = uts.set_code
+        WHERE c.id = ANY(p_card_ids)
+          AND uts.alert_change_pct IS NOT NULL
+    ),
+    watched AS (
+        SELECT DISTINCT card_id FROM watchers
+    ),
+    -- Two newest points per watched card (index range on card_id, source, scraped_at)
+    last_two AS (
+        SELECT w.card_id, p.prices[1] AS price_raw, p.prices[2] AS previous_price, p.scraped_at
+        FROM watched w
+        CROSS JOIN LATERAL (
+            SELECT array_agg(x.price_raw ORDER BY x.scraped_at DESC) AS prices,
+                   MAX(x.scraped_at)::date AS scraped_at
+            FROM (
+                SELECT ph.price_raw, ph.scraped_at
+                FROM price_history ph
+                WHERE ph.card_id = w.card_id
+                  AND ph.source = p_source
+                  AND ph.price_type = p_price_type
+                  AND ph.scraped_at >= CURRENT_DATE - p_lookback_days
+                ORDER BY ph.scraped_at DESC
+                LIMIT 2
+            ) x
+        ) p
+        WHERE p.prices IS NOT NULL
+    ),
+    latest AS (
+        SELECT card_id, price_raw, previous_price, scraped_at,
+               CASE WHEN previous_price > 0
+                    THEN (price_raw - previous_price) / previous_price * 100 END AS change_pct
+        FROM last_two
+    ),
+    hits AS (
+        -- Crossing upward (not "still above" every day)
+        SELECT w.user_id, w.card_id, 'above' AS rule, w.alert_above_usd AS threshold,
+               l.price_raw, l.previous_price, l.change_pct, l.scraped_at
+        FROM watchers w JOIN latest l ON l.card_id = w.card_id
+        WHERE w.alert_above_usd IS NOT NULL
+          AND l.price_raw >= w.alert_above_usd
+          AND (l.previous_price IS NULL OR l.previous_price < w.alert_above_usd)
+        UNION ALL
+        SELECT w.user_id, w.card_id, 'below', w.alert_below_usd,
+               l.price_raw, l.previous_price, l.change_pct, l.scraped_at
+        FROM watchers w JOIN latest l ON l.card_id = w.card_id
+        WHERE w.alert_below_usd IS NOT NULL
+          AND l.price_raw <= w.alert_below_usd
+          AND (l.previous_price IS NULL OR l.previous_price > w.alert_below_usd)
+        UNION ALL
+        SELECT w.user_id, w.card_id, 'change', w.alert_change_pct,
+               l.price_raw, l.previous_price, l.change_pct, l.scraped_at
+        FROM watchers w JOIN latest l ON l.card_id = w.card_id
+        WHERE w.alert_change_pct IS NOT NULL
+          AND ABS(l.change_pct) >= w.alert_change_pct
+    )
+    INSERT INTO price_alerts (user_id, card_id, rule, source, price_type,
+                              previous_price, current_price, change_pct, threshold, scraped_at)
+    SELECT DISTINCT ON (user_id, card_id, rule)
+        user_id, card_id, rule, p_source, p_price_type,
+        previous_price, price_raw, change_pct, threshold, scraped_at
+    FROM hits
+    ORDER BY user_id, card_id, rule, threshold
+    ON CONFLICT (user_id, card_id, rule, source, price_type, scraped_at) DO NOTHING;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.evaluate_price_alerts(BIGINT[], TEXT, TEXT, INTEGER) TO service_role;
@@ -0,0 +1,97 @@
+-- Cheap health snapshot of price_history (scripts/price_health.py)
+-- Replaces count='exact' (a full scan) with:
+--   - planner estimate for the total
+--   - source/price_type pairs by a loose index scan (every writer's series shows up)
+--   - latest scraped_at per source/price_type through an index
+--   - rows per day from a small stats table the daily importer keeps up to date
+
+-- 1. Index for the distinct pairs, max(scraped_at) per source/price_type and per-day counts.
+--    On a partitioned price_history this cascades to every partition.
+CREATE INDEX IF NOT EXISTS idx_price_history_source_type_scraped
+    ON public.price_history(source, price_type, scraped_at);
+
+-- 2. Rows per source/price_type/day
+CREATE TABLE IF NOT EXISTS public.price_history_daily_stats (
+    source TEXT NOT NULL,
+    price_type TEXT NOT NULL,
+    day DATE NOT NULL,
+    rows INTEGER NOT NULL,
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (source, price_type, day)
+);
+
+GRANT ALL ON public.price_history_daily_stats TO postgres, service_role;
+
+-- Recount the given days (index-only range scans on the index above)
+CREATE OR REPLACE FUNCTION public.refresh_price_history_stats(p_days DATE[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    DELETE FROM price_history_daily_stats WHERE day = ANY(p_days);
+
+    INSERT INTO price_history_daily_stats (source, price_type, day, rows)
+    SELECT source, price_type, scraped_at::date, COUNT(*)
+    FROM price_history ph
+    JOIN unnest(p_days) AS d(day)
+      ON ph.scraped_at >= d.day AND ph.scraped_at < d.day + 1
+    GROUP BY 1, 2, 3;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+-- 3. Snapshot: {estimated_rows, stats_through, series: [{source, price_type, latest_scraped_at, recent_rows}]}
+CREATE OR REPLACE FUNCTION public.price_history_health(p_days INTEGER DEFAULT 7)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+SECURITY DEFINER SET search_path = public
+AS $$
+    -- SELECT DISTINCT would read the whole index: jump from one pair to the next instead
+    -- (one LIMIT 1 probe per pair on idx_price_history_source_type_scraped)
+    WITH RECURSIVE pairs AS (
+        (SELECT source, price_type FROM price_history ORDER BY source, price_type LIMIT 1)
+        UNION ALL
+        SELECT n.source, n.price_type
+        FROM pairs p
+        CROSS JOIN LATERAL (
+            SELECT ph.source, ph.price_type FROM price_history ph
+            WHERE (ph.source, ph.price_type) > (p.source, p.price_type)
+            ORDER BY ph.source, ph.price_type
+            LIMIT 1
+        ) n
+    )
+    SELECT json_build_object(
+        -- Partitioned parents have no tuples of their own: add up the partitions
+        'estimated_rows', (
+            SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::BIGINT
+            FROM pg_class c
+            WHERE c.oid = 'public.price_history'::regclass
+               OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'public.price_history'::regclass)
+        ),
+        'stats_through', (SELECT MAX(day) FROM price_history_daily_stats),
+        'series', COALESCE((
+            SELECT json_agg(json_build_object(
+                'source', p.source,
+                'price_type', p.price_type,
+                'latest_scraped_at', (
+                    SELECT MAX(ph.scraped_at) FROM price_history ph
+                    WHERE ph.source = p.source AND ph.price_type = p.price_type
+                ),
+                'recent_rows', (
+                    SELECT COALESCE(SUM(s.rows), 0) FROM price_history_daily_stats s
+                    WHERE s.source = p.source AND s.price_type = p.price_type
+                      AND s.day > CURRENT_DATE - p_days
+                )
+            ) ORDER BY p.source, p.price_type)
+            FROM pairs p
+        ), '[]'::json)
+    );
+$$;
+
+GRANT EXECUTE ON FUNCTION public.refresh_price_history_stats(DATE[]) TO service_role;
+GRANT EXECUTE ON FUNCTION public.price_history_health(INTEGER) TO service_role;
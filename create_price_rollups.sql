@@ -0,0 +1,107 @@
+-- Weekly / monthly OHLC rollups of price_history for long-range charts
+-- Maintained incrementally by the Python importers (scripts/price_rollups.py):
+-- after each batch they call refresh_price_rollups() with only the (card, bucket)
+-- pairs they touched, so a daily import never rescans the whole history.
+
+CREATE TABLE IF NOT EXISTS public.price_history_weekly (
+    card_id BIGINT NOT NULL,
+    source TEXT NOT NULL,
+    price_type TEXT NOT NULL,
+    bucket_start DATE NOT NULL,   -- Monday (date_trunc('week'))
+    open_brl NUMERIC,
+    high_brl NUMERIC,
+    low_brl NUMERIC,
+    close_brl NUMERIC,
+    avg_brl NUMERIC,
+    points INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (card_id, source, price_type, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS public.price_history_monthly (
+    card_id BIGINT NOT NULL,
+    source TEXT NOT NULL,
+    price_type TEXT NOT NULL,
+    bucket_start DATE NOT NULL,   -- 1st of month
+    open_brl NUMERIC,
+    high_brl NUMERIC,
+    low_brl NUMERIC,
+    close_brl NUMERIC,
+    avg_brl NUMERIC,
+    points INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (card_id, source, price_type, bucket_start)
+);
+
+-- Chart reads are "one card, date range"
+CREATE INDEX IF NOT EXISTS idx_price_history_weekly_card ON public.price_history_weekly(card_id, bucket_start);
+CREATE INDEX IF NOT EXISTS idx_price_history_monthly_card ON public.price_history_monthly(card_id, bucket_start);
+
+-- Recompute only the given (card_id, bucket_start) pairs from price_history.
+-- p_granularity: 'week' | 'month'. Arrays are parallel (same length).
+CREATE OR REPLACE FUNCTION public.refresh_price_rollups(
+    p_granularity TEXT,
+    p_card_ids BIGINT[],
+    p_buckets DATE[]
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+DECLARE
+    v_table TEXT;
+    v_step INTERVAL;
+    v_rows INTEGER;
+BEGIN
+    IF p_granularity = 'week' THEN
+        v_table := 'price_history_weekly';
+        v_step := INTERVAL '1 week';
+    ELSIF p_granularity = 'month' THEN
+        v_table := 'price_history_monthly';
+        v_step := INTERVAL '1 month';
+    ELSE
+        RAISE EXCEPTION 'Unknown granularity: %', p_granularity;
+    END IF;
+
+    EXECUTE format($f$
+        INSERT INTO public.%I (card_id, source, price_type, bucket_start,
+                               open_brl, high_brl, low_brl, close_brl, avg_brl, points, updated_at)
+        SELECT
+            ph.card_id,
+            ph.source,
+            ph.price_type,
+            t.bucket_start,
+            (array_agg(ph.price_brl ORDER BY ph.scraped_at ASC))[1],
+            MAX(ph.price_brl),
+            MIN(ph.price_brl),
+            (array_agg(ph.price_brl ORDER BY ph.scraped_at DESC))[1],
+            AVG(ph.price_brl),
+            COUNT(*),
+            NOW()
+        FROM unnest($1, $2) AS t(card_id, bucket_start)
+        JOIN public.price_history ph
+          ON ph.card_id = t.card_id
+         AND ph.scraped_at >= t.bucket_start
+         AND ph.scraped_at < t.bucket_start + $3
+        GROUP BY ph.card_id, ph.source, ph.price_type, t.bucket_start
+        ON CONFLICT (card_id, source, price_type, bucket_start) DO UPDATE SET
+            open_brl = EXCLUDED.open_brl,
+            high_brl = EXCLUDED.high_brl,
+            low_brl = EXCLUDED.low_brl,
+            close_brl = EXCLUDED.close_brl,
+            avg_brl = EXCLUDED.avg_brl,
+            points = EXCLUDED.points,
+            updated_at = EXCLUDED.updated_at
+    $f$, v_table)
+    USING p_card_ids, p_buckets, v_step;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+GRANT ALL ON public.price_history_weekly TO postgres, service_role;
+GRANT ALL ON public.price_history_monthly TO postgres, service_role;
+GRANT SELECT ON public.price_history_weekly TO anon, authenticated;
+GRANT SELECT ON public.price_history_monthly TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.refresh_price_rollups(TEXT, BIGINT[], DATE[]) TO service_role;
@@ -0,0 +1,37 @@
+-- Historical CK buylist vs LigaMagic sell spread per card (scripts/spread_backtest.py)
+-- One row per card with both sources in the window; rebuilt after each import.
+
+CREATE TABLE IF NOT EXISTS public.spread_backtest (
+    card_id BIGINT PRIMARY KEY,
+    window_days INTEGER NOT NULL,
+    days_with_data INTEGER,        -- days where both prices were known
+
+    -- ROI = (CK buylist in BRL - (LM sell + fixed cost)) / (LM sell + fixed cost)
+    current_roi NUMERIC,
+    roi_7d NUMERIC,                -- rolling means over the last 7 / window days
+    roi_window NUMERIC,
+    best_roi_7d NUMERIC,           -- best 7-day rolling mean inside the window
+
+    -- Persistence of the arbitrage window (ROI above min_roi)
+    min_roi NUMERIC,
+    persistence NUMERIC,           -- share of days with data above min_roi
+    longest_run INTEGER,           -- longest streak of consecutive days above min_roi
+    current_run INTEGER,           -- streak ending on the last day
+
+    -- Volatility: std of daily log returns / of the ROI itself
+    ck_volatility NUMERIC,
+    lm_volatility NUMERIC,
+    roi_volatility NUMERIC,
+
+    score NUMERIC,
+    rank INTEGER NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_spread_backtest_rank ON public.spread_backtest(rank);
+CREATE INDEX IF NOT EXISTS idx_spread_backtest_computed_at ON public.spread_backtest(computed_at);
+
+GRANT ALL ON public.spread_backtest TO postgres;
+GRANT ALL ON public.spread_backtest TO service_role;
+GRANT SELECT ON public.spread_backtest TO anon;
+GRANT SELECT ON public.spread_backtest TO authenticated;
@@ -0,0 +1,219 @@
+-- Monthly range partitioning of price_history on scraped_at, plus retention support
+-- Driven by scripts/price_partitions.py (migrate) and scripts/price_retention.py.
+--
+-- Migration flow:
+--   1. Run this file (creates price_history_partitioned + helper functions, no data moved)
+--   2. python price_partitions.py migrate   (ensures partitions, copies month by month, swaps names)
+-- After the swap the old table stays as price_history_legacy until you drop it.
+-- Views that select from price_history are bound to it by OID and would follow the
+-- rename to price_history_legacy: the swap re-creates them on the new table.
+-- Functions (refresh_price_rollups, price_history_health, ...) have plain string
+-- bodies and resolve price_history by name at call time, so they need nothing.
+
+-- 1. Partitioned parent (same columns as price_history)
+CREATE TABLE IF NOT EXISTS public.price_history_partitioned (
+    id BIGSERIAL,
+    card_id BIGINT NOT NULL,
+    source TEXT NOT NULL,
+    price_type TEXT NOT NULL,
+    price_raw NUMERIC,
+    currency TEXT,
+    fx_rate_to_brl NUMERIC,
+    price_brl NUMERIC,
+    scraped_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (id, scraped_at),
+    -- Importer upsert key; includes the partition key so it can be enforced per partition
+    UNIQUE (card_id, source, scraped_at, price_type)
+) PARTITION BY RANGE (scraped_at);
+
+CREATE INDEX IF NOT EXISTS idx_price_history_partitioned_card
+    ON public.price_history_partitioned(card_id, scraped_at);
+
+-- 2. Create missing monthly partitions. Returns how many were created,
+--    or -1 when p_table is not partitioned (migration not done yet).
+CREATE OR REPLACE FUNCTION public.ensure_price_history_partitions(
+    p_months DATE[],
+    p_table TEXT DEFAULT 'price_history'
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+DECLARE
+    v_month DATE;
+    v_start DATE;
+    v_name TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relname = p_table AND c.relkind = 'p'
+    ) THEN
+        RETURN -1;
+    END IF;
+
+    FOREACH v_month IN ARRAY p_months LOOP
+        v_start := date_trunc('month', v_month)::date;
+        v_name := 'price_history_p' || to_char(v_start, 'YYYY_MM');
+        IF to_regclass('public.' || v_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%L) TO (%L)',
+                v_name, p_table, v_start, (v_start + INTERVAL '1 month')::date
+            );
+            v_created := v_created + 1;
+        END IF;
+    END LOOP;
+    RETURN v_created;
+END;
+$$;
+
+-- 3. Copy one slice of the legacy table into the partitioned one (idempotent)
+CREATE OR REPLACE FUNCTION public.copy_price_history_range(p_from DATE, p_to DATE)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    INSERT INTO price_history_partitioned
+        (id, card_id, source, price_type, price_raw, currency, fx_rate_to_brl, price_brl, scraped_at, created_at)
+    SELECT id, card_id, source, price_type, price_raw, currency, fx_rate_to_brl, price_brl, scraped_at, created_at
+    FROM price_history
+    WHERE scraped_at >= p_from AND scraped_at < p_to
+    ON CONFLICT DO NOTHING;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+-- 4. Catch up rows written since the migration started, then swap the names atomically.
+--    p_after_id: MAX(id) when the copy began, so inserts for any date (backfills) are
+--    included; p_catchup_from: re-copies recent days that importers may have upserted.
+DROP FUNCTION IF EXISTS public.swap_price_history_partitioned(DATE);
+CREATE OR REPLACE FUNCTION public.swap_price_history_partitioned(p_catchup_from DATE, p_after_id BIGINT)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+DECLARE
+    v_rows INTEGER;
+    v_view RECORD;
+    v_views TEXT[] := '{}';
+    v_defs TEXT[] := '{}';
+    v_options TEXT[] := '{}';
+BEGIN
+    LOCK TABLE price_history IN EXCLUSIVE MODE;
+
+    -- Definitions of the views on price_history, taken before the rename so they still
+    -- read "price_history" (pg_get_viewdef prints names as the current search_path sees them)
+    FOR v_view IN
+        SELECT DISTINCT v.oid::regclass::text AS name, pg_get_viewdef(v.oid) AS def,
+               array_to_string(v.reloptions, ', ') AS options
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.classid = 'pg_rewrite'::regclass
+          AND d.refobjid = 'public.price_history'::regclass
+          AND v.relkind = 'v'
+    LOOP
+        v_views := v_views || v_view.name;
+        v_defs := v_defs || v_view.def;
+        v_options := v_options || COALESCE(v_view.options, '');
+    END LOOP;
+
+    INSERT INTO price_history_partitioned
+        (id, card_id, source, price_type, price_raw, currency, fx_rate_to_brl, price_brl, scraped_at, created_at)
+    SELECT id, card_id, source, price_type, price_raw, currency, fx_rate_to_brl, price_brl, scraped_at, created_at
+    FROM price_history
+    WHERE id > p_after_id OR scraped_at >= p_catchup_from
+    ON CONFLICT (card_id, source, scraped_at, price_type) DO UPDATE SET
+        price_raw = EXCLUDED.price_raw,
+        currency = EXCLUDED.currency,
+        fx_rate_to_brl = EXCLUDED.fx_rate_to_brl,
+        price_brl = EXCLUDED.price_brl;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    ALTER TABLE price_history RENAME TO price_history_legacy;
+    ALTER TABLE price_history_partitioned RENAME TO price_history;
+    PERFORM setval(pg_get_serial_sequence('public.price_history', 'id'),
+                   COALESCE((SELECT MAX(id) FROM price_history), 1));
+
+    -- Same view (OID, grants, dependants) now reading the partitioned table
+    FOR i IN 1 .. COALESCE(array_length(v_views, 1), 0) LOOP
+        EXECUTE format('CREATE OR REPLACE VIEW %s%s AS %s', v_views[i],
+                       CASE WHEN v_options[i] <> '' THEN ' WITH (' || v_options[i] || ')' ELSE '' END,
+                       rtrim(v_defs[i], ';'));
+        RAISE NOTICE 'view % now reads the partitioned price_history', v_views[i];
+    END LOOP;
+
+    GRANT ALL ON public.price_history TO postgres, service_role;
+    GRANT SELECT ON public.price_history TO anon, authenticated;
+    NOTIFY pgrst, 'reload schema';
+    RETURN v_rows;
+END;
+$$;
+
+-- 5. Retention: months already downsampled to weekly points
+CREATE TABLE IF NOT EXISTS public.price_history_retention (
+    month DATE PRIMARY KEY,
+    raw_rows INTEGER,
+    kept_rows INTEGER,
+    archive_path TEXT,
+    downsampled_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+GRANT ALL ON public.price_history_retention TO postgres, service_role;
+
+-- Replace one month of daily rows with one averaged point per card/source/type/week.
+-- Weeks are clamped to the month so every point stays inside the same partition.
+-- The caller archives the raw rows first (scripts/price_retention.py).
+CREATE OR REPLACE FUNCTION public.downsample_price_history_month(p_month DATE, p_archive_path TEXT)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+DECLARE
+    v_start TIMESTAMP WITH TIME ZONE := date_trunc('month', p_month)::date;
+    v_end TIMESTAMP WITH TIME ZONE := (date_trunc('month', p_month) + INTERVAL '1 month')::date;
+    v_raw INTEGER;
+    v_kept INTEGER;
+BEGIN
+    IF EXISTS (SELECT 1 FROM price_history_retention WHERE month = v_start::date) THEN
+        RETURN 0;
+    END IF;
+
+    CREATE TEMP TABLE _weekly_points ON COMMIT DROP AS
+    SELECT
+        card_id,
+        source,
+        price_type,
+        GREATEST(date_trunc('week', scraped_at), v_start) AS scraped_at,
+        AVG(price_raw) AS price_raw,
+        MAX(currency) AS currency,
+        AVG(fx_rate_to_brl) AS fx_rate_to_brl,
+        AVG(price_brl) AS price_brl
+    FROM price_history
+    WHERE scraped_at >= v_start AND scraped_at < v_end
+    GROUP BY 1, 2, 3, 4;
+
+    DELETE FROM price_history WHERE scraped_at >= v_start AND scraped_at < v_end;
+    GET DIAGNOSTICS v_raw = ROW_COUNT;
+
+    INSERT INTO price_history (card_id, source, price_type, price_raw, currency, fx_rate_to_brl, price_brl, scraped_at)
+    SELECT card_id, source, price_type, price_raw, currency, fx_rate_to_brl, price_brl, scraped_at
+    FROM _weekly_points;
+    GET DIAGNOSTICS v_kept = ROW_COUNT;
+
+    INSERT INTO price_history_retention (month, raw_rows, kept_rows, archive_path)
+    VALUES (v_start::date, v_raw, v_kept, p_archive_path);
+
+    RETURN v_raw;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.ensure_price_history_partitions(DATE[], TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION public.copy_price_history_range(DATE, DATE) TO service_role;
+GRANT EXECUTE ON FUNCTION public.swap_price_history_partitioned(DATE, BIGINT) TO service_role;
+GRANT EXECUTE ON FUNCTION public.downsample_price_history_month(DATE, TEXT) TO service_role;
@@ -0,0 +1,38 @@
+-- Bucket hashes for scripts/reconcile_prices.py (AllPrices file vs price_history)
+-- Every row hashes to the first 60 bits of md5('card_id|price_type|YYYY-MM-DD|cents');
+-- a bucket is a slice of the card_id range and its hash is the exact sum of the
+-- row hashes (order independent). The script computes the same sums locally and
+-- only drills into buckets that differ. Range scans use the
+-- (card_id, source, scraped_at, price_type) unique index.
+
+CREATE OR REPLACE FUNCTION public.price_history_bucket_hashes(
+    p_source TEXT,
+    p_from DATE,
+    p_to DATE,
+    p_id_from BIGINT,
+    p_id_to BIGINT,
+    p_buckets INTEGER
+)
+RETURNS TABLE(bucket INTEGER, rows BIGINT, hash TEXT)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER SET search_path = public
+AS $$
+    SELECT
+        ((card_id - p_id_from) * p_buckets / (p_id_to - p_id_from + 1))::INTEGER AS bucket,
+        COUNT(*) AS rows,
+        -- TEXT: the sum does not fit a float and PostgREST would round a JSON number
+        SUM(('x' || substr(md5(
+            card_id || '|' || price_type || '|' ||
+            to_char(scraped_at AT TIME ZONE 'UTC', 'YYYY-MM-DD') || '|' ||
+            round(price_raw * 100)::BIGINT
+        ), 1, 15))::bit(60)::BIGINT)::TEXT AS hash
+    FROM price_history
+    WHERE source = p_source
+      AND card_id BETWEEN p_id_from AND p_id_to
+      AND scraped_at >= p_from AND scraped_at < p_to + 1
+    GROUP BY 1
+    ORDER BY 1;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.price_history_bucket_hashes(TEXT, DATE, DATE, BIGINT, BIGINT, INTEGER) TO service_role;
@@ -0,0 +1,13 @@
+-- RPC used by the Python importers on PGRST204 ("column not found in schema cache").
+-- Reloading the cache server-side replaces recreating the client.
+CREATE OR REPLACE FUNCTION public.reload_schema_cache()
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER SET search_path = public
+AS $$
+BEGIN
+    NOTIFY pgrst, 'reload schema';
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.reload_schema_cache() TO service_role;
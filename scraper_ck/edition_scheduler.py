@@ -0,0 +1,444 @@
+"""Agenda adaptativa das edições da LigaMagic: volátil/acompanhada com frequência, parada raramente.
+
+    python edition_scheduler.py add <url> [<url> ...]
+    python edition_scheduler.py plan [--budget MIN]
+    python edition_scheduler.py run [--budget MIN] [--workers N] [--out resultados.json] [--no-db] [--profile]
+    python edition_scheduler.py status
+
+Roda no pipeline (scripts/pipeline.py, etapa lm_editions). Os preços
+coletados vão para price_history (LigaMagic/sell, BRL, um ponto por dia) e
+cards.lm_sell_brl, casando o nome pelo CardIndex (scripts/card_matcher.py)
+com as cartas não foil da edição; --no-db não lê nem grava nada no banco.
+
+Por edição o estado (LM_EDITIONS_FILE) guarda a última coleta, os preços
+vistos, a taxa de mudança observada (fração de cartas cujo preço mínimo
+mudou mais que LM_CHANGE_THRESHOLD, por dia, média móvel exponencial), as
+cartas acompanhadas pelos usuários (user_tracked_cards -> cards.set_code,
+código do 'ed=' da URL) e o custo medido da coleta (HTTP ou navegador).
+
+Intervalo até a próxima coleta = LM_TARGET_CHANGE / taxa, ou seja, coletar
+quando ~5% das cartas devem ter mudado, dividido por
+(1 + acompanhadas / LM_TRACKED_WEIGHT) e limitado a
+[LM_MIN_INTERVAL_HOURS, LM_MAX_INTERVAL_DAYS]. Edições novas vencem na hora;
+falhas voltam com backoff exponencial. Cada execução escolhe as vencidas
+por prioridade (atraso relativo x peso das acompanhadas) até o orçamento
+LM_RUN_BUDGET_MINUTES pelo custo estimado, e o fallback de navegador para
+quando o orçamento real estoura: as que sobraram continuam vencidas.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import unquote
+
+from ligamagic import (
+    POOL_SIZE, URL, make_cache, make_session, scrape_editions, scrape_ligamagic_list_view_en,
+)
+from http_cache import HttpCache, MODES, CACHE_MODE, CACHE_TTL
+
+EDITIONS_FILE = os.getenv("LM_EDITIONS_FILE", "ligamagic_editions.json")
+RUN_BUDGET_MINUTES = float(os.getenv("LM_RUN_BUDGET_MINUTES", 20))
+CHANGE_THRESHOLD = float(os.getenv("LM_CHANGE_THRESHOLD", 0.02))  # variação relativa que conta como mudança
+TARGET_CHANGE = float(os.getenv("LM_TARGET_CHANGE", 0.05))  # fração de cartas mudadas que justifica coletar
+TRACKED_WEIGHT = float(os.getenv("LM_TRACKED_WEIGHT", 10))  # 10 acompanhadas = metade do intervalo
+MIN_INTERVAL_HOURS = float(os.getenv("LM_MIN_INTERVAL_HOURS", 12))
+MAX_INTERVAL_DAYS = float(os.getenv("LM_MAX_INTERVAL_DAYS", 30))
+RATE_ALPHA = 0.5  # peso da observação mais recente na taxa / no custo
+# Custo estimado de uma edição ainda não medida
+HTTP_SECONDS = float(os.getenv("LM_HTTP_SECONDS", 1))
+BROWSER_SECONDS = float(os.getenv("LM_BROWSER_SECONDS", 30))
+NEW_PRIORITY = 1e6
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+
+_SET_CODE = re.compile(r"(?:^|[\s&?])ed=([A-Za-z0-9]+)")
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def now_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def parse_time(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+def set_code_of(url: str) -> str | None:
+    """'...card=edid=480850%20ed=tle' -> 'tle'"""
+    m = _SET_CODE.search(unquote(url))
+    return m.group(1).lower() if m else None
+
+
+def price_map(cards) -> dict[str, float]:
+    """Nome -> preço mínimo; nomes repetidos (variantes) ganham sufixo #2, #3..."""
+    prices = {}
+    seen = {}
+    for c in cards:
+        seen[c.name] = seen.get(c.name, 0) + 1
+        key = c.name if seen[c.name] == 1 else f"{c.name}#{seen[c.name]}"
+        prices[key] = c.price_min
+    return prices
+
+
+def change_fraction(old: dict[str, float], new: dict[str, float]) -> float | None:
+    """Fração das cartas com preço diferente (ou que entraram/saíram); None sem base de comparação"""
+    names = old.keys() | new.keys()
+    if not old or not names:
+        return None
+    changed = 0
+    for name in names:
+        a, b = old.get(name), new.get(name)
+        if a is None or b is None or abs(b - a) > max(CHANGE_THRESHOLD * a, 0.01):
+            changed += 1
+    return changed / len(names)
+
+
+def ewma(previous: float | None, value: float) -> float:
+    return value if previous is None else RATE_ALPHA * value + (1 - RATE_ALPHA) * previous
+
+
+class EditionScheduler:
+    def __init__(self, path: str = EDITIONS_FILE):
+        self.path = path
+        self.editions = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.editions = json.load(f)
+
+    def save(self):
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.editions, f, ensure_ascii=False)
+        os.replace(self.path + ".tmp", self.path)
+
+    def add(self, url: str) -> bool:
+        if url in self.editions:
+            return False
+        self.editions[url] = {"set_code": set_code_of(url), "tracked": 0, "failures": 0}
+        return True
+
+    def set_tracked(self, counts: dict[str, int]):
+        for ed in self.editions.values():
+            ed["tracked"] = counts.get(ed.get("set_code"), 0)
+
+    # -- agenda --------------------------------------------------------------
+
+    def interval(self, ed: dict) -> timedelta:
+        rate = ed.get("change_rate")
+        low, high = MIN_INTERVAL_HOURS / 24, MAX_INTERVAL_DAYS
+        days = high if not rate else min(max(TARGET_CHANGE / rate, low), high)
+        days /= 1 + ed.get("tracked", 0) / TRACKED_WEIGHT
+        return timedelta(days=max(days, low))
+
+    def cost(self, ed: dict) -> float:
+        """Segundos estimados da próxima coleta"""
+        if ed.get("seconds") is not None:
+            return ed["seconds"]
+        return BROWSER_SECONDS if ed.get("mode") == "browser" else HTTP_SECONDS
+
+    def priority(self, ed: dict, now: datetime) -> float | None:
+        """None enquanto não vence; quanto mais atrasada (relativo ao intervalo) e acompanhada, maior"""
+        due = parse_time(ed.get("next_due"))
+        if due is None:
+            return NEW_PRIORITY + ed.get("tracked", 0)
+        if due > now:
+            return None
+        overdue = (now - due) / self.interval(ed)
+        return (1 + overdue) * (1 + ed.get("tracked", 0) / TRACKED_WEIGHT)
+
+    def plan(self, budget_seconds: float, now: datetime | None = None) -> list[str]:
+        """URLs vencidas por prioridade até o orçamento (ao menos uma, se houver)"""
+        now = now or now_utc()
+        due = []
+        for url, ed in self.editions.items():
+            p = self.priority(ed, now)
+            if p is not None:
+                due.append((p, url))
+        due.sort(reverse=True)
+        chosen, spent = [], 0.0
+        for _, url in due:
+            cost = self.cost(self.editions[url])
+            if chosen and spent + cost > budget_seconds:
+                continue
+            chosen.append(url)
+            spent += cost
+        return chosen
+
+    def daily_cost(self) -> tuple[float, float]:
+        """(segundos por dia pela agenda atual, segundos para coletar todas todo dia)"""
+        scheduled = sum(self.cost(ed) / (self.interval(ed) / timedelta(days=1)) for ed in self.editions.values())
+        return scheduled, sum(self.cost(ed) for ed in self.editions.values())
+
+    # -- resultado -----------------------------------------------------------
+
+    def record(self, url: str, title: str, cards, mode: str, seconds: float, now: datetime):
+        ed = self.editions[url]
+        if mode == "failed":
+            ed["failures"] = ed.get("failures", 0) + 1
+            backoff = min(MIN_INTERVAL_HOURS * 2 ** (ed["failures"] - 1), MAX_INTERVAL_DAYS * 24)
+            ed["next_due"] = (now + timedelta(hours=backoff)).isoformat()
+            return
+
+        prices = price_map(cards)
+        last = parse_time(ed.get("last_scrape"))
+        fraction = change_fraction(ed.get("prices", {}), prices)
+        if fraction is not None and last is not None:
+            days = max((now - last) / timedelta(days=1), MIN_INTERVAL_HOURS / 24)
+            ed["change_rate"] = ewma(ed.get("change_rate"), fraction / days)
+            ed["last_change"] = round(fraction, 4)
+        ed.update(
+            title=title,
+            mode=mode,
+            cards=len(prices),
+            prices=prices,
+            failures=0,
+            last_scrape=now.isoformat(),
+            # Troca de modo muda o custo de ordem de grandeza: não mistura as médias
+            seconds=round(ewma(ed.get("seconds") if ed.get("mode") == mode else None, seconds), 2),
+        )
+        ed["next_due"] = (now + self.interval(ed)).isoformat()
+
+
+def db_client():
+    """Cliente Supabase de scripts/ (mesmo .env e pool dos importadores)"""
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    from dotenv import load_dotenv
+    load_dotenv()
+    from supabase_client import get_client
+    return get_client()
+
+
+def load_tracked_counts() -> dict[str, int] | None:
+    """{set_code: cartas acompanhadas} do Supabase; None se não der para ler"""
+    try:
+        client = db_client()
+        from supabase_client import fetch_all
+
+        ids = sorted({r["card_id"] for r in fetch_all(client, "user_tracked_cards", "card_id", key="card_id")})
+        counts = {}
+        for i in range(0, len(ids), 300):
+            rows = client.table("cards").select("set_code").in_("id", ids[i:i + 300]).execute().data
+            for r in rows:
+                code = (r.get("set_code") or "").lower()
+                counts[code] = counts.get(code, 0) + 1
+        return counts
+    except Exception as e:
+        print(f"Cartas acompanhadas indisponíveis ({e}), mantendo as contagens anteriores")
+        return None
+
+
+def edition_cards(client, code: str) -> list[dict]:
+    """Cards não foil de uma edição (set_code como no MTGJSON, maiúsculo), paginados por id"""
+    rows, last = [], 0
+    while True:
+        page = client.table("cards").select("id, name, set_code, collector_number, is_foil, lm_sell_brl") \
+            .eq("set_code", code.upper()).eq("is_foil", False) \
+            .gt("id", last).order("id").limit(1000).execute().data
+        rows.extend(page)
+        if len(page) < 1000:
+            return rows
+        last = page[-1]["id"]
+
+
+def match_edition(cards, rows: list[dict]) -> tuple[dict[int, float], dict[str, int]]:
+    """CardInfo coletados -> {card_id: preço} pelo CardIndex (scripts/card_matcher.py) da edição.
+
+    Nome ambíguo (várias impressões na edição), sem par, ou carta do banco
+    casada por mais de uma linha da LigaMagic (variantes) ficam de fora;
+    retorna também essas contagens."""
+    from card_matcher import CardIndex
+
+    index = CardIndex(rows)
+    skipped = {"none": 0, "ambiguous": 0, "duplicate": 0}
+    hits = {}
+    for card in cards:
+        if card.price_min <= 0:
+            continue
+        result = index.match(card.name)
+        if result.card is None:
+            skipped[result.status] += 1
+            continue
+        hits.setdefault(result.card.id, []).append(card.price_min)
+    prices = {}
+    for card_id, found in hits.items():
+        if len(found) > 1:
+            skipped["duplicate"] += len(found)
+        else:
+            prices[card_id] = found[0]
+    return prices, skipped
+
+
+def save_prices(scheduler: EditionScheduler, results: dict, day: str) -> tuple[int, dict[str, int]]:
+    """Grava as edições coletadas em price_history e cards.lm_sell_brl (set_lm_prices, uma chamada
+    por edição, migrations/002_set_lm_prices.sql). Retorna (preços, linhas sem par por motivo)"""
+    client = db_client()
+    from price_rollups import RollupTracker
+    from price_sink import PriceSink
+    from price_partitions import PartitionRouter
+
+    rollups = RollupTracker()
+    sink = PriceSink(batch_size=1000, on_written=rollups.track, before_write=PartitionRouter())
+    skipped = {"none": 0, "ambiguous": 0, "duplicate": 0}
+    for url, (title, cards, mode) in results.items():
+        code = scheduler.editions[url].get("set_code")
+        if mode == "failed" or not code:
+            continue
+        rows = edition_cards(client, code)
+        prices, missed = match_edition(cards, rows)
+        for reason, n in missed.items():
+            skipped[reason] += n
+        stored = {r["id"]: r.get("lm_sell_brl") for r in rows}
+        changed = {}
+        for card_id, price in prices.items():
+            sink.add_point(card_id, "LigaMagic", "sell", price, "BRL", 1.0, price, day)
+            if stored.get(card_id) is None or float(stored[card_id]) != price:
+                changed[card_id] = price
+        if changed:
+            client.rpc("set_lm_prices", {"p_ids": list(changed), "p_prices": list(changed.values())}).execute()
+    sink.close()
+    rollups.refresh(client)
+    if sink.quarantine_path:
+        print(f"Linhas em quarentena: {sink.stats['quarantined']} -> {sink.quarantine_path}")
+    return sink.stats["rows"], skipped
+
+
+def run(scheduler: EditionScheduler, budget_minutes: float, workers: int, cache: HttpCache,
+        out: str | None = None, db: bool = True, profiler=None) -> dict:
+    now = now_utc()
+    budget = budget_minutes * 60
+    urls = scheduler.plan(budget, now)
+    if not urls:
+        print("Nenhuma edição vencida")
+        return {}
+    estimate = sum(scheduler.cost(scheduler.editions[u]) for u in urls)
+    print(f"{len(urls)} de {len(scheduler.editions)} edições vencidas nesta execução "
+          f"(estimado {estimate / 60:.1f} de {budget_minutes:g} min)")
+
+    start = time.perf_counter()
+    deadline = start + budget
+    browser_seconds = {}
+
+    def fallback(url):
+        # Navegador é o custo que importa: para no orçamento e deixa o resto vencido
+        if time.perf_counter() > deadline:
+            raise BudgetExceeded("orçamento esgotado")
+        t = time.perf_counter()
+        try:
+            return scrape_ligamagic_list_view_en(
+                url, headless=True, slow_mo=0, screenshots=False, save_cookies=True, cache=cache)
+        finally:
+            browser_seconds[url] = time.perf_counter() - t
+
+    session = make_session(workers, cache=cache)
+    results = scrape_editions(urls, workers, session, fallback=fallback, cache=cache, profiler=profiler)
+    elapsed = time.perf_counter() - start
+
+    # HTTP roda em paralelo: custo por edição = tempo não gasto no navegador / edições via HTTP
+    http_urls = [u for u, (*_, mode) in results.items() if mode == "http"]
+    http_each = (elapsed - sum(browser_seconds.values())) / max(len(http_urls), 1)
+    if db:
+        # Antes de registrar a coleta: se a gravação quebrar, as edições continuam vencidas
+        with profiler.stage("save") if profiler else nullcontext():
+            written, skipped = save_prices(scheduler, results, date.today().isoformat())
+        print(f"{written} preços gravados em price_history (sem par em cards: {skipped['none']}, "
+              f"ambíguas: {skipped['ambiguous']}, variantes na mesma carta: {skipped['duplicate']})")
+
+    skipped = 0
+    for url, (title, cards, mode) in results.items():
+        if mode == "failed" and url not in browser_seconds:
+            skipped += 1  # orçamento: não conta como falha
+            continue
+        scheduler.record(url, title, cards, mode, browser_seconds.get(url, http_each), now)
+    scheduler.save()
+
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({url: {"title": title, "mode": mode, "cards": [vars(c) for c in cards]}
+                       for url, (title, cards, mode) in results.items() if mode != "failed"},
+                      f, ensure_ascii=False)
+    modes = [mode for *_, mode in results.values()]
+    print(f"{modes.count('http')} via HTTP, {modes.count('browser')} via navegador "
+          f"({sum(browser_seconds.values()) / 60:.1f} min), {modes.count('failed') - skipped} falhas, "
+          f"{skipped} adiadas pelo orçamento | {elapsed / 60:.1f} min")
+    return results
+
+
+def status(scheduler: EditionScheduler):
+    now = now_utc()
+    rows = sorted(scheduler.editions.items(), key=lambda kv: kv[1].get("next_due") or "")
+    print(f"{'edição':<10}{'acomp':>6}{'cartas':>7}{'mud/dia':>9}{'interv h':>9}{'custo s':>9}  modo     próxima")
+    for url, ed in rows:
+        rate = ed.get("change_rate")
+        due = parse_time(ed.get("next_due"))
+        print(f"{(ed.get('set_code') or '?'):<10}{ed.get('tracked', 0):>6}{ed.get('cards', 0):>7}"
+              f"{(f'{rate:.3f}' if rate is not None else '-'):>9}"
+              f"{scheduler.interval(ed) / timedelta(hours=1):>9.0f}{scheduler.cost(ed):>9.1f}  "
+              f"{(ed.get('mode') or '-'):<8} {'agora' if due is None or due <= now else due.isoformat(timespec='minutes')}")
+    scheduled, daily = scheduler.daily_cost()
+    print(f"Custo/dia pela agenda: {scheduled / 60:.1f} min (todas todo dia: {daily / 60:.1f} min)")
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description="Agenda adaptativa das edições da LigaMagic")
+    parser.add_argument("--file", default=EDITIONS_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add")
+    add.add_argument("urls", nargs="*", help=f"URLs de edição (padrão: {URL})")
+    for name in ("plan", "run"):
+        p = sub.add_parser(name)
+        p.add_argument("--budget", type=float, default=RUN_BUDGET_MINUTES, help="minutos por execução")
+        p.add_argument("--no-db", action="store_true", help="sem banco: não lê as acompanhadas nem grava os preços")
+    sub.choices["run"].add_argument("--workers", type=int, default=POOL_SIZE)
+    sub.choices["run"].add_argument("--out", help="JSON com as cartas coletadas nesta execução")
+    sub.choices["run"].add_argument("--cache", choices=MODES, default=CACHE_MODE)
+    sub.choices["run"].add_argument("--cache-ttl", type=int, default=CACHE_TTL)
+    sub.choices["run"].add_argument("--profile", action="store_true",
+                                    help="CPU/memória por etapa em profiles/ (scripts/profiling.py)")
+    sub.add_parser("status")
+    args = parser.parse_args()
+
+    scheduler = EditionScheduler(args.file)
+    if args.command == "add":
+        added = sum(scheduler.add(url) for url in args.urls or [URL])
+        scheduler.save()
+        print(f"{added} edições novas ({len(scheduler.editions)} no total)")
+        return
+    if args.command == "status":
+        status(scheduler)
+        return
+
+    if not args.no_db:
+        counts = load_tracked_counts()
+        if counts is not None:
+            scheduler.set_tracked(counts)
+    if args.command == "plan":
+        urls = scheduler.plan(args.budget * 60)
+        for url in urls:
+            ed = scheduler.editions[url]
+            print(f"{(ed.get('set_code') or '?'):<10}{ed.get('tracked', 0):>5} acomp  {scheduler.cost(ed):6.1f}s  {url}")
+        print(f"{len(urls)} edições, estimado {sum(scheduler.cost(scheduler.editions[u]) for u in urls) / 60:.1f} min")
+        return
+
+    cache = make_cache(args.cache, args.cache_ttl)
+    profiler = None
+    if args.profile:
+        if SCRIPTS_DIR not in sys.path:
+            sys.path.insert(0, SCRIPTS_DIR)
+        from profiling import Profiler
+        profiler = Profiler("edition_scheduler")
+    run(scheduler, args.budget, args.workers, cache, args.out, db=not args.no_db, profiler=profiler)
+    if cache.enabled:
+        print(cache.summary())
+    if profiler:
+        profiler.close()
+
+
+if __name__ == "__main__":
+    main()
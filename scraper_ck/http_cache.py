@@ -0,0 +1,179 @@
+"""Record/replay cache em disco para os scrapers Python.
+
+Cada resposta (HTML, XHR, JS) fica em CACHE_DIR/<2 chars>/<sha256>.json.gz,
+chaveada por método + URL + corpo + os cookies que mudam o conteúdo da página
+(ex.: modo lista / idioma). Modos:
+
+    off     sem cache
+    auto    usa o que estiver no disco dentro do TTL, busca e grava o resto
+    record  sempre busca na rede e grava (renova o cache)
+    replay  só disco, nunca rede: falta no cache = erro (benchmark / regressão offline)
+
+Integra com requests (CachingAdapter, via session.mount) e com Playwright
+(attach_to_page, via page.route).
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "http_cache")
+CACHE_MODE = os.getenv("HTTP_CACHE_MODE", "off")
+CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", 6 * 3600))
+MODES = ("off", "auto", "record", "replay")
+
+# O corpo gravado já vem descomprimido
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+# Recursos que o navegador grava/reproduz; o resto (imagens, fontes, css) segue pra rede ou é abortado no replay
+BROWSER_TYPES = {"document", "xhr", "fetch", "script"}
+
+
+class CacheMiss(requests.ConnectionError):
+    pass
+
+
+class HttpCache:
+    def __init__(self, mode=CACHE_MODE, directory=CACHE_DIR, ttl=CACHE_TTL, key_cookies=(), accept=None):
+        """accept(url, headers, body) -> bool: respostas recusadas não são gravadas (ex.: página no
+        modo/idioma errado quando os cookies que o definem não entram na chave)"""
+        if mode not in MODES:
+            raise ValueError(f"mode deve ser um de {MODES}")
+        self.mode = mode
+        self.directory = directory
+        self.ttl = ttl
+        self.key_cookies = set(key_cookies)
+        self.accept = accept
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "expired": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def key(self, method, url, body=None, cookie_header=None):
+        cookies = []
+        for part in (cookie_header or "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name in self.key_cookies:
+                cookies.append(f"{name}={value}")
+        h = hashlib.sha256(f"{method.upper()} {url}\n{';'.join(sorted(cookies))}\n".encode())
+        if body:
+            h.update(body if isinstance(body, bytes) else str(body).encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json.gz")
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, key):
+        """Entrada gravada ou None. No modo auto respeita o TTL; replay aceita qualquer idade."""
+        if self.mode in ("off", "record"):
+            return None
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        if self.mode == "auto" and time.time() - entry["fetched_at"] > self.ttl:
+            self._count("expired")
+            return None
+        entry["body"] = base64.b64decode(entry.pop("body_b64"))
+        self._count("hits")
+        return entry
+
+    def put(self, key, method, url, status, headers, body):
+        if not self.enabled or status >= 500:
+            return
+        if self.accept is not None and not self.accept(url, headers, body):
+            self._count("rejected")
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "method": method,
+            "url": url,
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS},
+            "fetched_at": time.time(),
+            "body_b64": base64.b64encode(body).decode("ascii"),
+        }
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=3) as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+        self._count("stored")
+
+    def summary(self):
+        s = self.stats
+        return f"cache {self.mode}: {s['hits']} hits, {s['misses']} misses, {s['expired']} expirados, {s['stored']} gravados, {s['rejected']} recusados"
+
+
+class CachingAdapter(HTTPAdapter):
+    """HTTPAdapter que responde do HttpCache e grava o que buscar na rede"""
+
+    def __init__(self, cache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        key = self.cache.key(request.method, request.url, request.body, request.headers.get("Cookie"))
+        entry = self.cache.get(key)
+        if entry is not None:
+            return self._from_entry(request, entry)
+        if self.cache.mode == "replay":
+            raise CacheMiss(f"Fora do cache (replay): {request.method} {request.url}", request=request)
+
+        response = super().send(request, **kwargs)
+        self.cache.put(key, request.method, request.url, response.status_code, response.headers, response.content)
+        return response
+
+    def _from_entry(self, request, entry):
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry["body"]
+        response.url = request.url
+        response.request = request
+        response.reason = "OK (cache)"
+        response.connection = self
+        return response
+
+
+def attach_to_page(page, cache):
+    """Intercepta as requisições do Playwright (page ou context) através do cache"""
+    if not cache.enabled:
+        return
+
+    def handle(route):
+        req = route.request
+        if req.resource_type not in BROWSER_TYPES:
+            # Replay é offline: nada de rede, nem para imagem/css
+            return route.abort() if cache.mode == "replay" else route.continue_()
+
+        key = cache.key(req.method, req.url, req.post_data_buffer, req.all_headers().get("cookie"))
+        entry = cache.get(key)
+        if entry is not None:
+            return route.fulfill(status=entry["status"], headers=entry["headers"], body=entry["body"])
+        if cache.mode == "replay":
+            return route.abort("internetdisconnected")
+
+        response = route.fetch()
+        body = response.body()
+        cache.put(key, req.method, req.url, response.status, response.headers, body)
+        route.fulfill(response=response, body=body)
+
+    page.route("**/*", handle)
@@ -0,0 +1,325 @@
+"""Scraper das páginas de edição da LigaMagic em modo lista / inglês.
+
+Playwright (scrape_ligamagic_list_view_en) clica em lista e inglês e grava os
+cookies; o modo HTTP (fetch_edition_http / scrape_editions) reaproveita esses
+cookies e lê a div.card-table direto do HTML, caindo no navegador só para as
+edições que não vierem em lista/inglês. Usado pelo edition_scheduler.py;
+ligamagic_cli.py é a linha de comando / benchmark.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import HttpCache, CachingAdapter, attach_to_page, CACHE_MODE, CACHE_TTL
+
+try:
+    from selectolax.parser import HTMLParser as LexborParser
+except ImportError:
+    LexborParser = None
+
+# Exemplo com Avatar: The Last Airbender Eternal
+URL = "https://www.ligamagic.com.br/?view=cards/search&card=edid=480850%20ed=tle"
+
+# Cookies que o site grava quando clicamos em lista (changeView(2)) e inglês
+# (reloadLanguage('nEN')). São capturados do navegador no primeiro fallback e
+# reaproveitados pelo modo HTTP.
+COOKIES_FILE = os.getenv("LM_COOKIES_FILE", "ligamagic_cookies.json")
+POOL_SIZE = int(os.getenv("LM_POOL_SIZE", 8))
+# Nomes desses cookies entram na chave do cache (mesma URL, lista x galeria / EN x PT).
+# Mesmo sem eles, make_cache() só grava páginas de edição já em lista/inglês.
+VIEW_COOKIES = [c for c in os.getenv("LM_VIEW_COOKIES", "").split(",") if c]
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+
+@dataclass
+class CardInfo:
+    name: str
+    price_min: float
+
+
+def parse_price_brl(raw: str) -> float:
+    raw = raw.strip()
+    raw = raw.replace("R$", "").replace(" ", "")
+    raw = raw.replace(".", "")
+    raw = raw.replace(",", ".")
+    if not raw:
+        return 0.0
+    return float(raw)
+
+
+def rows_to_cards(rows: list[list[str]]) -> list[CardInfo]:
+    """Linhas da div.card-table (texto de cada td) -> CardInfo"""
+    cards: list[CardInfo] = []
+    for tds in rows:
+        if len(tds) < 7:
+            continue
+
+        # 2ª coluna = nome da carta, 7ª coluna = preço mínimo
+        name = tds[1].strip()
+        if not name:
+            continue
+
+        try:
+            price_min = parse_price_brl(tds[6])
+        except ValueError:
+            continue
+
+        cards.append(CardInfo(name=name, price_min=price_min))
+    return cards
+
+
+def scrape_ligamagic_list_view_en(
+    url: str, headless: bool = False, slow_mo: int = 400, screenshots: bool = True, save_cookies: bool = False,
+    cache: HttpCache | None = None,
+) -> tuple[str, list[CardInfo]]:
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        # Deixe headless=False enquanto estiver testando
+        browser = p.chromium.launch(headless=headless, slow_mo=slow_mo)
+        page = browser.new_page()
+        if cache is not None:
+            attach_to_page(page, cache)
+
+        print("Abrindo página...")
+        page.goto(url, wait_until="networkidle")
+        print("URL carregada:", page.url)
+        print("Título da página:", page.title())
+
+        # 0) Garantir que o conteúdo inicial carregou (galeria)
+        try:
+            page.wait_for_selector("div.grid-cardsinput", timeout=10000)
+            print("grid-cardsinput encontrado (modo galeria).")
+        except Exception as e:
+            print("Nao encontrei grid-cardsinput:", e)
+
+        # 1) Trocar visualização para LISTA primeiro
+        # <div class="tb-show">
+        #   <img class="tb-view-02" onclick="edc.changeView(2);">
+        # </div>
+        # Se os cookies já deixam a página em lista, o botão não aparece.
+        if page.locator("div.card-table table tbody tr").count() == 0:
+            try:
+                btn_list = page.locator('div.tb-show img.tb-view-02[onclick*="edc.changeView(2)"]')
+                btn_list.wait_for(state="visible", timeout=10000)
+                print("Botão de exibição em lista encontrado. Clicando...")
+                btn_list.click()
+            except Exception as e:
+                print("Falha ao encontrar/clicar no botão de lista:", e)
+                if screenshots:
+                    page.screenshot(path="ligamagic_sem_botao_lista.png", full_page=True)
+                browser.close()
+                raise
+
+        # 2) Esperar a tabela aparecer (ainda em português, mas já em modo lista)
+        print("Esperando a tabela (div.card-table) aparecer...")
+        try:
+            page.wait_for_selector("div.card-table table tbody tr", timeout=20000)
+            print("Tabela encontrada em modo lista.")
+        except Exception as e:
+            print("Nao encontrei a tabela:", e)
+            if screenshots:
+                page.screenshot(path="ligamagic_sem_tabela.png", full_page=True)
+            browser.close()
+            raise
+
+        # 3) Agora sim: trocar idioma para inglês
+        # Essa div só aparece em modo lista:
+        # <div class="tb-ed-language-changer">
+        #   <span class="ed-language-changer-en" onclick="edc.reloadLanguage('nEN');">Alterar idioma para inglês</span>
+        #   ...
+        # </div>
+        try:
+            lang_btn = page.locator("span.ed-language-changer-en")
+            lang_btn.wait_for(state="visible", timeout=10000)
+            print("Botão de idioma EN encontrado. Clicando...")
+            lang_btn.click()
+
+            # Espera recarregar o conteúdo em inglês (tabela pode ser recarregada)
+            page.wait_for_load_state("networkidle")
+            page.wait_for_selector("div.card-table table tbody tr", timeout=20000)
+            print("Idioma alterado para inglês (tabela recarregada).")
+        except Exception as e:
+            print("Falha ao trocar idioma para inglês (talvez já esteja em EN):", e)
+
+        if screenshots:
+            # Screenshot para conferir visualmente se está em inglês e em lista
+            page.screenshot(path="ligamagic_tabela_en.png", full_page=True)
+            print("Screenshot salva como ligamagic_tabela_en.png")
+
+        if save_cookies:
+            with open(COOKIES_FILE, "w", encoding="utf-8") as f:
+                json.dump(page.context.cookies(), f)
+
+        # 4) Título da coleção
+        collection_title = page.text_content("div.tb-ed b") or ""
+        collection_title = collection_title.strip() or "Sem título"
+
+        # 5) Linhas da tabela (agora, em tese, com nomes em inglês)
+        rows = page.query_selector_all("div.card-table table tbody tr")
+        print("Qtd linhas na tabela:", len(rows))
+        cells = [[(td.inner_text() or "") for td in row.query_selector_all("td")] for row in rows]
+
+        browser.close()
+        return collection_title, rows_to_cards(cells)
+
+
+# ---------------------------------------------------------------------------
+# Modo HTTP: mesma página em lista/inglês, sem navegador
+# ---------------------------------------------------------------------------
+
+class _CardTableParser(HTMLParser):
+    """Fallback sem dependências: texto dos td em div.card-table tbody tr + div.tb-ed b"""
+
+    def __init__(self):
+        super().__init__()
+        self.divs = []  # classes marcadas de cada div aberta
+        self.in_tbody = False
+        self.in_title_b = False
+        self.row = None
+        self.cell = None
+        self.rows = []
+        self.title = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "div":
+            classes = (dict(attrs).get("class") or "").split()
+            self.divs.append("card-table" if "card-table" in classes else "tb-ed" if "tb-ed" in classes else None)
+        elif "card-table" not in self.divs:
+            if tag == "b" and "tb-ed" in self.divs:
+                self.in_title_b = True
+        elif tag == "tbody":
+            self.in_tbody = True
+        elif tag == "tr" and self.in_tbody:
+            self.row = []
+        elif tag == "td" and self.row is not None:
+            self.cell = []
+
+    def handle_endtag(self, tag):
+        if tag == "div" and self.divs:
+            self.divs.pop()
+        elif tag == "b":
+            self.in_title_b = False
+        elif tag == "tbody":
+            self.in_tbody = False
+        elif tag == "td" and self.cell is not None:
+            self.row.append("".join(self.cell).strip())
+            self.cell = None
+        elif tag == "tr" and self.row is not None:
+            self.rows.append(self.row)
+            self.row = None
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+        elif self.in_title_b:
+            self.title.append(data)
+
+
+def parse_card_table(html: str) -> tuple[str, list[list[str]]]:
+    """HTML da edição -> (título, texto dos td de cada linha). selectolax quando instalado."""
+    if LexborParser is not None:
+        tree = LexborParser(html)
+        title_node = tree.css_first("div.tb-ed b")
+        rows = [
+            [td.text(separator=" ", strip=True) for td in tr.css("td")]
+            for tr in tree.css("div.card-table table tbody tr")
+        ]
+        return (title_node.text(strip=True) if title_node else ""), rows
+
+    parser = _CardTableParser()
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.title).strip(), parser.rows
+
+
+def make_session(pool_size: int = POOL_SIZE, cookies_file: str | None = COOKIES_FILE,
+                 cache: HttpCache | None = None) -> requests.Session:
+    session = requests.Session()
+    pool = {"pool_connections": pool_size, "pool_maxsize": pool_size, "max_retries": 2}
+    adapter = CachingAdapter(cache, **pool) if cache is not None and cache.enabled else HTTPAdapter(**pool)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.9,pt-BR;q=0.8"})
+    if cookies_file and os.path.exists(cookies_file):
+        with open(cookies_file, encoding="utf-8") as f:
+            for c in json.load(f):
+                session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+    return session
+
+
+def is_english_view(html: str) -> bool:
+    """O botão 'Alterar idioma para inglês' (span.ed-language-changer-en) só aparece com a página em português"""
+    return "ed-language-changer-en" not in html
+
+
+def cacheable_page(url: str, headers, body: bytes) -> bool:
+    """HTML só vai para o cache em lista/inglês; galeria ou português seriam reproduzidos
+    depois que os cookies mudassem, já que a chave não distingue (VIEW_COOKIES vazio)"""
+    content_type = next((v for k, v in headers.items() if k.lower() == "content-type"), "")
+    if "html" not in content_type:
+        return True
+    html = body.decode("utf-8", errors="replace")
+    return bool(parse_card_table(html)[1]) and is_english_view(html)
+
+
+def make_cache(mode: str = CACHE_MODE, ttl: int = CACHE_TTL) -> HttpCache:
+    return HttpCache(mode, ttl=ttl, key_cookies=VIEW_COOKIES, accept=cacheable_page)
+
+
+def fetch_edition_http(session: requests.Session, url: str) -> tuple[str, list[CardInfo]] | None:
+    """Página em lista/inglês via HTTP. None quando não vieram linhas da div.card-table
+    ou a página veio em português (cookies de idioma vencidos): o navegador refaz e regrava os cookies."""
+    res = session.get(url, timeout=20)
+    res.raise_for_status()
+    title, rows = parse_card_table(res.text)
+    if not rows or not is_english_view(res.text):
+        return None
+    return title or "Sem título", rows_to_cards(rows)
+
+
+def scrape_editions(urls: list[str], workers: int = POOL_SIZE, session: requests.Session | None = None,
+                    fallback=None, cache: HttpCache | None = None, profiler=None) -> dict:
+    """Modo rápido para várias edições: HTTP em paralelo, Playwright só para quem não trouxe tabela.
+
+    Retorna {url: (título, cards, modo)}, modo = 'http' | 'browser' | 'failed'.
+    profiler (scripts/profiling.py) separa as etapas 'http' e 'browser' no relatório.
+    """
+    stage = profiler.stage if profiler else (lambda name: nullcontext())
+    session = session or make_session(workers, cache=cache)
+    fallback = fallback or (lambda u: scrape_ligamagic_list_view_en(
+        u, headless=True, slow_mo=0, screenshots=False, save_cookies=True, cache=cache))
+    results = {}
+
+    def fetch(url):
+        try:
+            return url, fetch_edition_http(session, url)
+        except requests.RequestException as e:
+            print(f"HTTP falhou em {url}: {e}")
+            return url, None
+
+    with stage("http"), ThreadPoolExecutor(max_workers=workers) as pool:
+        for url, result in pool.map(fetch, urls):
+            if result is not None:
+                results[url] = (*result, "http")
+
+    # O navegador roda em série e grava os cookies de lista/EN para os próximos
+    with stage("browser"):
+        for url in urls:
+            if url in results:
+                continue
+            try:
+                results[url] = (*fallback(url), "browser")
+            except Exception as e:
+                print(f"Fallback falhou em {url}: {e}")
+                results[url] = ("", [], "failed")
+    return results
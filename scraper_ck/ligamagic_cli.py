@@ -0,0 +1,168 @@
+"""Linha de comando e benchmark do scraper da LigaMagic (ligamagic.py).
+
+    python ligamagic_cli.py [url]                        # uma edição pelo navegador
+    python ligamagic_cli.py --fast [url ...]             # HTTP primeiro, navegador de fallback
+    python ligamagic_cli.py --bench [--editions 200]     # edições/s contra fixtures locais
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_cache import HttpCache, MODES, CACHE_MODE, CACHE_TTL
+from ligamagic import (
+    LexborParser, POOL_SIZE, URL, make_cache, make_session, scrape_editions, scrape_ligamagic_list_view_en,
+)
+
+
+# ---------------------------------------------------------------------------
+# Benchmark contra servidor local de fixtures
+# ---------------------------------------------------------------------------
+
+FIXTURE_JS = """
+<script>
+var edc = {
+  changeView: function (v) { document.cookie = 'ed_view=' + v + '; path=/'; location.reload(); },
+  reloadLanguage: function (l) { document.cookie = 'ed_lang=' + l + '; path=/'; location.reload(); }
+};
+</script>
+"""
+
+
+def fixture_page(edition: int, rows: int, list_view: bool, english: bool, js_table: bool) -> str:
+    """Imita a página de edição: galeria por padrão, tabela só em modo lista"""
+    head = f"<html><head><title>Edição {edition}</title>{FIXTURE_JS}</head><body>"
+    title = f'<div class="tb-ed"><b>Edition {edition}</b></div>'
+    if not list_view:
+        return (head + title + '<div class="tb-show"><img class="tb-view-02" onclick="edc.changeView(2);" '
+                'src="data:," width="20" height="20"></div><div class="grid-cardsinput">galeria</div></body></html>')
+
+    trs = "".join(
+        f"<tr><td>{i}</td><td><a href='#'>{'Card' if english else 'Carta'} {edition}-{i}</a></td>"
+        f"<td>C</td><td>NM</td><td>EN</td><td>3</td><td>R$ {i},{i % 100:02d}</td></tr>"
+        for i in range(1, rows + 1)
+    )
+    table = f'<div class="card-table"><table><thead><tr><th>#</th></tr></thead><tbody>{trs}</tbody></table></div>'
+    # Como no site: só aparece o botão para o outro idioma
+    if english:
+        lang = ('<div class="tb-ed-language-changer"><span class="ed-language-changer-pt" '
+                "onclick=\"edc.reloadLanguage('nPT');\">Change language to Portuguese</span></div>")
+    else:
+        lang = ('<div class="tb-ed-language-changer"><span class="ed-language-changer-en" '
+                "onclick=\"edc.reloadLanguage('nEN');\">Alterar idioma para inglês</span></div>")
+    if js_table:
+        # Tabela montada por script: sem linhas no HTML, força o fallback
+        body = f"<div id='slot'></div><script>document.getElementById('slot').innerHTML = {json.dumps(table)};</script>"
+    else:
+        body = table
+    return head + title + lang + body + "</body></html>"
+
+
+def start_fixture_server(rows: int, js_every: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            edition = int(self.path.rsplit("=", 1)[-1]) if "=" in self.path else 0
+            cookies = self.headers.get("Cookie", "")
+            body = fixture_page(
+                edition, rows,
+                list_view="ed_view=2" in cookies,
+                english="ed_lang=nEN" in cookies,
+                js_table=js_every > 0 and edition % js_every == 0,
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench(editions: int, rows: int, workers: int, js_every: int, browser: int, cache: HttpCache | None = None,
+          profiler=None):
+    server = start_fixture_server(rows, js_every)
+    base = f"http://127.0.0.1:{server.server_port}/?view=cards/search&edid="
+    urls = [f"{base}{i}" for i in range(1, editions + 1)]
+    print(f"Fixture: {editions} edições x {rows} linhas | parser: {'selectolax' if LexborParser else 'html.parser'}")
+
+    if cache is not None:
+        # Os cookies do fixture estão na chave: galeria/português podem ir para o cache
+        cache.key_cookies |= {"ed_view", "ed_lang"}
+        cache.accept = None
+    session = make_session(workers, cookies_file=None, cache=cache)
+    session.cookies.set("ed_view", "2")
+    session.cookies.set("ed_lang", "nEN")
+
+    # Sem navegador no fallback: só contamos quantas edições precisariam dele
+    start = time.perf_counter()
+    results = scrape_editions(urls, workers, session, fallback=lambda u: ("", []), profiler=profiler)
+    elapsed = time.perf_counter() - start
+    http_ok = sum(1 for *_, mode in results.values() if mode == "http")
+    cards = sum(len(c) for _, c, mode in results.values() if mode == "http")
+    print(f"HTTP:      {http_ok / elapsed:8.1f} edições/s  ({http_ok} edições, {cards} cartas, {elapsed:.2f}s, "
+          f"{editions - http_ok} iriam para o fallback)")
+
+    if browser:
+        start = time.perf_counter()
+        for url in urls[:browser]:
+            scrape_ligamagic_list_view_en(url, headless=True, slow_mo=0, screenshots=False, cache=cache)
+        elapsed = time.perf_counter() - start
+        print(f"Playwright:{browser / elapsed:8.1f} edições/s  ({browser} edições, {elapsed:.2f}s)")
+    server.shutdown()
+    if cache is not None and cache.enabled:
+        print(cache.summary())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraper LigaMagic (lista/inglês)")
+    parser.add_argument("urls", nargs="*", help="URLs de edição (padrão: exemplo TLE)")
+    parser.add_argument("--fast", action="store_true", help="HTTP primeiro, Playwright só como fallback")
+    parser.add_argument("--workers", type=int, default=POOL_SIZE)
+    parser.add_argument("--bench", action="store_true", help="mede edições/s contra um servidor local de fixtures")
+    parser.add_argument("--editions", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=300)
+    parser.add_argument("--js-every", type=int, default=25, help="1 a cada N edições só tem tabela via JS")
+    parser.add_argument("--browser", type=int, default=0, help="edições a medir também com Playwright")
+    parser.add_argument("--cache", choices=MODES, default=CACHE_MODE, help="record/replay em disco (http_cache.py)")
+    parser.add_argument("--cache-ttl", type=int, default=CACHE_TTL, help="segundos (modo auto)")
+    parser.add_argument("--profile", action="store_true", help="CPU/memória por etapa em profiles/ (scripts/profiling.py)")
+    args = parser.parse_args()
+    cache = make_cache(args.cache, args.cache_ttl)
+    profiler = None
+    if args.profile:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+        from profiling import Profiler
+        profiler = Profiler("ligamagic_scraper")
+
+    if args.bench:
+        bench(args.editions, args.rows, args.workers, args.js_every, args.browser, cache, profiler)
+    elif args.fast:
+        start = time.perf_counter()
+        results = scrape_editions(args.urls or [URL], args.workers, cache=cache, profiler=profiler)
+        elapsed = time.perf_counter() - start
+        for url, (title, cards, mode) in results.items():
+            print(f"[{mode}] {title}: {len(cards)} cartas  ({url})")
+        print(f"{len(results) / elapsed:.1f} edições/s | {cache.summary()}")
+    else:
+        # Replay não depende do site: roda sem slow_mo nem screenshots
+        replay = args.cache == "replay"
+        with profiler.stage("browser") if profiler else nullcontext():
+            title, cards = scrape_ligamagic_list_view_en(
+                args.urls[0] if args.urls else URL,
+                headless=replay, slow_mo=0 if replay else 400, screenshots=not replay, cache=cache,
+            )
+
+        print("Coleção:", title)
+        print("Total de cartas:", len(cards))
+        print("-" * 40)
+        for c in cards[:20]:
+            print(f"{c.name}  |  R$ {c.price_min:.2f}")
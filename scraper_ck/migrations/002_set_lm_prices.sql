@@ -0,0 +1,19 @@
+-- Bulk update of cards.lm_sell_brl: one call per edition from edition_scheduler.py
+-- (only rows whose price actually changed are touched)
+CREATE OR REPLACE FUNCTION public.set_lm_prices(p_ids BIGINT[], p_prices NUMERIC[])
+RETURNS INTEGER
+LANGUAGE sql
+SECURITY DEFINER SET search_path = public
+AS $$
+    WITH changed AS (
+        UPDATE cards c
+        SET lm_sell_brl = v.price
+        FROM unnest(p_ids, p_prices) AS v(id, price)
+        WHERE c.id = v.id
+          AND c.lm_sell_brl IS DISTINCT FROM v.price
+        RETURNING 1
+    )
+    SELECT count(*)::INTEGER FROM changed;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.set_lm_prices(BIGINT[], NUMERIC[]) TO service_role;
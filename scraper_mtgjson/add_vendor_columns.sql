@@ -1,4 +1,6 @@
 ALTER TABLE public.card_prices 
 ADD COLUMN IF NOT EXISTS tcgplayer_market_usd NUMERIC,
+ADD COLUMN IF NOT EXISTS tcgplayer_market_foil_usd NUMERIC,
 ADD COLUMN IF NOT EXISTS cardmarket_avg_eur NUMERIC,
+ADD COLUMN IF NOT EXISTS cardmarket_avg_foil_eur NUMERIC,
 ADD COLUMN IF NOT EXISTS mtgo_cardhoarder_tix NUMERIC;
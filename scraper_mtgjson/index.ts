@@ -33,7 +33,9 @@ interface CardPrice {
     ck_buylist_foil_usd: number | null;
     ck_buylist_foil_credit: number | null;
     tcgplayer_market_usd: number | null;
+    tcgplayer_market_foil_usd: number | null;
     cardmarket_avg_eur: number | null;
+    cardmarket_avg_foil_eur: number | null;
     mtgo_cardhoarder_tix: number | null;
 }
 
@@ -227,17 +229,21 @@ async function main() {
         // Checking doc: paper.tcgplayer.retail.normal.market?
         // IF pData.paper.tcgplayer exists
         let tcgplayer_market_usd: number | null = null;
+        let tcgplayer_market_foil_usd: number | null = null;
         const tcg = pData?.paper?.tcgplayer;
         if (tcg && tcg.retail) {
             // We try 'normal' first
             if (tcg.retail.normal) tcgplayer_market_usd = getPrice(tcg.retail.normal);
+            if (tcg.retail.foil) tcgplayer_market_foil_usd = getPrice(tcg.retail.foil);
         }
 
         // Cardmarket Extraction
         let cardmarket_avg_eur: number | null = null;
+        let cardmarket_avg_foil_eur: number | null = null;
         const cm = pData?.paper?.cardmarket;
         if (cm && cm.retail) {
             if (cm.retail.normal) cardmarket_avg_eur = getPrice(cm.retail.normal);
+            if (cm.retail.foil) cardmarket_avg_foil_eur = getPrice(cm.retail.foil);
         }
 
         // MTGO Cardhoarder
@@ -248,7 +254,8 @@ async function main() {
         }
 
         // Check availability
-        if (ck_buylist_usd === null && ck_buylist_foil_usd === null && tcgplayer_market_usd === null && cardmarket_avg_eur === null) continue;
+        if (ck_buylist_usd === null && ck_buylist_foil_usd === null && tcgplayer_market_usd === null && tcgplayer_market_foil_usd === null
+            && cardmarket_avg_eur === null && cardmarket_avg_foil_eur === null) continue;
 
         // Add to Updates (Card Prices Table)
         updates.push({
@@ -258,7 +265,9 @@ async function main() {
             ck_buylist_foil_usd,
             ck_buylist_foil_credit,
             tcgplayer_market_usd,
+            tcgplayer_market_foil_usd,
             cardmarket_avg_eur,
+            cardmarket_avg_foil_eur,
             mtgo_cardhoarder_tix
         });
 
@@ -0,0 +1,208 @@
+"""Plain vs monthly-partitioned price_history on a synthetic dataset.
+
+Needs a direct Postgres connection (DATABASE_URL, e.g. a local Postgres or the
+Supabase connection string) and psycopg2. Everything is created in a scratch
+schema `bench_price_history` that is dropped at the end (--keep to keep it).
+
+Measures, for each layout:
+  - upsert latency of a 2000-row batch (daily pattern: today's date;
+    backfill pattern: random dates)
+  - chart query latency (one card, last 365 days)
+  - exact count(*) vs pg_class estimate
+then runs the retention downsample on the partitioned copy and measures again.
+
+    python bench_partitioning.py [--cards 5000] [--days 730] [--runs 30]
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import date, timedelta
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCHEMA = 'bench_price_history'
+BATCH_ROWS = 2000
+COLUMNS = '(card_id, source, price_type, price_raw, currency, fx_rate_to_brl, price_brl, scraped_at)'
+UPSERT = f"""
+    INSERT INTO {{table}} {COLUMNS} VALUES %s
+    ON CONFLICT (card_id, source, scraped_at, price_type) DO UPDATE SET
+        price_raw = EXCLUDED.price_raw,
+        price_brl = EXCLUDED.price_brl
+"""
+CHART = """
+    SELECT scraped_at, price_brl FROM {table}
+    WHERE card_id = %s AND scraped_at >= %s
+    ORDER BY scraped_at
+"""
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def create_tables(cur, first_month, months):
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+    body = """(
+        id BIGSERIAL,
+        card_id BIGINT NOT NULL,
+        source TEXT NOT NULL,
+        price_type TEXT NOT NULL,
+        price_raw NUMERIC,
+        currency TEXT,
+        fx_rate_to_brl NUMERIC,
+        price_brl NUMERIC,
+        scraped_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        {pk},
+        UNIQUE (card_id, source, scraped_at, price_type)
+    )"""
+    cur.execute(f"CREATE TABLE {SCHEMA}.plain {body.format(pk='PRIMARY KEY (id)')}")
+    cur.execute(f"CREATE TABLE {SCHEMA}.partitioned {body.format(pk='PRIMARY KEY (id, scraped_at)')} "
+                f"PARTITION BY RANGE (scraped_at)")
+    m = first_month
+    for _ in range(months + 1):
+        nxt = (m.replace(day=28) + timedelta(days=4)).replace(day=1)
+        cur.execute(f"CREATE TABLE {SCHEMA}.p_{m:%Y_%m} PARTITION OF {SCHEMA}.partitioned "
+                    f"FOR VALUES FROM ('{m}') TO ('{nxt}')")
+        m = nxt
+    for table in ('plain', 'partitioned'):
+        cur.execute(f"CREATE INDEX ON {SCHEMA}.{table} (card_id, scraped_at)")
+
+
+def populate(cur, cards, start_day, days):
+    print(f"Generating {cards} cards x {days} days x 2 price types = {cards * days * 2:,} rows per table...")
+    t = time.perf_counter()
+    for table in ('plain', 'partitioned'):
+        cur.execute(f"""
+            INSERT INTO {SCHEMA}.{table} {COLUMNS}
+            SELECT c, 'CardKingdom', pt, p, 'USD', 5.5, p * 5.5 + 0.30, %s::date + d
+            FROM generate_series(1, %s) c,
+                 generate_series(0, %s - 1) d,
+                 unnest(ARRAY['buy', 'sell']) pt,
+                 LATERAL (SELECT round((1 + (c % 97) + sin(d / 7.0) * 0.5)::numeric, 2) AS p) price
+        """, (start_day, cards, days))
+        cur.execute(f"ANALYZE {SCHEMA}.{table}")
+    print(f"  done in {time.perf_counter() - t:.1f}s\n")
+
+
+def batch(cards, day_fn):
+    rows = []
+    for _ in range(BATCH_ROWS // 2):
+        card, d = random.randint(1, cards), day_fn()
+        p = round(random.uniform(0.5, 100), 2)
+        rows.append((card, 'CardKingdom', 'buy', p, 'USD', 5.5, p * 5.5 + 0.3, d))
+        rows.append((card, 'CardKingdom', 'sell', p, 'USD', 5.5, p * 5.5 + 0.3, d))
+    # One row per conflict key per statement
+    return list({(r[0], r[2], r[7]): r for r in rows}.values())
+
+
+def measure(conn, table, cards, first_day, last_day, runs):
+    cur = conn.cursor()
+    qualified = f"{SCHEMA}.{table}"
+    span = (last_day - first_day).days
+
+    def upsert(day_fn):
+        # Batches are built up front so only the round-trip is timed
+        batches = iter([batch(cards, day_fn) for _ in range(runs)])
+        sql = UPSERT.format(table=qualified)
+        return timed(lambda: (execute_values(cur, sql, next(batches), page_size=BATCH_ROWS), conn.commit()), runs)
+
+    daily = upsert(lambda: last_day)
+    backfill = upsert(lambda: first_day + timedelta(days=random.randint(0, span)))
+    chart_from = last_day - timedelta(days=365)
+    chart = timed(lambda: (cur.execute(CHART.format(table=qualified), (random.randint(1, cards), chart_from)),
+                           cur.fetchall()), runs)
+    exact = timed(lambda: (cur.execute(f"SELECT count(*) FROM {qualified}"), cur.fetchone()), 3)
+    # Partitioned parents have no tuples of their own: sum the leaf partitions
+    pattern = 'p\\_%' if table == 'partitioned' else table
+    estimate = timed(lambda: (cur.execute(
+        "SELECT sum(c.reltuples) FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = %s AND c.relkind = 'r' AND c.relname LIKE %s",
+        (SCHEMA, pattern)), cur.fetchone()), 3)
+    cur.execute(f"SELECT count(*) FROM {qualified}")
+    total = cur.fetchone()[0]
+
+    print(f"{table:<24} rows {total:>11,}")
+    print(f"  upsert daily     p50 {daily[0]:8.1f} ms   p95 {daily[1]:8.1f} ms   ({BATCH_ROWS} rows)")
+    print(f"  upsert backfill  p50 {backfill[0]:8.1f} ms   p95 {backfill[1]:8.1f} ms")
+    print(f"  chart 365d       p50 {chart[0]:8.1f} ms   p95 {chart[1]:8.1f} ms")
+    print(f"  count exact      p50 {exact[0]:8.1f} ms   | estimate p50 {estimate[0]:6.1f} ms")
+
+
+def downsample(cur, first_day, keep_from):
+    """Same logic as downsample_price_history_month, applied to every month before keep_from"""
+    m = first_day.replace(day=1)
+    while m < keep_from:
+        nxt = (m.replace(day=28) + timedelta(days=4)).replace(day=1)
+        cur.execute(f"""
+            CREATE TEMP TABLE _weekly ON COMMIT DROP AS
+            SELECT card_id, source, price_type,
+                   GREATEST(date_trunc('week', scraped_at), %(s)s::timestamptz) AS scraped_at,
+                   AVG(price_raw) AS price_raw, MAX(currency) AS currency,
+                   AVG(fx_rate_to_brl) AS fx_rate_to_brl, AVG(price_brl) AS price_brl
+            FROM {SCHEMA}.partitioned WHERE scraped_at >= %(s)s AND scraped_at < %(e)s
+            GROUP BY 1, 2, 3, 4;
+            DELETE FROM {SCHEMA}.partitioned WHERE scraped_at >= %(s)s AND scraped_at < %(e)s;
+            INSERT INTO {SCHEMA}.partitioned {COLUMNS}
+            SELECT card_id, source, price_type, price_raw, currency, fx_rate_to_brl, price_brl, scraped_at
+            FROM _weekly;
+        """, {'s': m, 'e': nxt})
+        cur.connection.commit()
+        m = nxt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--keep-months', type=int, default=12, help='retention window for the "after" run')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch schema')
+    args = parser.parse_args()
+
+    random.seed(42)
+    last_day = date.today()
+    first_day = last_day - timedelta(days=args.days - 1)
+    months = (last_day.year - first_day.year) * 12 + last_day.month - first_day.month + 1
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    cur = conn.cursor()
+    try:
+        create_tables(cur, first_day.replace(day=1), months)
+        populate(cur, args.cards, first_day, args.days)
+        conn.commit()
+
+        print("== Before: single table ==")
+        measure(conn, 'plain', args.cards, first_day, last_day, args.runs)
+        print("\n== After: monthly partitions ==")
+        measure(conn, 'partitioned', args.cards, first_day, last_day, args.runs)
+
+        years, month = divmod(last_day.month - 1 - args.keep_months, 12)
+        keep_from = date(last_day.year + years, month + 1, 1)
+        print(f"\n== After: partitions + retention (daily rows kept from {keep_from}) ==")
+        downsample(cur, first_day, keep_from)
+        conn.autocommit = True
+        cur.execute(f"VACUUM ANALYZE {SCHEMA}.partitioned")
+        conn.autocommit = False
+        measure(conn, 'partitioned', args.cards, first_day, last_day, args.runs)
+    finally:
+        conn.rollback()
+        if not args.keep:
+            conn.autocommit = True
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
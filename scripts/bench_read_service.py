@@ -0,0 +1,148 @@
+"""Load test for price_read_service.py: p50/p95/p99 latency under concurrency.
+
+By default it starts the service in-process on a simulated backend (fixed
+query latency, Zipf-like card popularity) and runs the same load with the
+cache off and on. --url points it at a running service instead.
+
+    python bench_read_service.py [--requests 5000] [--concurrency 32] [--cards 20000] [--backend-ms 40]
+    python bench_read_service.py --url http://127.0.0.1:8787
+"""
+import argparse
+import bisect
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import urlparse
+from price_read_service import PriceReadService
+
+
+class FakeBackend:
+    """Sleeps like a PostgREST round-trip and returns a plausible payload"""
+
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _hit(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+    def series(self, card_id, start, end, granularity=None):
+        self._hit()
+        d = date.fromisoformat(start)
+        days = (date.fromisoformat(end) - d).days + 1
+        rows = [{'scraped_at': (d + timedelta(days=i)).isoformat(), 'source': 'CardKingdom',
+                 'price_type': t, 'price_brl': round(5 + (card_id % 50) + i * 0.01, 2)}
+                for i in range(days) for t in ('buy', 'sell')]
+        return {'card_id': card_id, 'granularity': granularity or 'day', 'rows': rows}
+
+    def summary(self, card_id):
+        self._hit()
+        return {'id': card_id, 'name': f"Card {card_id}", 'ck_buy_brl': 10.0, 'ck_retail_brl': 15.0}
+
+
+def zipf_sampler(n, s=1.1, seed=42):
+    """Card ids 1..n, popular ones far more often (like card page views)"""
+    cum = list(itertools.accumulate(1 / (k ** s) for k in range(1, n + 1)))
+    rng = random.Random(seed)
+    return lambda: bisect.bisect_left(cum, rng.random() * cum[-1]) + 1
+
+
+def run_load(base_url, total, concurrency, cards, series_share=0.7):
+    url = urlparse(base_url)
+    pick = zipf_sampler(cards)
+    end = date.today()
+    start = (end - timedelta(days=90)).isoformat()
+    paths = []
+    for i in range(total):
+        card_id = pick()
+        if i % 10 < series_share * 10:
+            paths.append(f"/cards/{card_id}/series?start={start}&end={end.isoformat()}")
+        else:
+            paths.append(f"/cards/{card_id}/summary")
+
+    local = threading.local()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(path):
+        nonlocal errors
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+        t = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            res = conn.getresponse()
+            res.read()
+            ok = res.status == 200
+        except (OSError, http.client.HTTPException):
+            local.conn = None
+            ok = False
+        elapsed = (time.perf_counter() - t) * 1000
+        with lock:
+            latencies.append(elapsed)
+            errors += not ok
+
+    start_t = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, paths))
+    wall = time.perf_counter() - start_t
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+    return {'p50': pct(0.50), 'p95': pct(0.95), 'p99': pct(0.99), 'rps': total / wall, 'errors': errors}
+
+
+def fetch_stats(base_url):
+    url = urlparse(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=10)
+    conn.request('GET', '/stats')
+    return json.loads(conn.getresponse().read())
+
+
+def report(label, r, extra=''):
+    print(f"{label:<14} p50 {r['p50']:7.1f} ms  p95 {r['p95']:7.1f} ms  p99 {r['p99']:7.1f} ms  "
+          f"{r['rps']:8.0f} req/s  errors {r['errors']}  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Read service load test')
+    parser.add_argument('--url', help='running service; default: in-process service on a fake backend')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--cards', type=int, default=20000)
+    parser.add_argument('--backend-ms', type=float, default=40, help='simulated query latency')
+    parser.add_argument('--cache-mb', type=float, default=16)
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.cards} cards (Zipf)\n")
+    if args.url:
+        report('service', run_load(args.url, args.requests, args.concurrency, args.cards))
+        print(fetch_stats(args.url))
+        return
+
+    for label, mb in (('no cache', 0), ('LRU cache', args.cache_mb)):
+        backend = FakeBackend(args.backend_ms)
+        service = PriceReadService(backend, max_bytes=int(mb * 1024 * 1024))
+        server = service.serve(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+        result = run_load(base, args.requests, args.concurrency, args.cards)
+        stats = service.cache.snapshot()
+        report(label, result, f"backend calls {backend.calls}  hits {stats['hits']}  "
+                              f"coalesced {stats['coalesced']}  evictions {stats['evictions']}")
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Bytes-on-wire and encode cost per row for PriceSink batches.
+
+Offline: builds synthetic price_history batches shaped like the importers'
+output and times each encoder, with and without gzip.
+
+    python bench_serialization.py [rows_per_batch] [batches]
+"""
+import gzip
+import random
+import sys
+import time
+from price_sink import ENCODERS, PRICE_COLUMNS, orjson
+
+BATCH_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+BATCHES = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+GZIP_LEVELS = (1, 3, 6)
+FIXED_RATE = 5.50
+
+
+def synthetic_batch(n, seed):
+    """~90 days of buy/sell points per card, like a full-history import"""
+    rnd = random.Random(seed)
+    rows = []
+    card_id = rnd.randint(1, 500000)
+    day = 0
+    while len(rows) < n:
+        price_usd = round(rnd.uniform(0.05, 80.0), 2)
+        scraped_at = f"2025-{1 + day // 28 % 12:02d}-{1 + day % 28:02d}"
+        for price_type in ('buy', 'sell'):
+            rows.append((card_id, 'CardKingdom', price_type, price_usd, 'USD',
+                         FIXED_RATE, (price_usd * FIXED_RATE) + 0.30, scraped_at))
+        day += 1
+        if day == 90:
+            card_id, day = rnd.randint(1, 500000), 0
+    return rows[:n]
+
+
+def bench(name, encode, batches):
+    start = time.perf_counter()
+    bodies = [encode(PRICE_COLUMNS, rows) for rows in batches]
+    encode_s = time.perf_counter() - start
+    total_rows = sum(len(b) for b in batches)
+    raw = sum(len(b) for b in bodies)
+
+    print(f"{name:<9} encode {encode_s / total_rows * 1e6:6.2f} us/row | raw {raw / total_rows:6.1f} B/row", end='')
+    for level in GZIP_LEVELS:
+        start = time.perf_counter()
+        packed = sum(len(gzip.compress(b, compresslevel=level)) for b in bodies)
+        gzip_s = time.perf_counter() - start
+        print(f" | gz{level} {packed / total_rows:5.1f} B/row +{gzip_s / total_rows * 1e6:5.2f} us", end='')
+    print()
+
+
+def main():
+    batches = [synthetic_batch(BATCH_ROWS, seed) for seed in range(BATCHES)]
+    print(f"{BATCHES} batches x {BATCH_ROWS} rows (orjson {'available' if orjson else 'NOT installed'})\n")
+    for name, encode in ENCODERS.items():
+        if name == 'orjson' and not orjson:
+            continue
+        bench(name, encode, batches)
+
+
+if __name__ == '__main__':
+    main()
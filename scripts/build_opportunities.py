@@ -0,0 +1,177 @@
+import os
+import sys
+from datetime import datetime, timezone
+import numpy as np
+import requests
+from dotenv import load_dotenv
+from supabase_client import get_client, fetch_all
+from price_constants import FIXED_COST_BRL, DEFAULT_USD_BRL
+
+sys.stdout.reconfigure(line_buffering=True)
+load_dotenv()
+
+TOP_N = int(os.getenv('OPPORTUNITIES_TOP_N', 5000))
+DEFAULT_EUR_BRL = 6.00
+
+
+def get_fx_rates():
+    """USD->BRL and EUR->BRL from the same API the frontend uses"""
+    try:
+        response = requests.get('https://economia.awesomeapi.com.br/last/USD-BRL,EUR-BRL', timeout=10)
+        data = response.json()
+        return float(data['USDBRL']['bid']), float(data['EURBRL']['bid'])
+    except Exception as e:
+        print(f"FX fetch failed ({e}), using defaults")
+        return DEFAULT_USD_BRL, DEFAULT_EUR_BRL
+
+
+def _column(rows, key):
+    """Pull one numeric column out of a list of dicts as float64 (NaN for missing)"""
+    return np.array([r.get(key) if r.get(key) is not None else np.nan for r in rows], dtype=np.float64)
+
+
+def load_price_arrays(client):
+    """Load cards + card_prices and align them into parallel arrays indexed by card"""
+    cards = fetch_all(client, 'all_cards',
+                      'id, name, set_name, set_code, collector_number, collector_number_normalized, '
+                      'liga_magic_url, mtgjson_uuid, is_foil, lm_sell_brl')
+    prices = fetch_all(client, 'card_prices',
+                       'mtgjson_uuid, ck_buylist_usd, ck_buylist_foil_usd, '
+                       'tcgplayer_market_usd, tcgplayer_market_foil_usd, '
+                       'cardmarket_avg_eur, cardmarket_avg_foil_eur, updated_at', key='mtgjson_uuid')
+
+    # Join on the uuid string once, in memory, instead of casting per row in SQL
+    price_index = {str(p['mtgjson_uuid']): i for i, p in enumerate(prices)}
+    idx = np.array([price_index.get(str(c['mtgjson_uuid']), -1) for c in cards], dtype=np.int64)
+    has_price = idx >= 0
+    safe_idx = np.where(has_price, idx, 0)
+
+    def aligned(key):
+        col = _column(prices, key) if prices else np.full(1, np.nan)
+        out = col[safe_idx]
+        out[~has_price] = np.nan
+        return out
+
+    is_foil = np.array([bool(c.get('is_foil')) for c in cards], dtype=bool)
+
+    def finish(normal_key, foil_key):
+        # Every price of a row is for the row's own finish: a foil never compares to a non-foil price
+        return np.where(is_foil, aligned(foil_key), aligned(normal_key))
+
+    return {
+        'cards': cards,
+        'prices': prices,
+        'price_idx': idx,
+        'ck_usd': finish('ck_buylist_usd', 'ck_buylist_foil_usd'),
+        'lm_brl': _column(cards, 'lm_sell_brl'),
+        'tcg_usd': finish('tcgplayer_market_usd', 'tcgplayer_market_foil_usd'),
+        'cm_eur': finish('cardmarket_avg_eur', 'cardmarket_avg_foil_eur'),
+        'is_foil': is_foil,
+    }
+
+
+def compute_opportunities(arrays, usd_brl, eur_brl, top_n=TOP_N):
+    """Vectorized spread/ROI math. Returns (order, metrics) for the top_n cards by ROI"""
+    ck_usd = arrays['ck_usd']
+    lm_brl = arrays['lm_brl']
+    tcg_usd = arrays['tcg_usd']
+    cm_eur = arrays['cm_eur']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        revenue_brl = ck_usd * usd_brl
+        cost_brl = lm_brl + FIXED_COST_BRL
+        profit_brl = revenue_brl - cost_brl
+        roi = profit_brl / cost_brl
+        ck_tcg_ratio = np.where(tcg_usd > 0, ck_usd / tcg_usd, np.nan)
+        ck_cm_ratio = np.where(cm_eur > 0, revenue_brl / (cm_eur * eur_brl), np.nan)
+
+    valid = (ck_usd > 0) & (lm_brl > 0) & np.isfinite(roi)
+    candidates = np.flatnonzero(valid)
+    if len(candidates) > top_n:
+        # argpartition keeps this O(n) even on the full catalogue
+        part = np.argpartition(-roi[candidates], top_n - 1)[:top_n]
+        candidates = candidates[part]
+    order = candidates[np.argsort(-roi[candidates], kind='stable')]
+
+    metrics = {
+        'revenue_brl': revenue_brl,
+        'cost_brl': cost_brl,
+        'profit_brl': profit_brl,
+        'roi': roi,
+        'ck_tcg_ratio': ck_tcg_ratio,
+        'ck_cardmarket_ratio': ck_cm_ratio,
+    }
+    return order, metrics
+
+
+def _num(value):
+    """NaN -> None, numpy float -> rounded python float"""
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+
+def build_rows(arrays, order, metrics, usd_brl, eur_brl, computed_at):
+    """Materialize the ranked slice into dicts for the opportunities table"""
+    cards = arrays['cards']
+    prices = arrays['prices']
+    rows = []
+    for rank, i in enumerate(order, 1):
+        card = cards[i]
+        p_idx = arrays['price_idx'][i]
+        rows.append({
+            'id': card['id'],
+            'name': card.get('name'),
+            'set_name': card.get('set_name'),
+            'set_code': card.get('set_code'),
+            'collector_number': card.get('collector_number'),
+            'collector_number_normalized': card.get('collector_number_normalized'),
+            'liga_magic_url': card.get('liga_magic_url'),
+            'mtgjson_uuid': str(card['mtgjson_uuid']) if card.get('mtgjson_uuid') else None,
+            'is_foil': bool(arrays['is_foil'][i]),
+            'ck_buylist_usd': _num(arrays['ck_usd'][i]),
+            'lm_sell_brl': _num(arrays['lm_brl'][i]),
+            'tcgplayer_market_usd': _num(arrays['tcg_usd'][i]),
+            'cardmarket_avg_eur': _num(arrays['cm_eur'][i]),
+            'usd_brl': usd_brl,
+            'eur_brl': eur_brl,
+            'revenue_brl': _num(metrics['revenue_brl'][i]),
+            'cost_brl': _num(metrics['cost_brl'][i]),
+            'profit_brl': _num(metrics['profit_brl'][i]),
+            'roi': _num(metrics['roi'][i]),
+            'ck_tcg_ratio': _num(metrics['ck_tcg_ratio'][i]),
+            'ck_cardmarket_ratio': _num(metrics['ck_cardmarket_ratio'][i]),
+            'rank': rank,
+            'price_updated_at': prices[p_idx].get('updated_at') if p_idx >= 0 else None,
+            'computed_at': computed_at,
+        })
+    return rows
+
+
+def write_opportunities(client, rows):
+    """Swap in the new ranking in one transaction (replace_opportunities): readers see the
+    previous run or this one, never a mix or a half-written table"""
+    return client.rpc('replace_opportunities', {'p_rows': rows}).execute().data
+
+
+def refresh_opportunities(client):
+    """Full rebuild: load -> compute -> write. Safe to call at the end of any importer"""
+    start = datetime.now()
+    usd_brl, eur_brl = get_fx_rates()
+    print(f"Opportunities: FX USD={usd_brl:.4f} EUR={eur_brl:.4f}")
+
+    arrays = load_price_arrays(client)
+    loaded = (datetime.now() - start).total_seconds()
+    print(f"Opportunities: loaded {len(arrays['cards'])} cards / {len(arrays['prices'])} prices in {loaded:.1f}s")
+
+    order, metrics = compute_opportunities(arrays, usd_brl, eur_brl)
+    computed_at = datetime.now(timezone.utc).isoformat()
+    rows = build_rows(arrays, order, metrics, usd_brl, eur_brl, computed_at)
+    write_opportunities(client, rows)
+
+    total = (datetime.now() - start).total_seconds()
+    print(f"Opportunities: wrote top {len(rows)} in {total:.1f}s")
+    return len(rows)
+
+
+if __name__ == '__main__':
+    refresh_opportunities(get_client())
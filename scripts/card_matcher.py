@@ -0,0 +1,230 @@
+"""In-memory matcher from scraped / user-typed card names to `cards` rows.
+
+Built once from the cards table (or a local cache file) and then fully
+offline: exact hash lookup on a normalized name, narrowed by set code and
+collector number when given, with a trigram fallback for typos and
+punctuation differences. Double-faced cards are indexed by the full
+"Front // Back" name and by each half.
+
+    python card_matcher.py names.txt [--set TLE] [--cache cards_index.json.gz]
+
+names.txt: one name per line, optionally "name;set_code;collector_number".
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+FUZZY_MIN_SCORE = 0.6
+AMBIGUOUS_MARGIN = 0.05  # Fuzzy hits this close to the best one make the match ambiguous
+CARD_COLUMNS = 'id, name, set_code, collector_number, is_foil'
+
+_PUNCT = re.compile(r"[^\w\s/]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_name(name):
+    """Case, accents and punctuation folded: "Æther Vial" / "aether vial" -> "aether vial" """
+    text = unicodedata.normalize('NFKD', name.replace('Æ', 'Ae').replace('æ', 'ae'))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = text.replace("'", '').replace('’', '').replace('-', ' ')
+    text = _PUNCT.sub(' ', text)
+    text = _SPACES.sub(' ', text).strip()
+    return re.sub(r'\s*//\s*', ' // ', text)
+
+
+def normalize_collector_number(value):
+    """'007' -> '7', '12a' -> '12a' (same idea as collector_number_normalized)"""
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    return text.lstrip('0') or text
+
+
+def name_keys(name):
+    """Keys a card is reachable by: full name plus each DFC/split half"""
+    full = normalize_name(name)
+    keys = {full}
+    if ' // ' in full:
+        keys.update(part for part in full.split(' // ') if part)
+    return keys
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class CardRef:
+    id: int
+    name: str
+    set_code: str
+    collector_number: str
+    is_foil: bool
+
+
+@dataclass
+class MatchResult:
+    query: str
+    status: str  # 'exact' | 'fuzzy' | 'ambiguous' | 'none'
+    cards: list = field(default_factory=list)
+    score: float = 0.0
+    matched_name: str = ''
+
+    @property
+    def card(self):
+        return self.cards[0] if self.status in ('exact', 'fuzzy') else None
+
+
+class CardIndex:
+    def __init__(self, rows):
+        self.by_key = defaultdict(list)
+        for row in rows:
+            ref = CardRef(
+                id=row['id'],
+                name=row['name'],
+                set_code=(row.get('set_code') or '').upper(),
+                collector_number=normalize_collector_number(row.get('collector_number')),
+                is_foil=bool(row.get('is_foil')),
+            )
+            for key in name_keys(row['name']):
+                self.by_key[key].append(ref)
+
+        # Trigram postings over the distinct name keys only
+        self.keys = list(self.by_key)
+        self.key_grams = [trigrams(k) for k in self.keys]
+        self.postings = defaultdict(list)
+        for key_id, grams in enumerate(self.key_grams):
+            for gram in grams:
+                self.postings[gram].append(key_id)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_db(cls, client):
+        from supabase_client import fetch_all
+        return cls(fetch_all(client, 'cards', CARD_COLUMNS))
+
+    @classmethod
+    def from_cache(cls, path, client=None):
+        """Load rows from a local gzip JSON cache, fetching (and saving) it on first use"""
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return cls(json.load(f))
+        from supabase_client import get_client, fetch_all
+        rows = fetch_all(client or get_client(), 'cards', CARD_COLUMNS)
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(rows, f)
+        return cls(rows)
+
+    def _filter(self, refs, set_code, collector_number):
+        if set_code:
+            refs = [r for r in refs if r.set_code == set_code.upper()]
+        if collector_number is not None:
+            number = normalize_collector_number(collector_number)
+            refs = [r for r in refs if r.collector_number == number]
+        return refs
+
+    def _fuzzy(self, key, limit=5):
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        scored = []
+        for key_id, n in shared.most_common(limit * 10):
+            # Dice coefficient on trigram sets
+            scored.append((2 * n / (len(grams) + len(self.key_grams[key_id])), self.keys[key_id]))
+        scored.sort(reverse=True)
+        return scored[:limit]
+
+    def match(self, name, set_code=None, collector_number=None):
+        key = normalize_name(name)
+        refs = self.by_key.get(key)
+        if refs:
+            status, score, matched = 'exact', 1.0, key
+        else:
+            candidates = [(s, k) for s, k in self._fuzzy(key) if s >= FUZZY_MIN_SCORE]
+            if not candidates:
+                return MatchResult(name, 'none')
+            score, matched = candidates[0]
+            close = [k for s, k in candidates if score - s <= AMBIGUOUS_MARGIN]
+            if len(close) > 1:
+                refs = [r for k in close for r in self._filter(self.by_key[k], set_code, collector_number)]
+                return MatchResult(name, 'ambiguous', refs, score, matched)
+            status, refs = 'fuzzy', self.by_key[matched]
+
+        refs = self._filter(refs, set_code, collector_number)
+        if not refs:
+            return MatchResult(name, 'none', [], score, matched)
+        # Foil / non-foil rows of the same printing are one match
+        printings = {(r.set_code, r.collector_number) for r in refs}
+        if len(printings) > 1:
+            return MatchResult(name, 'ambiguous', refs, score, matched)
+        return MatchResult(name, status, refs, score, matched)
+
+    def match_many(self, queries):
+        """queries: iterable of name or (name, set_code, collector_number)"""
+        cache = {}
+        results = []
+        for q in queries:
+            q = (q, None, None) if isinstance(q, str) else tuple(q) + (None,) * (3 - len(q))
+            if q not in cache:
+                cache[q] = self.match(*q)
+            results.append(cache[q])
+        return results
+
+
+def _read_queries(path, default_set):
+    queries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            parts = [p.strip() or None for p in line.rstrip('\n').split(';')]
+            if not parts[0]:
+                continue
+            name = parts[0]
+            set_code = parts[1] if len(parts) > 1 else default_set
+            number = parts[2] if len(parts) > 2 else None
+            queries.append((name, set_code or default_set, number))
+    return queries
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='Match card names against the cards table')
+    parser.add_argument('names')
+    parser.add_argument('--set', dest='set_code')
+    parser.add_argument('--cache', default='cards_index.json.gz')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = CardIndex.from_cache(args.cache)
+    print(f"Index: {len(index)} name keys in {time.perf_counter() - start:.2f}s")
+
+    queries = _read_queries(args.names, args.set_code)
+    start = time.perf_counter()
+    results = index.match_many(queries)
+    elapsed = time.perf_counter() - start
+
+    counts = Counter(r.status for r in results)
+    for r in results:
+        if r.status == 'ambiguous':
+            options = ', '.join(f"{c.set_code} #{c.collector_number}" for c in r.cards[:6])
+            print(f"AMBIGUOUS  {r.query!r} -> {r.matched_name!r} [{options}]")
+        elif r.status == 'none':
+            print(f"NO MATCH   {r.query!r}")
+        elif r.status == 'fuzzy':
+            print(f"FUZZY      {r.query!r} -> {r.card.name!r} ({r.score:.2f})")
+    rate = len(results) / elapsed if elapsed > 0 else 0
+    print(f"\n{len(results)} names in {elapsed * 1000:.0f} ms ({rate:,.0f}/s) | {dict(counts)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,12 @@
 import os
-from supabase import create_client
 from dotenv import load_dotenv
+from supabase_client import get_client
+from price_health import fetch_health
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
+supabase = get_client()
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-res = supabase.table('price_history').select('count', count='exact').limit(1).execute()
-print(f"Price History Count: {res.count}")
+# Planner estimate instead of count='exact' (full scan); details: price_health.py
+health = fetch_health(supabase)
+print(f"Price History Count: ~{health['estimated_rows']} (estimate)")
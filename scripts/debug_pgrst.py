@@ -1,7 +1,6 @@
-import os
 import time
-from supabase import create_client
 from dotenv import load_dotenv
+from supabase_client import get_client, SUPABASE_URL
 
 # Force unbuffered output
 import sys
@@ -9,11 +8,8 @@ sys.stdout.reconfigure(encoding='utf-8')
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
-
 print(f"Connecting to {SUPABASE_URL}...")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = get_client()
 
 def run_test():
     try:
@@ -0,0 +1,97 @@
+"""Cards users look at, imported before the long tail (import_prices_daily.py).
+
+The hot set is the union of the sources in HOT_SET_SOURCES:
+    tracked        every card in user_tracked_cards
+    viewed         cards opened in the last HOT_VIEW_DAYS days (card_views)
+    opportunities  top HOT_TOP_N of the opportunities ranking
+    spreads        top HOT_TOP_N of spread_backtest
+
+A source that cannot be read (e.g. table not created yet) is skipped with a
+warning; the import then just has a smaller hot set. Once the hot set is
+written and summarized, publish_marker() stores the 'prices_hot_set_fresh'
+key in system_settings so the UI can tell today's prices are in for them.
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+HOT_SET_SOURCES = os.getenv('HOT_SET_SOURCES', 'tracked,viewed,opportunities,spreads').split(',')
+HOT_TOP_N = int(os.getenv('HOT_TOP_N', 500))
+HOT_VIEW_DAYS = int(os.getenv('HOT_VIEW_DAYS', 7))
+MARKER_KEY = 'prices_hot_set_fresh'
+PAGE_SIZE = 1000
+
+
+def _column(query, column, limit=None):
+    """Values of one column, paged; stops after `limit` rows when given"""
+    values = []
+    offset = 0
+    while limit is None or offset < limit:
+        size = PAGE_SIZE if limit is None else min(PAGE_SIZE, limit - offset)
+        page = query().range(offset, offset + size - 1).execute().data
+        values.extend(row[column] for row in page)
+        if len(page) < size:
+            break
+        offset += size
+    return values
+
+
+def _tracked(client):
+    return _column(lambda: client.table('user_tracked_cards').select('card_id').order('card_id'), 'card_id')
+
+
+def _viewed(client):
+    since = (datetime.now(timezone.utc) - timedelta(days=HOT_VIEW_DAYS)).isoformat()
+    return _column(lambda: client.table('card_views').select('card_id')
+                   .gte('viewed_at', since).order('viewed_at', desc=True), 'card_id', limit=20 * HOT_TOP_N)
+
+
+def _opportunities(client):
+    return _column(lambda: client.table('opportunities').select('id').order('rank'), 'id', limit=HOT_TOP_N)
+
+
+def _spreads(client):
+    return _column(lambda: client.table('spread_backtest').select('card_id').order('rank'), 'card_id',
+                   limit=HOT_TOP_N)
+
+
+SOURCES = {
+    'tracked': _tracked,
+    'viewed': _viewed,
+    'opportunities': _opportunities,
+    'spreads': _spreads,
+}
+
+
+def load_hot_set(client, sources=HOT_SET_SOURCES):
+    """Returns (set of card_ids, {source: count})"""
+    hot = set()
+    counts = {}
+    for name in (s.strip() for s in sources):
+        if not name:
+            continue
+        if name not in SOURCES:
+            raise ValueError(f"Unknown hot set source: {name}")
+        try:
+            ids = SOURCES[name](client)
+        except Exception as e:
+            print(f"Hot set: skipping '{name}' ({e})")
+            continue
+        counts[name] = len(set(ids))
+        hot.update(ids)
+    return hot, counts
+
+
+def publish_marker(client, day, cards, seconds):
+    """Tell readers the hot set has `day` prices; value is JSON"""
+    value = json.dumps({
+        'date': day,
+        'cards': cards,
+        'seconds': round(seconds, 1),
+        'fresh_at': datetime.now(timezone.utc).isoformat(),
+    })
+    client.table('system_settings').upsert({
+        'key': MARKER_KEY,
+        'value': value,
+        'updated_at': datetime.now(timezone.utc).isoformat(),
+    }, on_conflict='key').execute()
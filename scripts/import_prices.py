@@ -1,49 +1,42 @@
+import argparse
 import json
 import os
+import sys
 import time
 from datetime import datetime
-from supabase import create_client
 from dotenv import load_dotenv
 import requests
+from supabase_client import get_client, health_check, is_schema_cache_error, reload_schema_cache
+from price_rollups import RollupTracker
+from price_sink import PriceSink, FileSink
+from price_partitions import PartitionRouter
+from price_constants import FIXED_COST_BRL, DEFAULT_USD_BRL
+from import_shards import Shard, parse_shard, CHECKPOINT_EVERY
+from profiling import Profiler
 
 # Load environment variables
 load_dotenv()
 
-SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
 PRICES_FILE = r'e:\Dev\App - Boost Homebroker\data\AllPrices.json'
 DRY_RUN = os.getenv('DRY_RUN', 'false').lower() == 'true'
+# Write the rows to numbered chunk files instead of the DB (upload with load_price_chunks.py)
+EXPORT_DIR = os.getenv('EXPORT_DIR')
 MAX_CARDS = int(os.getenv('MAX_CARDS', 0)) or None
 BATCH_SIZE = 500  # Reduced batch size for stability
 
-# Global client
-supabase = None
-
-def get_supabase():
-    global supabase
-    if not supabase:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    return supabase
-
-def refresh_supabase():
-    global supabase
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    return supabase
-
 # Stats
 stats = {
     'cards_processed': 0,
-    'prices_queued': 0,
-    'prices_inserted': 0,
     'cards_updated': 0,
     'unmatched': 0,
     'no_price': 0,
     'fx_fetched': 0,
-    'retries': 0
+    'retries': 0,
+    'errors': 0  # cards skipped by an exception: their rows may be missing, a shard merge refuses them
 }
 
 fx_cache = {}
-price_history_buffer = []
+rollups = RollupTracker()
 
 def normalize_uuid(uuid_str):
     """Convert UUID to standard format with dashes if needed"""
@@ -55,13 +48,11 @@ def normalize_uuid(uuid_str):
 
 def get_fx_rate(date):
     """Get USD->BRL exchange rate - using fixed rate for performance"""
-    FIXED_RATE = 5.50  # Average USD/BRL rate
-    
     if date in fx_cache:
         return fx_cache[date]
     
-    fx_cache[date] = FIXED_RATE
-    return FIXED_RATE
+    fx_cache[date] = DEFAULT_USD_BRL
+    return DEFAULT_USD_BRL
 
 def execute_with_retry(operation_name, func, max_retries=3):
     """Execute a function with retry logic"""
@@ -74,35 +65,22 @@ def execute_with_retry(operation_name, func, max_retries=3):
                 print(f"Error in {operation_name} after {max_retries} attempts: {e}")
                 raise e
             
-            # If it's a schema cache error, refresh client
-            if 'PGRST204' in str(e) or 'schema cache' in str(e):
-                print(f"Schema cache error detected. Refreshing client...")
-                refresh_supabase()
+            # Stale schema cache is server-side: reload it, keep the pooled client
+            if is_schema_cache_error(e):
+                print(f"Schema cache error detected. Reloading schema cache...")
+                reload_schema_cache()
             
             time.sleep(1 * (attempt + 1)) # Exponential backoff
 
-def flush_price_buffer():
-    """Insert buffered prices into database"""
-    if not price_history_buffer:
-        return
+def track_rollups(rows, columns):
+    """Called by the sink after each successful batch"""
+    rollups.track(rows, columns)
+    rollups.refresh_if_full(get_client())
 
-    if DRY_RUN:
-        stats['prices_inserted'] += len(price_history_buffer)
-        price_history_buffer.clear()
-        return
-
-    def do_insert():
-        client = get_supabase()
-        data = price_history_buffer[:]
-        client.table('price_history').upsert(data, on_conflict='card_id,source,scraped_at,price_type').execute()
-        stats['prices_inserted'] += len(data)
-
-    try:
-        execute_with_retry("flush_price_buffer", do_insert)
-    except Exception as e:
-        print(f"Failed to flush buffer: {e}")
-    finally:
-        price_history_buffer.clear()
+if EXPORT_DIR:
+    sink = FileSink(EXPORT_DIR, batch_size=BATCH_SIZE)
+else:
+    sink = PriceSink(batch_size=BATCH_SIZE, dry_run=DRY_RUN, on_written=track_rollups, before_write=PartitionRouter())
 
 def process_card_prices(compact_uuid, price_data):
     """Process prices for a single card UUID"""
@@ -110,13 +88,14 @@ def process_card_prices(compact_uuid, price_data):
         normalized_uuid = normalize_uuid(compact_uuid)
         
         def find_card():
-            client = get_supabase()
+            client = get_client()
             return client.table('cards').select('id, is_foil, name, set_code').eq('mtgjson_uuid', normalized_uuid).execute()
 
         # Find card variants in database
         try:
             result = execute_with_retry("find_card", find_card)
-        except:
+        except Exception:
+            stats['errors'] += 1
             return # Skip if can't find card after retries
         
         if not result.data:
@@ -149,18 +128,9 @@ def process_card_prices(compact_uuid, price_data):
                     continue
                 
                 fx_rate = get_fx_rate(date)
-                price_brl = (price_usd * fx_rate) + 0.30
+                price_brl = (price_usd * fx_rate) + FIXED_COST_BRL
                 
-                price_history_buffer.append({
-                    'card_id': variant['id'],
-                    'source': 'CardKingdom',
-                    'price_type': 'buy',
-                    'price_raw': price_usd,
-                    'currency': 'USD',
-                    'fx_rate_to_brl': fx_rate,
-                    'price_brl': price_brl,
-                    'scraped_at': date
-                })
+                sink.add_point(variant['id'], 'CardKingdom', 'buy', price_usd, 'USD', fx_rate, price_brl, date)
                 
                 if date > latest_buy['date']:
                     latest_buy = {'date': date, 'usd': price_usd, 'brl': price_brl}
@@ -172,32 +142,20 @@ def process_card_prices(compact_uuid, price_data):
                     continue
                 
                 fx_rate = get_fx_rate(date)
-                price_brl = (price_usd * fx_rate) + 0.30
+                price_brl = (price_usd * fx_rate) + FIXED_COST_BRL
                 
-                price_history_buffer.append({
-                    'card_id': variant['id'],
-                    'source': 'CardKingdom',
-                    'price_type': 'sell',
-                    'price_raw': price_usd,
-                    'currency': 'USD',
-                    'fx_rate_to_brl': fx_rate,
-                    'price_brl': price_brl,
-                    'scraped_at': date
-                })
+                sink.add_point(variant['id'], 'CardKingdom', 'sell', price_usd, 'USD', fx_rate, price_brl, date)
 
                 if date > latest_retail['date']:
                     latest_retail = {'date': date, 'usd': price_usd, 'brl': price_brl}
-            
-            # Flush buffer if full
-            if len(price_history_buffer) >= BATCH_SIZE:
-                flush_price_buffer()
 
             # Update card with latest prices (only if we have new data)
             if latest_buy['date'] or latest_retail['date']:
                 has_updates = True
-                if not DRY_RUN:
+                # Export runs stay off the DB: update_cards_prices.py fills cards after the load
+                if not DRY_RUN and not EXPORT_DIR:
                     def update_card():
-                        client = get_supabase()
+                        client = get_client()
                         update_data = {}
                         if latest_buy['date']:
                             update_data.update({
@@ -217,71 +175,118 @@ def process_card_prices(compact_uuid, price_data):
 
                     try:
                         execute_with_retry("update_card", update_card)
-                    except:
-                        pass # Ignore update error, price history is more important
+                    except Exception:
+                        # Keep going, price history is more important; still counted as an error
+                        stats['errors'] += 1
 
         if has_updates:
             stats['cards_updated'] += 1
     
     except Exception as e:
+        stats['errors'] += 1
         print(f"Error processing {compact_uuid}: {e}")
 
+def save_checkpoint(shard, processed):
+    """Flush rows (and rollups) first: a resumed shard must not skip unwritten cards"""
+    sink.checkpoint()
+    if not EXPORT_DIR and not DRY_RUN:
+        rollups.refresh(get_client())
+    shard.save(processed, {'rows': sink.stats['rows'], 'failed_rows': sink.stats['failed_rows'],
+                           'quarantined': sink.stats['quarantined'], 'unmatched': stats['unmatched'],
+                           'errors': stats['errors']})
+
 def main():
+    global sink
+    parser = argparse.ArgumentParser(description='Full CardKingdom price history import')
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help='import only shard i of N (see import_shards.py)')
+    parser.add_argument('--profile', action='store_true', help='CPU / memory report per stage (profiling.py)')
+    args = parser.parse_args()
+    profiler = Profiler('import_prices', enabled=args.profile)
+
     print(f"Starting price import from file... (Dry Run: {DRY_RUN})")
     print(f"File: {PRICES_FILE}")
     if MAX_CARDS:
         print(f"TEST MODE: Limited to {MAX_CARDS} cards")
     
-    # Initialize client
-    get_supabase()
+    # Warm up the pooled client and fail fast if the DB is unreachable
+    ok, latency, error = health_check()
+    if not ok:
+        print(f"Supabase health check failed: {error}")
+        sys.exit(1)
+    print(f"Supabase OK ({latency:.0f} ms)")
     
     start_time = datetime.now()
     
     # Load JSON file
     print("Loading JSON file...")
-    with open(PRICES_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    with profiler.stage('load_json'):
+        with open(PRICES_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
     
     prices_data = data.get('data', {})
-    total_uuids = len(prices_data)
-    print(f"Loaded {total_uuids} card UUIDs")
+    uuids = list(prices_data)
+    print(f"Loaded {len(uuids)} card UUIDs")
+    
+    shard = None
+    if args.shard:
+        shard = Shard(*args.shard, persist=not DRY_RUN)
+        uuids = shard.select(prices_data)
+        if EXPORT_DIR:
+            # Keep the chunks behind the shard checkpoint; a shard starting over rewrites its directory
+            sink = FileSink(os.path.join(EXPORT_DIR, shard.label), batch_size=BATCH_SIZE, resume=shard.resumed > 0)
+    total_uuids = len(uuids)
     
     # Process each UUID
-    for i, (uuid, price_data) in enumerate(prices_data.items(), 1):
-        if MAX_CARDS and stats['cards_processed'] >= MAX_CARDS:
-            print(f"Reached max cards limit: {MAX_CARDS}")
-            break
+    with profiler.stage('process'):
+        for i, uuid in enumerate(uuids, 1):
+            if MAX_CARDS and stats['cards_processed'] >= MAX_CARDS:
+                print(f"Reached max cards limit: {MAX_CARDS}")
+                break
         
-        process_card_prices(uuid, price_data)
-        stats['cards_processed'] += 1
+            process_card_prices(uuid, prices_data[uuid])
+            stats['cards_processed'] += 1
+            if shard and i % CHECKPOINT_EVERY == 0:
+                save_checkpoint(shard, i)
         
-        # Progress update every 1000 cards
-        if i % 1000 == 0:
-            elapsed = (datetime.now() - start_time).total_seconds()
-            rate = i / elapsed if elapsed > 0 else 0
-            print(f"\n--- Progress ---")
-            print(f"Cards: {i}/{total_uuids} ({i/total_uuids*100:.1f}%)")
-            print(f"Prices Inserted: {stats['prices_inserted']} | Rate: {rate:.1f} cards/s")
-            print(f"Unmatched: {stats['unmatched']} | No Price: {stats['no_price']} | Retries: {stats['retries']}\n")
-            
-            # Refresh client periodically to avoid stale connections
-            if i % 5000 == 0:
-                refresh_supabase()
+            # Progress update every 1000 cards
+            if i % 1000 == 0:
+                elapsed = (datetime.now() - start_time).total_seconds()
+                rate = i / elapsed if elapsed > 0 else 0
+                print(f"\n--- Progress ---")
+                print(f"Cards: {i}/{total_uuids} ({i/total_uuids*100:.1f}%)")
+                print(f"Prices Inserted: {sink.stats['rows']} | Rate: {rate:.1f} cards/s")
+                print(f"Unmatched: {stats['unmatched']} | No Price: {stats['no_price']} | Retries: {stats['retries'] + sink.stats['retries']}\n")
     
     # Flush remaining prices
-    flush_price_buffer()
+    with profiler.stage('finalize'):
+        sink.close()
+        if EXPORT_DIR:
+            print(f"Exported {len(sink.chunks)} chunk(s) to {EXPORT_DIR}: python load_price_chunks.py {EXPORT_DIR}")
+        elif not DRY_RUN:
+            print("Refreshing weekly/monthly rollups...")
+            rollups.refresh(get_client())
+        if shard:
+            save_checkpoint(shard, stats['cards_processed'])
+            print(f"{shard.label}: {shard.state['done']}/{shard.state['expected']} cards"
+                  + (" (complete)" if shard.state['complete'] else ""))
     
     total_time = (datetime.now() - start_time).total_seconds()
     
     print("\n=== Import Complete ===")
     print(f"Time: {total_time:.1f}s ({total_time/60:.1f} min)")
     print(f"Cards processed: {stats['cards_processed']}")
-    print(f"Prices inserted: {stats['prices_inserted']}")
+    print(f"Prices inserted: {sink.stats['rows']} (failed: {sink.stats['failed_rows']})")
+    if sink.quarantine_path:
+        print(f"Quarantined rows: {sink.stats['quarantined']} -> {sink.quarantine_path}")
+    print(f"Payload: {sink.stats['bytes_raw'] / 1e6:.1f} MB encoded, {sink.stats['bytes_sent'] / 1e6:.1f} MB sent")
     print(f"Cards updated: {stats['cards_updated']}")
     print(f"Unmatched cards: {stats['unmatched']}")
     print(f"Skipped (no price): {stats['no_price']}")
+    print(f"Errors: {stats['errors']}")
     print(f"FX rates fetched: {stats['fx_fetched']}")
-    print(f"Total retries: {stats['retries']}")
+    print(f"Total retries: {stats['retries'] + sink.stats['retries']}")
+    profiler.close()
 
 if __name__ == '__main__':
     main()
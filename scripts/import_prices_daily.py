@@ -2,22 +2,54 @@ import json
 import os
 import sys
 from datetime import datetime, date
-from supabase import create_client
 from dotenv import load_dotenv
 import requests
+from build_opportunities import refresh_opportunities
+from supabase_client import get_client, fetch_all
+from price_rollups import RollupTracker
+from price_alerts import AlertTracker
+from price_health import StatsTracker
+from price_read_service import ChangedCardsTracker
+from price_sink import PriceSink, FileSink
+from price_partitions import PartitionRouter
+from price_constants import FIXED_COST_BRL, DEFAULT_USD_BRL
+from hot_set import load_hot_set, publish_marker
+from profiling import Profiler
 
 sys.stdout.reconfigure(line_buffering=True)
 load_dotenv()
 
-SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
-PRICES_FILE = r'e:\Dev\App - Boost Homebroker\data\AllPricesToday.json'
+PRICES_FILE = os.getenv('PRICES_FILE', r'e:\Dev\App - Boost Homebroker\data\AllPricesToday.json')
 BATCH_SIZE = 2000
+# Qualquer valor liga: nada é gravado (preços, cards, rollups, alertas, marcador)
+DRY_RUN = bool(os.getenv('DRY_RUN'))
+# Grava os preços em chunks (load_price_chunks.py) em vez do banco; nada mais é gravado
+EXPORT_DIR = os.getenv('EXPORT_DIR')
+# Só leitura no banco: exportação ou dry run
+READ_ONLY = DRY_RUN or bool(EXPORT_DIR)
+# Cards acompanhados / vistos / no topo do ranking primeiro (hot_set.py); PRIORITY_IMPORT=0 desliga
+PRIORITY_IMPORT = os.getenv('PRIORITY_IMPORT', '1') != '0'
+# --profile: tempo/memória por etapa em profiles/ (profiling.py)
+profiler = Profiler('import_prices_daily', enabled='--profile' in sys.argv[1:])
 
-stats = {'cards': 0, 'prices': 0, 'updated': 0}
-price_buffer = []
+stats = {'cards': 0, 'updated': 0}
+rollups = RollupTracker()
+alerts = AlertTracker()
+day_stats = StatsTracker()
+changed = ChangedCardsTracker()
 uuid_map = {}
 
+def on_written(rows, columns):
+    rollups.track(rows, columns)
+    alerts.track(rows, columns)
+    day_stats.track(rows, columns)
+    changed.track(rows, columns)
+
+if EXPORT_DIR:
+    sink = FileSink(EXPORT_DIR, batch_size=BATCH_SIZE)
+else:
+    sink = PriceSink(batch_size=BATCH_SIZE, dry_run=DRY_RUN, on_written=on_written, before_write=PartitionRouter())
+
 def normalize_uuid(s):
     if len(s) == 36: return s
     if len(s) == 32: return f"{s[:8]}-{s[8:12]}-{s[12:16]}-{s[16:20]}-{s[20:]}"
@@ -29,56 +61,43 @@ def get_today_fx_rate():
     try:
         response = requests.get(f'https://api.exchangerate.host/{today}?base=USD&symbols=BRL', timeout=10)
         data = response.json()
-        rate = data.get('rates', {}).get('BRL', 5.50)
+        rate = data.get('rates', {}).get('BRL', DEFAULT_USD_BRL)
         print(f"Taxa do dia ({today}): R$ {rate:.4f}")
         return rate
     except:
-        print("Erro ao buscar taxa, usando R$ 5.50")
-        return 5.50
-
-def flush():
-    if not price_buffer: return
-    try:
-        supabase.table('price_history').upsert(
-            price_buffer[:], 
-            on_conflict='card_id,source,scraped_at,price_type'
-        ).execute()
-        stats['prices'] += len(price_buffer)
-    except Exception as e:
-        print(f"Erro no flush: {e}")
-    price_buffer.clear()
+        print(f"Erro ao buscar taxa, usando R$ {DEFAULT_USD_BRL:.2f}")
+        return DEFAULT_USD_BRL
 
 print("Iniciando importação diária...")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = get_client()
 
 # Buscar taxa de câmbio de hoje
 fx_rate = get_today_fx_rate()
 today = date.today().isoformat()
 
 print("Carregando UUIDs do banco...")
-result = supabase.table('cards').select('id, mtgjson_uuid, is_foil').execute()
-for card in result.data:
-    uuid = str(card['mtgjson_uuid'])
-    if uuid not in uuid_map:
-        uuid_map[uuid] = []
-    uuid_map[uuid].append((card['id'], card['is_foil']))
+with profiler.stage('load_uuids'):
+    for card in fetch_all(supabase, 'cards', 'id, mtgjson_uuid, is_foil, ck_buy_usd'):
+        # Preço anterior: alertas só avaliam cards cujo buylist mudou
+        if card['ck_buy_usd'] is not None:
+            alerts.previous[card['id']] = float(card['ck_buy_usd'])
+        uuid = str(card['mtgjson_uuid'])
+        if uuid not in uuid_map:
+            uuid_map[uuid] = []
+        uuid_map[uuid].append((card['id'], card['is_foil']))
 print(f"Carregados {len(uuid_map)} UUIDs únicos\n")
 
 print(f"Carregando {PRICES_FILE}...")
-with open(PRICES_FILE, 'r', encoding='utf-8') as f:
-    data = json.load(f)
+with profiler.stage('load_json'):
+    with open(PRICES_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
 
 prices_data = data.get('data', {})
 print(f"Arquivo: {len(prices_data)} entries\n")
 
-start = datetime.now()
-for uuid, price_data in prices_data.items():
-    norm_uuid = normalize_uuid(uuid)
-    if not norm_uuid or norm_uuid not in uuid_map:
-        continue
-    
+def import_card(norm_uuid, price_data):
     ck = price_data.get('paper', {}).get('cardkingdom', {})
-    if not ck: continue
+    if not ck: return
     
     buylist = ck.get('buylist', {})
     retail = ck.get('retail', {})
@@ -89,20 +108,11 @@ for uuid, price_data in prices_data.items():
         # Processar buylist de hoje
         buy_price = buylist.get(finish, {}).get(today)
         if buy_price and isinstance(buy_price, (int, float)):
-            price_brl = (buy_price * fx_rate) + 0.30
-            price_buffer.append({
-                'card_id': card_id,
-                'source': 'CardKingdom',
-                'price_type': 'buy',
-                'price_raw': buy_price,
-                'currency': 'USD',
-                'fx_rate_to_brl': fx_rate,
-                'price_brl': price_brl,
-                'scraped_at': today
-            })
+            price_brl = (buy_price * fx_rate) + FIXED_COST_BRL
+            sink.add_point(card_id, 'CardKingdom', 'buy', buy_price, 'USD', fx_rate, price_brl, today)
             
             # Atualizar tabela cards com preço atual
-            if not os.getenv('DRY_RUN'):
+            if not READ_ONLY:
                 supabase.table('cards').update({
                     'ck_buy_usd': buy_price,
                     'ck_buy_brl': price_brl,
@@ -113,35 +123,81 @@ for uuid, price_data in prices_data.items():
         # Processar retail de hoje
         retail_price = retail.get(finish, {}).get(today)
         if retail_price and isinstance(retail_price, (int, float)):
-            price_brl = (retail_price * fx_rate) + 0.30
-            price_buffer.append({
-                'card_id': card_id,
-                'source': 'CardKingdom',
-                'price_type': 'sell',
-                'price_raw': retail_price,
-                'currency': 'USD',
-                'fx_rate_to_brl': fx_rate,
-                'price_brl': price_brl,
-                'scraped_at': today
-            })
+            price_brl = (retail_price * fx_rate) + FIXED_COST_BRL
+            sink.add_point(card_id, 'CardKingdom', 'sell', retail_price, 'USD', fx_rate, price_brl, today)
             
             # Atualizar tabela cards com preço atual
-            if not os.getenv('DRY_RUN'):
+            if not READ_ONLY:
                 supabase.table('cards').update({
                     'ck_retail_usd': retail_price,
                     'ck_retail_brl': price_brl,
                     'ck_last_update': today
                 }).eq('id', card_id).execute()
-        
-        if len(price_buffer) >= BATCH_SIZE:
-            flush()
     
     stats['cards'] += 1
 
-flush()
+def finish_batch():
+    """Grava o que está no buffer e atualiza rollups / cache / alertas dos cards gravados até aqui"""
+    sink.flush()
+    if READ_ONLY:
+        return
+    # Atualizar só os buckets semanais/mensais tocados
+    rollups.refresh(supabase)
+    # Cache do price_read_service (se READ_SERVICE_URL estiver definido)
+    changed.notify()
+    # Alertas: só os cards com preço novo, contra todos os usuários de uma vez
+    print(f"Alertas disparados: {alerts.evaluate(supabase)}")
+
+start = datetime.now()
+todo = []
+for uuid in prices_data:
+    norm_uuid = normalize_uuid(uuid)
+    if norm_uuid and norm_uuid in uuid_map:
+        todo.append((uuid, norm_uuid))
+
+hot_set = set()
+if PRIORITY_IMPORT:
+    hot_set, hot_counts = load_hot_set(supabase)
+    print(f"Hot set: {len(hot_set)} cards {hot_counts}")
+
+if hot_set:
+    with profiler.stage('hot_set'):
+        hot = [(u, n) for u, n in todo if any(card_id in hot_set for card_id, _ in uuid_map[n])]
+        hot_uuids = {u for u, _ in hot}
+        todo = [(u, n) for u, n in todo if u not in hot_uuids]
+        for uuid, norm_uuid in hot:
+            import_card(norm_uuid, prices_data[uuid])
+        finish_batch()
+        hot_seconds = (datetime.now() - start).total_seconds()
+        if not READ_ONLY:
+            publish_marker(supabase, today, stats['cards'], hot_seconds)
+        print(f"Hot set atualizado em {hot_seconds:.1f}s ({stats['cards']} UUIDs), seguindo com {len(todo)} restantes\n")
+
+with profiler.stage('long_tail'):
+    for uuid, norm_uuid in todo:
+        import_card(norm_uuid, prices_data[uuid])
+    finish_batch()
+
+# Contagem por dia usada pelo price_health.py
+if not READ_ONLY:
+    day_stats.refresh(supabase)
+sink.close()
+if EXPORT_DIR:
+    print(f"Exportados {len(sink.chunks)} chunk(s) em {EXPORT_DIR}: python load_price_chunks.py {EXPORT_DIR} "
+          "e depois update_cards_prices.py")
 
 elapsed = (datetime.now() - start).total_seconds()
 print(f"\n✅ Importação diária concluída em {elapsed:.1f}s")
 print(f"Cards processados: {stats['cards']}")
-print(f"Preços inseridos: {stats['prices']}")
+print(f"Preços inseridos: {sink.stats['rows']} (falhas: {sink.stats['failed_rows']})")
+if sink.quarantine_path:
+    print(f"Linhas em quarentena: {sink.stats['quarantined']} -> {sink.quarantine_path}")
 print(f"Cards atualizados: {stats['updated']}")
+
+# Recalcular ranking de oportunidades com os preços novos
+# (pipeline.py roda isso como etapa própria, depois do update_cards_prices)
+with profiler.stage('opportunities'):
+    if not READ_ONLY and not os.getenv('SKIP_OPPORTUNITIES'):
+        refresh_opportunities(supabase)
+
+profiler.close()
@@ -1,41 +1,41 @@
+import argparse
 import json
 import os
 import time
 import sys
 from datetime import datetime, date
-from supabase import create_client
 from dotenv import load_dotenv
+from supabase_client import get_client, health_check
+from price_rollups import RollupTracker
+from price_sink import PriceSink, FileSink
+from price_partitions import PartitionRouter
+from price_constants import FIXED_COST_BRL, DEFAULT_USD_BRL
+from import_shards import Shard, parse_shard, CHECKPOINT_EVERY
+from profiling import Profiler
 
 # Force unbuffered output
 sys.stdout.reconfigure(line_buffering=True)
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
 PRICES_FILE = r'e:\Dev\App - Boost Homebroker\data\AllPrices.json'
 DRY_RUN = os.getenv('DRY_RUN', 'false').lower() == 'true'
+# Write the rows to numbered chunk files instead of the DB (upload with load_price_chunks.py)
+EXPORT_DIR = os.getenv('EXPORT_DIR')
 MAX_CARDS = int(os.getenv('MAX_CARDS', 0)) or None
 BATCH_SIZE = 1000
-FIXED_RATE = 5.50  # Taxa fixa para histórico
+FIXED_RATE = DEFAULT_USD_BRL  # Taxa fixa para histórico
 
 # Stats
 stats = {
     'cards_processed': 0,
-    'prices_inserted': 0,
     'cards_updated': 0,
     'unmatched': 0,
-    'no_price': 0
+    'no_price': 0,
+    'errors': 0  # cards skipped by an exception: a shard merge refuses them
 }
 
-price_history_buffer = []
-supabase = None
-
-def get_supabase():
-    global supabase
-    if not supabase:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    return supabase
+rollups = RollupTracker()
 
 def normalize_uuid(uuid_str):
     if len(uuid_str) == 36:
@@ -44,30 +44,20 @@ def normalize_uuid(uuid_str):
         return f"{uuid_str[:8]}-{uuid_str[8:12]}-{uuid_str[12:16]}-{uuid_str[16:20]}-{uuid_str[20:]}"
     raise ValueError(f"Invalid UUID: {uuid_str}")
 
-def flush_buffer():
-    if not price_history_buffer or DRY_RUN:
-        if DRY_RUN:
-            stats['prices_inserted'] += len(price_history_buffer)
-        price_history_buffer.clear()
-        return
-    
-    try:
-        client = get_supabase()
-        client.table('price_history').upsert(
-            price_history_buffer[:],
-            on_conflict='card_id,source,scraped_at,price_type'
-        ).execute()
-        stats['prices_inserted'] += len(price_history_buffer)
-    except Exception as e:
-        print(f"Buffer flush error: {e}")
-    finally:
-        price_history_buffer.clear()
+def track_rollups(rows, columns):
+    rollups.track(rows, columns)
+    rollups.refresh_if_full(get_client())
+
+if EXPORT_DIR:
+    sink = FileSink(EXPORT_DIR, batch_size=BATCH_SIZE)
+else:
+    sink = PriceSink(batch_size=BATCH_SIZE, dry_run=DRY_RUN, on_written=track_rollups, before_write=PartitionRouter())
 
 def process_card(uuid, price_data):
     try:
         norm_uuid = normalize_uuid(uuid)
         
-        client = get_supabase()
+        client = get_client()
         result = client.table('cards').select('id, is_foil').eq('mtgjson_uuid', norm_uuid).execute()
         
         if not result.data:
@@ -89,83 +79,111 @@ def process_card(uuid, price_data):
             for date_str, price_usd in buylist.get(finish, {}).items():
                 if not isinstance(price_usd, (int, float)):
                     continue
-                price_brl = (price_usd * FIXED_RATE) + 0.30
-                price_history_buffer.append({
-                    'card_id': variant['id'],
-                    'source': 'CardKingdom',
-                    'price_type': 'buy',
-                    'price_raw': price_usd,
-                    'currency': 'USD',
-                    'fx_rate_to_brl': FIXED_RATE,
-                    'price_brl': price_brl,
-                    'scraped_at': date_str
-                })
+                price_brl = (price_usd * FIXED_RATE) + FIXED_COST_BRL
+                sink.add_point(variant['id'], 'CardKingdom', 'buy', price_usd, 'USD', FIXED_RATE, price_brl, date_str)
             
             # Processar retail
             for date_str, price_usd in retail.get(finish, {}).items():
                 if not isinstance(price_usd, (int, float)):
                     continue
-                price_brl = (price_usd * FIXED_RATE) + 0.30
-                price_history_buffer.append({
-                    'card_id': variant['id'],
-                    'source': 'CardKingdom',
-                    'price_type': 'sell',
-                    'price_raw': price_usd,
-                    'currency': 'USD',
-                    'fx_rate_to_brl': FIXED_RATE,
-                    'price_brl': price_brl,
-                    'scraped_at': date_str
-                })
-            
-            if len(price_history_buffer) >= BATCH_SIZE:
-                flush_buffer()
+                price_brl = (price_usd * FIXED_RATE) + FIXED_COST_BRL
+                sink.add_point(variant['id'], 'CardKingdom', 'sell', price_usd, 'USD', FIXED_RATE, price_brl, date_str)
         
         stats['cards_updated'] += 1
         
     except Exception as e:
+        stats['errors'] += 1
         print(f"Error {uuid}: {e}")
 
+def save_checkpoint(shard, processed):
+    """Flush rows (and rollups) first: a resumed shard must not skip unwritten cards"""
+    sink.checkpoint()
+    if not EXPORT_DIR and not DRY_RUN:
+        rollups.refresh(get_client())
+    shard.save(processed, {'rows': sink.stats['rows'], 'failed_rows': sink.stats['failed_rows'],
+                           'quarantined': sink.stats['quarantined'], 'unmatched': stats['unmatched'],
+                           'errors': stats['errors']})
+
 def main():
+    global sink
+    parser = argparse.ArgumentParser(description='Full CardKingdom price history import')
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help='import only shard i of N (see import_shards.py)')
+    parser.add_argument('--profile', action='store_true', help='CPU / memory report per stage (profiling.py)')
+    args = parser.parse_args()
+    profiler = Profiler('import_prices_fast', enabled=args.profile)
+
     print(f"Starting (DRY_RUN={DRY_RUN}, MAX_CARDS={MAX_CARDS or 'ALL'})")
     print(f"Fixed Rate: R$ {FIXED_RATE}")
     
-    get_supabase()
+    # Warm up the pooled client and fail fast if the DB is unreachable
+    ok, latency, error = health_check()
+    if not ok:
+        print(f"Supabase health check failed: {error}")
+        sys.exit(1)
+    print(f"Supabase OK ({latency:.0f} ms)")
     start = datetime.now()
     
     print("Loading JSON...")
-    with open(PRICES_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    with profiler.stage('load_json'):
+        with open(PRICES_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
     
     prices_data = data.get('data', {})
-    total = len(prices_data)
-    print(f"Loaded {total} UUIDs\n")
+    uuids = list(prices_data)
+    print(f"Loaded {len(uuids)} UUIDs\n")
+    
+    shard = None
+    if args.shard:
+        shard = Shard(*args.shard, persist=not DRY_RUN)
+        uuids = shard.select(prices_data)
+        if EXPORT_DIR:
+            # Keep the chunks behind the shard checkpoint; a shard starting over rewrites its directory
+            sink = FileSink(os.path.join(EXPORT_DIR, shard.label), batch_size=BATCH_SIZE, resume=shard.resumed > 0)
+    total = len(uuids)
     
-    for i, (uuid, price_data) in enumerate(prices_data.items(), 1):
-        if MAX_CARDS and stats['cards_processed'] >= MAX_CARDS:
-            break
+    with profiler.stage('process'):
+        for i, uuid in enumerate(uuids, 1):
+            if MAX_CARDS and stats['cards_processed'] >= MAX_CARDS:
+                break
         
-        process_card(uuid, price_data)
-        stats['cards_processed'] += 1
+            process_card(uuid, prices_data[uuid])
+            stats['cards_processed'] += 1
+            if shard and i % CHECKPOINT_EVERY == 0:
+                save_checkpoint(shard, i)
         
-        # Log a cada 500 cards
-        if i % 500 == 0:
-            elapsed = (datetime.now() - start).total_seconds()
-            rate = i / elapsed if elapsed > 0 else 0
-            pct = (i / total) * 100
-            eta_sec = (total - i) / rate if rate > 0 else 0
-            eta_min = eta_sec / 60
+            # Log a cada 500 cards
+            if i % 500 == 0:
+                elapsed = (datetime.now() - start).total_seconds()
+                rate = i / elapsed if elapsed > 0 else 0
+                pct = (i / total) * 100
+                eta_sec = (total - i) / rate if rate > 0 else 0
+                eta_min = eta_sec / 60
             
-            print(f"[{i:>6}/{total}] {pct:5.1f}% | Rate: {rate:5.1f} c/s | Prices: {stats['prices_inserted']:>7} | ETA: {eta_min:>4.0f}min")
-            sys.stdout.flush()
+                print(f"[{i:>6}/{total}] {pct:5.1f}% | Rate: {rate:5.1f} c/s | Prices: {sink.stats['rows']:>7} | ETA: {eta_min:>4.0f}min")
+                sys.stdout.flush()
     
-    flush_buffer()
+    with profiler.stage('finalize'):
+        sink.close()
+        if EXPORT_DIR:
+            print(f"Exported {len(sink.chunks)} chunk(s) to {EXPORT_DIR}: python load_price_chunks.py {EXPORT_DIR}")
+        elif not DRY_RUN:
+            print("Refreshing weekly/monthly rollups...")
+            rollups.refresh(get_client())
+        if shard:
+            save_checkpoint(shard, stats['cards_processed'])
+            print(f"{shard.label}: {shard.state['done']}/{shard.state['expected']} cards"
+                  + (" (complete)" if shard.state['complete'] else ""))
     
     total_time = (datetime.now() - start).total_seconds()
     print(f"\n=== DONE ===")
     print(f"Time: {total_time/60:.1f} min")
     print(f"Cards: {stats['cards_processed']}")
-    print(f"Prices: {stats['prices_inserted']}")
-    print(f"Unmatched: {stats['unmatched']}")
+    print(f"Prices: {sink.stats['rows']} (failed: {sink.stats['failed_rows']})")
+    if sink.quarantine_path:
+        print(f"Quarantined rows: {sink.stats['quarantined']} -> {sink.quarantine_path}")
+    print(f"Unmatched: {stats['unmatched']} | Errors: {stats['errors']}")
+    profiler.close()
 
 if __name__ == '__main__':
     main()
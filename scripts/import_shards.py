@@ -0,0 +1,210 @@
+"""Deterministic sharding of a full AllPrices import across several runners.
+
+    python import_prices_fast.py --shard 1/4        # one per runner, shards are 1-based
+    python import_shards.py merge --shards 4 [--dir import_checkpoints] [--no-summary]
+
+A UUID belongs to shard hash(normalized uuid) % N, so every runner takes the
+same disjoint slice of the same file without talking to the others. Each
+shard keeps its own checkpoint (SHARD_DIR/shard-i-of-N.json), saved only
+after the sink and rollups have been flushed, and a restarted shard resumes
+after the last saved card. The merge step checks that all N checkpoints are
+complete, come from the same file, together cover every UUID and lost no
+rows (failed or quarantined, or cards skipped by a per-card error), and only
+then runs the summary refresh (update_cards_prices.py). In CI, collect the checkpoint files of all matrix
+jobs into one directory before merging.
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+SHARD_DIR = os.getenv('SHARD_DIR', 'import_checkpoints')
+CHECKPOINT_EVERY = 2000  # cards between checkpoints
+
+
+def canonical_uuid(uuid_str):
+    """Same value for compact and dashed, upper and lower case forms"""
+    compact = uuid_str.replace('-', '').lower()
+    if len(compact) != 32:
+        raise ValueError(f"Invalid UUID: {uuid_str}")
+    return compact
+
+
+def shard_of(uuid_str, shards):
+    """0-based shard index; stable across machines and Python runs (no hash())"""
+    digest = hashlib.blake2b(canonical_uuid(uuid_str).encode('ascii'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shards
+
+
+def source_fingerprint(uuids):
+    """Identifies the prices file by its UUID list, so shards of different downloads never merge"""
+    h = hashlib.sha256()
+    for uuid in uuids:
+        h.update(uuid.encode('ascii', 'replace'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+def parse_shard(value):
+    """'2/4' -> (2, 4)"""
+    try:
+        index, count = (int(p) for p in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {index} out of range 1..{count}")
+    return index, count
+
+
+def checkpoint_path(index, count, directory=SHARD_DIR):
+    return os.path.join(directory, f"shard-{index}-of-{count}.json")
+
+
+class Shard:
+    """One shard of an import run and its checkpoint"""
+
+    def __init__(self, index, count, directory=SHARD_DIR, resume=True, persist=True):
+        self.index = index
+        self.count = count
+        self.path = checkpoint_path(index, count, directory)
+        self.resume = resume
+        self.persist = persist
+        self.state = {}
+        self.resumed = 0
+        self.prior_stats = {}
+
+    @property
+    def label(self):
+        return f"shard-{self.index}-of-{self.count}"
+
+    def select(self, prices_data):
+        """UUIDs of this shard still to import, in file order"""
+        uuids = list(prices_data)
+        mine = [u for u in uuids if shard_of(u, self.count) == self.index - 1]
+        source = source_fingerprint(uuids)
+
+        previous = None
+        if self.resume and os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                previous = json.load(f)
+            if previous.get('source') != source:
+                print(f"{self.label}: checkpoint is from another prices file, starting over")
+                previous = None
+
+        self.state = {
+            'shard': self.index,
+            'shards': self.count,
+            'source': source,
+            'total': len(uuids),
+            'expected': len(mine),
+            'done': 0,
+            'complete': False,
+        }
+        if previous:
+            self.resumed = min(previous.get('done', 0), len(mine))
+            self.prior_stats = previous.get('stats', {})
+            self.state.update(done=self.resumed, complete=previous.get('complete', False))
+        print(f"{self.label}: {len(mine)} of {len(uuids)} UUIDs"
+              + (f", resuming after {self.resumed}" if self.resumed else ''))
+        return mine[self.resumed:]
+
+    def save(self, processed, stats=None):
+        """processed / stats: counts of this run (added to the resumed run's).
+        Call only once the rows of those cards are written."""
+        done = self.resumed + processed
+        self.state.update(
+            done=done,
+            complete=done >= self.state['expected'],
+            host=socket.gethostname(),
+            updated_at=datetime.now(timezone.utc).isoformat(),
+        )
+        if stats:
+            self.state['stats'] = {k: self.prior_stats.get(k, 0) + stats.get(k, 0)
+                                   for k in self.prior_stats.keys() | stats.keys()}
+        if not self.persist:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def verify(count, directory=SHARD_DIR):
+    """Problems that block the merge; empty when all shards completed on the same file"""
+    problems = []
+    checkpoints = []
+    for index in range(1, count + 1):
+        path = checkpoint_path(index, count, directory)
+        if not os.path.exists(path):
+            problems.append(f"shard {index}/{count}: no checkpoint ({path})")
+            continue
+        with open(path, encoding='utf-8') as f:
+            cp = json.load(f)
+        checkpoints.append(cp)
+        if not cp.get('complete') or cp.get('done', 0) < cp.get('expected', 0):
+            problems.append(f"shard {index}/{count}: incomplete ({cp.get('done', 0)}/{cp.get('expected')} cards)")
+        lost = {k: cp.get('stats', {}).get(k, 0) for k in ('failed_rows', 'quarantined', 'errors')}
+        if lost['failed_rows'] or lost['quarantined']:
+            problems.append(f"shard {index}/{count}: {lost['failed_rows']} failed / {lost['quarantined']} quarantined "
+                            f"rows (quarantine files on {cp.get('host', '?')})")
+        if lost['errors']:
+            problems.append(f"shard {index}/{count}: {lost['errors']} cards skipped by errors (see its log), "
+                            f"delete its checkpoint and re-run it")
+
+    sources = {cp['source'] for cp in checkpoints}
+    if len(sources) > 1:
+        problems.append(f"shards were run on {len(sources)} different prices files")
+    if checkpoints and not problems:
+        covered = sum(cp['expected'] for cp in checkpoints)
+        total = checkpoints[0]['total']
+        if covered != total:
+            problems.append(f"shards cover {covered} UUIDs, the file has {total}")
+    return problems, checkpoints
+
+
+def merge(count, directory=SHARD_DIR, summary=True):
+    problems, checkpoints = verify(count, directory)
+    if problems:
+        print("Merge blocked:")
+        for p in problems:
+            print(f"  - {p}")
+        return 1
+
+    rows = sum(cp.get('stats', {}).get('rows', 0) for cp in checkpoints)
+    print(f"All {count} shards complete: {checkpoints[0]['total']} UUIDs, {rows} prices written")
+    if not summary:
+        return 0
+    print("Refreshing card price summaries...")
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'update_cards_prices.py')
+    return subprocess.call([sys.executable, script])
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='Sharded import checkpoints')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('status', 'merge'):
+        p = sub.add_parser(name)
+        p.add_argument('--shards', type=int, required=True)
+        p.add_argument('--dir', default=SHARD_DIR)
+    sub.choices['merge'].add_argument('--no-summary', action='store_true', help='verify only')
+    args = parser.parse_args()
+
+    if args.command == 'merge':
+        sys.exit(merge(args.shards, args.dir, summary=not args.no_summary))
+
+    problems, checkpoints = verify(args.shards, args.dir)
+    for cp in checkpoints:
+        print(f"shard {cp['shard']}/{cp['shards']}: {cp['done']}/{cp['expected']} "
+              f"{'complete' if cp['complete'] else 'running'} ({cp.get('host', '?')}, {cp.get('updated_at', '-')})")
+    for p in problems:
+        print(f"  - {p}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Upload an export written by FileSink (EXPORT_DIR=... import_prices*.py).
+
+Chunks are loaded in parallel, one PriceSink per chunk, and recorded in
+loaded.json next to the manifest as they finish, so an interrupted load
+resumes with the chunks still missing. Chunks that had rows quarantined are
+marked partial and only reloaded with --retry-partial.
+
+    python load_price_chunks.py EXPORT_DIR [--workers 4] [--batch-size 2000] [--retry-partial]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from supabase_client import get_client, health_check
+from price_rollups import RollupTracker
+from price_sink import PriceSink, MANIFEST, LOAD_STATE, read_chunk
+from price_partitions import PartitionRouter
+
+
+class ChunkLoader:
+    def __init__(self, directory, workers=4, batch_size=2000):
+        self.directory = directory
+        self.workers = workers
+        self.batch_size = batch_size
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.state_path = os.path.join(directory, LOAD_STATE)
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                self.state = json.load(f)
+        self.rollups = RollupTracker()
+        self.router = PartitionRouter(self.manifest['table'])
+        self.lock = threading.Lock()
+
+    def _save_state(self):
+        with open(self.state_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def _on_written(self, rows, columns):
+        with self.lock:
+            self.rollups.track(rows, columns)
+
+    def _before_write(self, rows, columns):
+        # Shared router: one RPC per new month across all workers
+        with self.lock:
+            self.router(rows, columns)
+
+    def pending(self, retry_partial=False):
+        todo = []
+        for chunk in self.manifest['chunks']:
+            done = self.state.get(chunk['file'])
+            if done and done['sha256'] == chunk['sha256'] and (done['failed'] == 0 or not retry_partial):
+                continue
+            todo.append(chunk)
+        return todo
+
+    def load_chunk(self, chunk):
+        path = os.path.join(self.directory, chunk['file'])
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).hexdigest() != chunk['sha256']:
+                raise ValueError(f"{chunk['file']}: checksum does not match the manifest")
+
+        start = time.perf_counter()
+        columns = self.manifest['columns']
+        sink = PriceSink(
+            table=self.manifest['table'],
+            columns=columns,
+            on_conflict=self.manifest['on_conflict'],
+            batch_size=self.batch_size,
+            on_written=self._on_written,
+            before_write=self._before_write,
+        )
+        for row in read_chunk(path, columns):
+            sink.add_point(*row)
+        stats = sink.close()
+
+        result = {
+            'sha256': chunk['sha256'],
+            'rows': stats['rows'],
+            'failed': stats['failed_rows'] + stats['invalid'],
+            'quarantine': sink.quarantine_path,
+            'seconds': round(time.perf_counter() - start, 2),
+        }
+        with self.lock:
+            self.state[chunk['file']] = result
+            self._save_state()
+        return result
+
+    def run(self, retry_partial=False):
+        todo = self.pending(retry_partial)
+        total_rows = sum(c['rows'] for c in todo)
+        print(f"Chunks: {len(self.manifest['chunks'])} in manifest, {len(todo)} to load ({total_rows:,} rows)")
+        if not self.manifest.get('complete'):
+            print("WARNING: export is not complete yet, loading the chunks written so far")
+
+        start = time.perf_counter()
+        loaded = failed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.load_chunk, c): c for c in todo}
+            for i, future in enumerate(as_completed(futures), 1):
+                chunk = futures[future]
+                try:
+                    r = future.result()
+                except Exception as e:
+                    print(f"[{i}/{len(todo)}] {chunk['file']} FAILED: {e}")
+                    continue
+                loaded += r['rows']
+                failed += r['failed']
+                elapsed = time.perf_counter() - start
+                print(f"[{i}/{len(todo)}] {chunk['file']}: {r['rows']} rows in {r['seconds']}s "
+                      f"| {loaded / elapsed:,.0f} rows/s" + (f" | {r['failed']} quarantined" if r['failed'] else ''))
+
+        print("Refreshing weekly/monthly rollups...")
+        self.rollups.refresh(get_client())
+        return loaded, failed, time.perf_counter() - start
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='Upload FileSink chunks with resume')
+    parser.add_argument('directory')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--retry-partial', action='store_true', help='reload chunks that had quarantined rows')
+    args = parser.parse_args()
+
+    ok, latency, error = health_check()
+    if not ok:
+        print(f"Supabase health check failed: {error}")
+        sys.exit(1)
+    print(f"Supabase OK ({latency:.0f} ms)")
+
+    loader = ChunkLoader(args.directory, args.workers, args.batch_size)
+    loaded, failed, seconds = loader.run(args.retry_partial)
+    print(f"\nLoaded {loaded:,} rows in {seconds:.1f}s ({failed} quarantined)")
+    remaining = loader.pending()
+    if remaining:
+        print(f"{len(remaining)} chunk(s) still missing: run again to resume")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""Daily price pipeline as a DAG of stages.
+
+    download ──> import ──> summary ──> opportunities ──> health
+                       └──────────────────> backtest
+    ligamagic  (independent branch, also feeds backtest)
+    lm_editions  (independent too: scraper_ck/edition_scheduler.py, only the due editions)
+
+Stages whose dependencies are done run concurrently. A stage is skipped when
+its fingerprint (own inputs + fingerprints of the stages it depends on) is
+the same as on its last successful run, so re-running the pipeline after a
+partial failure only redoes what is missing. Timings of every run are kept
+in PIPELINE_STATE and appended to PIPELINE_LOG.
+
+Rollups and price alerts are refreshed inside the import stage: their
+trackers only know what that process wrote.
+
+    python pipeline.py [--force import,summary] [--only download,import] [--no-ligamagic] [--dry-run]
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from dotenv import load_dotenv
+import requests
+
+load_dotenv()
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPTS_DIR)
+PRICES_URL = 'https://mtgjson.com/api/v5/AllPricesToday.json'
+PRICES_FILE = os.getenv('PRICES_FILE', r'e:\Dev\App - Boost Homebroker\data\AllPricesToday.json')
+PIPELINE_STATE = os.getenv('PIPELINE_STATE', os.path.join(SCRIPTS_DIR, 'pipeline_state.json'))
+PIPELINE_LOG = os.getenv('PIPELINE_LOG', os.path.join(SCRIPTS_DIR, 'pipeline_runs.jsonl'))
+MAX_WORKERS = int(os.getenv('PIPELINE_WORKERS', 4))
+NPM = 'npm.cmd' if os.name == 'nt' else 'npm'
+
+_print_lock = threading.Lock()
+
+
+def log(stage, message):
+    with _print_lock:
+        print(f"[{datetime.now():%H:%M:%S}] [{stage}] {message}", flush=True)
+
+
+def file_fingerprint(path):
+    """size + mtime: cheap enough for the 1GB+ price files"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return 'missing'
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def remote_prices_fingerprint():
+    """MTGJSON publishes a .sha256 next to every file; it changes once a day"""
+    res = requests.get(PRICES_URL + '.sha256', timeout=30)
+    res.raise_for_status()
+    return res.text.split()[0]
+
+
+@dataclass
+class Stage:
+    name: str
+    run: object  # callable(stage) -> None, raises on failure
+    deps: list = field(default_factory=list)
+    inputs: list = field(default_factory=list)  # files whose change re-runs the stage
+    fingerprint_fn: object = None  # extra input, e.g. a remote checksum
+    always: bool = False  # checks that must run even when nothing changed
+
+    def fingerprint(self, dep_fingerprints):
+        parts = [f"{d}={dep_fingerprints[d]}" for d in sorted(self.deps)]
+        parts += [f"{p}={file_fingerprint(p)}" for p in self.inputs]
+        if self.fingerprint_fn:
+            parts.append(self.fingerprint_fn())
+        return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def run_command(stage, args, cwd=SCRIPTS_DIR, env=None):
+    """Run a subprocess, streaming its output prefixed with the stage name"""
+    proc = subprocess.Popen(
+        args, cwd=cwd, env={**os.environ, 'PYTHONUNBUFFERED': '1', **(env or {})},
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, encoding='utf-8', errors='replace',
+    )
+    for line in proc.stdout:
+        log(stage.name, line.rstrip())
+    if proc.wait() != 0:
+        raise RuntimeError(f"{' '.join(args)} exited with {proc.returncode}")
+
+
+def python_script(script, env=None):
+    return lambda stage: run_command(stage, [sys.executable, script], env=env)
+
+
+def download_prices(stage):
+    tmp = PRICES_FILE + '.part'
+    os.makedirs(os.path.dirname(PRICES_FILE) or '.', exist_ok=True)
+    with requests.get(PRICES_URL, stream=True, timeout=60) as res:
+        res.raise_for_status()
+        size = 0
+        with open(tmp, 'wb') as f:
+            for chunk in res.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+                size += len(chunk)
+    os.replace(tmp, PRICES_FILE)
+    log(stage.name, f"{size / 1e6:.1f} MB -> {PRICES_FILE}")
+
+
+def build_stages(ligamagic=True):
+    stages = [
+        Stage('download', download_prices, fingerprint_fn=remote_prices_fingerprint),
+        # Opportunities run as their own stage after the summary refresh
+        Stage('import', python_script('import_prices_daily.py', env={
+            'PRICES_FILE': PRICES_FILE, 'SKIP_OPPORTUNITIES': '1'
+        }), deps=['download'], inputs=[PRICES_FILE]),
+        Stage('summary', python_script('update_cards_prices.py'), deps=['import']),
+        Stage('opportunities', python_script('build_opportunities.py'), deps=['summary']),
+        # Fails the run when a price series is stale (exit code 1)
+        Stage('health', python_script('price_health.py'), deps=['opportunities'], always=True),
+    ]
+    if ligamagic:
+        # No input file to watch: the scrape is due once per calendar day
+        stages.append(Stage('ligamagic', lambda stage: run_command(
+            stage, [NPM, 'start'], cwd=os.path.join(ROOT_DIR, 'scraper_lm')),
+            fingerprint_fn=lambda: date.today().isoformat()))
+        # Whole editions on their own schedule (LM_EDITIONS_FILE); the run scrapes only what is due
+        stages.append(Stage('lm_editions', lambda stage: run_command(
+            stage, [sys.executable, 'edition_scheduler.py', 'run'], cwd=os.path.join(ROOT_DIR, 'scraper_ck')),
+            fingerprint_fn=lambda: date.today().isoformat()))
+    stages.append(Stage('backtest', python_script('spread_backtest.py'),
+                        deps=['import', 'ligamagic', 'lm_editions'] if ligamagic else ['import']))
+    return {s.name: s for s in stages}
+
+
+def load_state():
+    if os.path.exists(PIPELINE_STATE):
+        with open(PIPELINE_STATE, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    tmp = PIPELINE_STATE + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, PIPELINE_STATE)
+
+
+class Pipeline:
+    def __init__(self, stages, force=(), only=(), dry_run=False):
+        self.stages = stages
+        self.force = set(force)
+        self.only = set(only)
+        self.dry_run = dry_run
+        self.state = load_state()
+        self.fingerprints = {}
+        self.results = {}  # name -> {'status', 'seconds', 'error'}
+        missing = {d for s in stages.values() for d in s.deps} - set(stages)
+        if missing:
+            raise ValueError(f"Unknown dependencies: {sorted(missing)}")
+
+    def _execute(self, stage):
+        """Runs in a worker thread. Returns (status, seconds, error)"""
+        start = time.perf_counter()
+        try:
+            fp = stage.fingerprint(self.fingerprints)
+        except Exception as e:
+            return 'failed', time.perf_counter() - start, f"fingerprint: {e}"
+        self.fingerprints[stage.name] = fp
+
+        last = self.state.get(stage.name, {})
+        unchanged = last.get('status') == 'ok' and last.get('fingerprint') == fp
+        if unchanged and not stage.always and stage.name not in self.force:
+            return 'skipped', time.perf_counter() - start, None
+        if self.dry_run:
+            return 'would-run', 0.0, None
+
+        log(stage.name, 'started')
+        try:
+            stage.run(stage)
+        except Exception as e:
+            return 'failed', time.perf_counter() - start, str(e)
+        return 'ok', time.perf_counter() - start, None
+
+    def run(self):
+        pending = dict(self.stages)
+        running = {}
+        run_start = time.perf_counter()
+
+        # --only: everything else counts as done with its last successful fingerprint
+        for name in set(pending) - self.only if self.only else ():
+            last = self.state.get(name, {})
+            ok = last.get('status') == 'ok'
+            self.fingerprints[name] = last.get('fingerprint')
+            self.results[name] = {'status': 'skipped' if ok else 'blocked', 'seconds': 0.0, 'error': None}
+            del pending[name]
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    dep_status = [self.results.get(d, {}).get('status') for d in stage.deps]
+                    if any(s in ('failed', 'blocked') for s in dep_status):
+                        self.results[name] = {'status': 'blocked', 'seconds': 0.0, 'error': None}
+                        log(name, 'blocked by a failed dependency')
+                        del pending[name]
+                    elif all(s in ('ok', 'skipped', 'would-run') for s in dep_status):
+                        running[pool.submit(self._execute, stage)] = name
+                        del pending[name]
+                if not running:
+                    if pending:
+                        raise ValueError(f"Dependency cycle between {sorted(pending)}")
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    status, seconds, error = future.result()
+                    self.results[name] = {'status': status, 'seconds': round(seconds, 2), 'error': error}
+                    log(name, f"{status} in {seconds:.1f}s" + (f": {error}" if error else ''))
+                    if self.dry_run:
+                        continue
+                    if status == 'failed':
+                        # Runs again next time whatever its fingerprint
+                        self.state[name] = {**self.state.get(name, {}), 'status': 'failed'}
+                    elif status in ('ok', 'skipped'):
+                        self.state[name] = {
+                            'status': 'ok',
+                            'fingerprint': self.fingerprints[name],
+                            'finished_at': datetime.now().isoformat(timespec='seconds'),
+                            'seconds': self.results[name]['seconds'] if status == 'ok'
+                            else self.state.get(name, {}).get('seconds'),
+                        }
+
+        total = time.perf_counter() - run_start
+        if not self.dry_run:
+            save_state(self.state)
+            with open(PIPELINE_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({
+                    'started_at': datetime.now().isoformat(timespec='seconds'),
+                    'seconds': round(total, 2),
+                    'stages': self.results,
+                }) + '\n')
+        return total
+
+    def report(self, total):
+        print(f"\n{'Stage':<16}{'Status':<11}{'Seconds':>9}")
+        for name in self.stages:
+            if self.only and name not in self.only:
+                continue
+            r = self.results.get(name, {})
+            print(f"{name:<16}{r.get('status', '-'):<11}{r.get('seconds', 0):>9.1f}")
+        print(f"{'total':<27}{total:>9.1f}")
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='Run the daily price pipeline')
+    parser.add_argument('--force', default='', help='comma-separated stages to run even if unchanged')
+    parser.add_argument('--only', default='', help='comma-separated stages to run (deps must already be done)')
+    parser.add_argument('--no-ligamagic', action='store_true')
+    parser.add_argument('--dry-run', action='store_true', help='show what would run')
+    args = parser.parse_args()
+
+    pipeline = Pipeline(
+        build_stages(ligamagic=not args.no_ligamagic),
+        force=filter(None, args.force.split(',')),
+        only=filter(None, args.only.split(',')),
+        dry_run=args.dry_run,
+    )
+    total = pipeline.run()
+    pipeline.report(total)
+    if any(r['status'] in ('failed', 'blocked') for r in pipeline.results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+from price_rollups import row_fields
+
+RPC_CHUNK = 1000  # card_ids per evaluate_price_alerts call
+
+
+class AlertTracker:
+    """Collects the card_ids whose price an import run changed, for bulk alert evaluation.
+
+    Same shape as RollupTracker: importers call track() from the sink's
+    on_written hook and evaluate() once at the end. The join against every
+    user's tracked cards/sets and thresholds happens server-side, one call
+    per chunk of changed cards.
+    """
+
+    def __init__(self, source='CardKingdom', price_type='buy', previous=None):
+        self.source = source
+        self.price_type = price_type
+        # card_id -> last known price (e.g. cards.ck_buy_usd): unchanged prices can't trigger
+        self.previous = dict(previous or {})
+        self.card_ids = set()
+
+    def __len__(self):
+        return len(self.card_ids)
+
+    def track(self, rows, columns=None):
+        """rows: dicts, or tuples laid out as `columns` (PriceSink batches)"""
+        points = row_fields(rows, columns, 'card_id', 'source', 'price_type', 'price_raw')
+        previous = self.previous
+        self.card_ids.update(
+            card_id for card_id, source, price_type, price in points
+            if source == self.source and price_type == self.price_type and previous.get(card_id) != price
+        )
+
+    def evaluate(self, client):
+        """Run evaluate_price_alerts over all tracked card_ids and reset. Returns alerts created"""
+        card_ids = sorted(self.card_ids)
+        created = 0
+        for i in range(0, len(card_ids), RPC_CHUNK):
+            res = client.rpc('evaluate_price_alerts', {
+                'p_card_ids': card_ids[i:i + RPC_CHUNK],
+                'p_source': self.source,
+                'p_price_type': self.price_type,
+            }).execute()
+            created += res.data or 0
+        self.card_ids.clear()
+        return created
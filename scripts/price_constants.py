@@ -0,0 +1,10 @@
+"""Pricing constants shared by the importers, the opportunity ranking and the backtest.
+
+Plain values only (no imports, no env loading), so any script can use them
+without pulling in another script's startup side effects.
+"""
+
+# Handling cost added to every BRL price (same one the Opportunities page uses)
+FIXED_COST_BRL = 0.30
+# USD->BRL for history imports, and the fallback when the daily FX lookup fails
+DEFAULT_USD_BRL = 5.50
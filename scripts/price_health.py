@@ -0,0 +1,91 @@
+"""Fast price_history health check (see create_price_health.sql).
+
+Estimated total rows, latest scraped_at and rows in the last N days per
+source/price_type, all from the planner estimate, an index and the small
+price_history_daily_stats table. The series come from price_history itself
+(loose index scan), so every writer is checked; the recent row counts only
+cover what import_prices_daily (or --refresh-stats) has counted. Exits 1
+when a series is staler than --max-age-hours, so it can gate the pipeline.
+
+    python price_health.py [--days 7] [--max-age-hours 36] [--refresh-stats N]
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from supabase_client import get_client
+from price_rollups import _to_date, row_fields
+
+MAX_AGE_HOURS = 36  # Daily sources: one missed run is tolerated
+
+
+class StatsTracker:
+    """Days touched by an import run; refresh() recounts them in price_history_daily_stats"""
+
+    def __init__(self):
+        self.days = set()
+
+    def track(self, rows, columns=None):
+        self.days.update(map(_to_date, row_fields(rows, columns, 'scraped_at')))
+
+    def refresh(self, client):
+        days = sorted(d.isoformat() for d in self.days)
+        self.days.clear()
+        if not days:
+            return 0
+        return client.rpc('refresh_price_history_stats', {'p_days': days}).execute().data or 0
+
+
+def fetch_health(client, days=7):
+    return client.rpc('price_history_health', {'p_days': days}).execute().data
+
+
+def _parse_ts(value):
+    ts = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def stale_series(health, max_age_hours):
+    """Series whose latest scraped_at is older than max_age_hours"""
+    now = datetime.now(timezone.utc)
+    stale = []
+    for s in health['series']:
+        latest = s['latest_scraped_at']
+        if not latest or now - _parse_ts(latest) > timedelta(hours=max_age_hours):
+            stale.append(s)
+    return stale
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='price_history health')
+    parser.add_argument('--days', type=int, default=7, help='window for recent row counts')
+    parser.add_argument('--max-age-hours', type=float, default=MAX_AGE_HOURS)
+    parser.add_argument('--refresh-stats', type=int, metavar='N', help='recount the last N days first (backfill)')
+    args = parser.parse_args()
+
+    client = get_client()
+    if args.refresh_stats:
+        tracker = StatsTracker()
+        tracker.days = {date.today() - timedelta(days=i) for i in range(args.refresh_stats)}
+        print(f"Stats refreshed: {tracker.refresh(client)} rows")
+
+    start = time.perf_counter()
+    health = fetch_health(client, args.days)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"price_history ~{health['estimated_rows']:,} rows (estimate) | stats through {health['stats_through']}")
+    print(f"{'Source':<16}{'Type':<7}{'Latest scraped_at':<28}{f'Rows {args.days}d':>12}")
+    for s in health['series']:
+        print(f"{s['source']:<16}{s['price_type']:<7}{str(s['latest_scraped_at']):<28}{s['recent_rows']:>12,}")
+    print(f"({elapsed_ms:.0f} ms)")
+
+    stale = stale_series(health, args.max_age_hours)
+    for s in stale:
+        print(f"STALE: {s['source']}/{s['price_type']} older than {args.max_age_hours:g}h")
+    if stale or not health['series']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
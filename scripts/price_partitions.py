@@ -0,0 +1,157 @@
+"""Monthly partitions for price_history (see partition_price_history.sql).
+
+    python price_partitions.py migrate [--chunk-days 7]
+    python price_partitions.py ensure 2025-01 2025-02 ...
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from supabase_client import get_client
+
+MIGRATION_KEY = 'price_history_migration_started'  # system_settings marker, survives restarts
+RETRY_SECONDS = 30
+
+
+def month_start(value):
+    """date / 'YYYY-MM-DD...' / 'YYYY-MM' -> first day of that month"""
+    if isinstance(value, date):
+        return value.replace(day=1)
+    text = str(value)
+    return date(int(text[:4]), int(text[5:7]), 1)
+
+
+def next_month(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def ensure_partitions(client, months, table='price_history'):
+    """Create any missing monthly partitions. Returns count created, -1 if not partitioned"""
+    res = client.rpc('ensure_price_history_partitions', {
+        'p_months': sorted({month_start(m).isoformat() for m in months}),
+        'p_table': table,
+    }).execute()
+    return res.data
+
+
+class PartitionRouter:
+    """Makes sure the target month partition exists before the sink writes to it.
+
+    Hooked into PriceSink(before_write=...). Only months not seen yet in this
+    run trigger an RPC, so a daily import costs one call. If price_history is
+    not partitioned yet (or the RPC is missing), it switches itself off; any
+    other error is retried on a later batch after RETRY_SECONDS.
+    """
+
+    def __init__(self, table='price_history'):
+        self.table = table
+        self.known = set()
+        self.enabled = True
+        self.retry_at = 0.0
+
+    def __call__(self, rows, columns):
+        if not self.enabled or time.monotonic() < self.retry_at:
+            return
+        date_i = columns.index('scraped_at')
+        new = {month_start(row[date_i]) for row in rows} - self.known
+        if not new:
+            return
+        try:
+            created = ensure_partitions(get_client(), new, self.table)
+        except Exception as e:
+            if 'PGRST202' in str(e):
+                print(f"Partition routing disabled (ensure_price_history_partitions missing): {e}")
+                self.enabled = False
+            else:
+                print(f"Partition check failed, retrying in {RETRY_SECONDS}s: {e}")
+                self.retry_at = time.monotonic() + RETRY_SECONDS
+            return
+        if created == -1:
+            self.enabled = False
+            return
+        if created:
+            print(f"Created {created} price_history partition(s)")
+        self.known |= new
+
+
+def _edge_date(client, ascending):
+    res = client.table('price_history').select('scraped_at') \
+        .order('scraped_at', desc=not ascending).limit(1).execute()
+    return date.fromisoformat(res.data[0]['scraped_at'][:10]) if res.data else None
+
+
+def _migration_marker(client):
+    """{'after_id', 'date'} from the first migrate run; written now if there is none"""
+    res = client.table('system_settings').select('value').eq('key', MIGRATION_KEY).execute()
+    if res.data:
+        return json.loads(res.data[0]['value'])
+    last = client.table('price_history').select('id').order('id', desc=True).limit(1).execute().data
+    marker = {'after_id': last[0]['id'] if last else 0, 'date': date.today().isoformat()}
+    client.table('system_settings').upsert({
+        'key': MIGRATION_KEY,
+        'value': json.dumps(marker),
+        'updated_at': datetime.now(timezone.utc).isoformat(),
+    }, on_conflict='key').execute()
+    return marker
+
+
+def migrate(chunk_days=7):
+    """Copy price_history into price_history_partitioned slice by slice, then swap"""
+    client = get_client()
+    marker = _migration_marker(client)
+    print(f"Migration started {marker['date']} (rows after id {marker['after_id']} are caught up at the swap)")
+    first, last = _edge_date(client, True), _edge_date(client, False)
+    if not first:
+        print("price_history is empty, nothing to copy")
+        return
+
+    months = []
+    m = month_start(first)
+    while m <= last:
+        months.append(m)
+        m = next_month(m)
+    print(f"Range {first} -> {last}: {len(months)} months")
+    created = ensure_partitions(client, months + [next_month(months[-1])], 'price_history_partitioned')
+    print(f"Partitions created: {created}")
+
+    total = 0
+    cursor = first
+    end = last + timedelta(days=1)
+    while cursor < end:
+        stop = min(cursor + timedelta(days=chunk_days), end)
+        copied = client.rpc('copy_price_history_range', {
+            'p_from': cursor.isoformat(), 'p_to': stop.isoformat()
+        }).execute().data or 0
+        total += copied
+        print(f"[{cursor} .. {stop}) copied {copied:>8} | total {total:>10}")
+        cursor = stop
+
+    # Under the lock: every row inserted since the marker (backfills of any date) plus
+    # the days since the migration started, which importers may have upserted in place
+    catchup_from = (date.fromisoformat(marker['date']) - timedelta(days=1)).isoformat()
+    caught_up = client.rpc('swap_price_history_partitioned', {
+        'p_catchup_from': catchup_from, 'p_after_id': marker['after_id'],
+    }).execute().data
+    client.table('system_settings').delete().eq('key', MIGRATION_KEY).execute()
+    print(f"Swapped. Catch-up rows: {caught_up}. Old table kept as price_history_legacy.")
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='price_history monthly partitions')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_migrate = sub.add_parser('migrate', help='copy the table into monthly partitions and swap')
+    p_migrate.add_argument('--chunk-days', type=int, default=7)
+    p_ensure = sub.add_parser('ensure', help='create partitions for the given months (YYYY-MM)')
+    p_ensure.add_argument('months', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate(args.chunk_days)
+    else:
+        print(f"Created: {ensure_partitions(get_client(), args.months)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""Local read service for card price series and summaries, behind an LRU cache.
+
+    GET  /cards/<id>/series?start=YYYY-MM-DD&end=YYYY-MM-DD[&granularity=day|week|month]
+    GET  /cards/<id>/summary
+    POST /invalidate   {"card_ids": [1, 2, ...]}   (sent by the importers)
+    GET  /stats
+
+Responses are cached as encoded JSON; the cache is bounded by total bytes
+(READ_CACHE_MB) and evicts least recently used entries. Concurrent requests
+for the same key share one backend query. Entries also expire after
+READ_CACHE_TTL seconds for writers that do not report changes.
+
+    python price_read_service.py [--port 8787]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from price_rollups import get_price_series, row_fields
+
+CACHE_MB = float(os.getenv('READ_CACHE_MB', 64))
+CACHE_TTL = int(os.getenv('READ_CACHE_TTL', 3600))
+READ_SERVICE_URL = os.getenv('READ_SERVICE_URL')  # importers POST /invalidate here when set
+
+
+class LRUCache:
+    """Byte-bounded LRU of encoded responses, indexed by card_id for invalidation"""
+
+    def __init__(self, max_bytes, ttl=CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (body, card_id, stored_at)
+        self.by_card = {}  # card_id -> set of keys
+        self.versions = {}  # card_id -> bumped on every invalidation
+        self.bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'coalesced': 0}
+        self.lock = threading.Lock()
+        self.inflight = {}  # key -> [Event, result, error]
+
+    def _drop(self, key):
+        body, card_id, _ = self.entries.pop(key)
+        self.bytes -= len(body)
+        keys = self.by_card.get(card_id)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self.by_card[card_id]
+
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[2] > self.ttl:
+            self._drop(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key, card_id, body):
+        if len(body) > self.max_bytes:
+            return
+        if key in self.entries:
+            self._drop(key)
+        self.entries[key] = (body, card_id, time.monotonic())
+        self.by_card.setdefault(card_id, set()).add(key)
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            self.stats['evictions'] += 1
+
+    def get_or_load(self, key, card_id, loader):
+        """Cached body, or loader() run once for all concurrent callers of the same key"""
+        with self.lock:
+            body = self._get(key)
+            if body is not None:
+                self.stats['hits'] += 1
+                return body
+            self.stats['misses'] += 1
+            waiting = self.inflight.get(key)
+            if waiting is None:
+                waiting = self.inflight[key] = [threading.Event(), None, None]
+                owner = True
+                version = self.versions.get(card_id, 0)
+            else:
+                self.stats['coalesced'] += 1
+                owner = False
+
+        if not owner:
+            waiting[0].wait()
+            if waiting[2] is not None:
+                raise waiting[2]
+            return waiting[1]
+
+        try:
+            body = loader()
+        except Exception as e:
+            waiting[2] = e
+            raise
+        else:
+            waiting[1] = body
+            with self.lock:
+                # Invalidated while loading: answer this request but do not keep stale data
+                if self.versions.get(card_id, 0) == version:
+                    self._put(key, card_id, body)
+            return body
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            waiting[0].set()
+
+    def invalidate(self, card_ids):
+        dropped = 0
+        with self.lock:
+            for card_id in card_ids:
+                self.versions[card_id] = self.versions.get(card_id, 0) + 1
+                for key in list(self.by_card.get(card_id, ())):
+                    self._drop(key)
+                    dropped += 1
+            self.stats['invalidations'] += dropped
+        return dropped
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, 'entries': len(self.entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes}
+
+
+class SupabaseBackend:
+    def __init__(self, client):
+        self.client = client
+
+    def series(self, card_id, start, end, granularity=None):
+        granularity, rows = get_price_series(self.client, card_id, start, end, granularity)
+        return {'card_id': card_id, 'granularity': granularity, 'rows': rows}
+
+    def summary(self, card_id):
+        res = self.client.table('all_cards_with_prices').select('*').eq('id', card_id).limit(1).execute()
+        return res.data[0] if res.data else None
+
+
+class PriceReadService:
+    def __init__(self, backend, max_bytes=int(CACHE_MB * 1024 * 1024), ttl=CACHE_TTL):
+        self.backend = backend
+        self.cache = LRUCache(max_bytes, ttl)
+
+    def series(self, card_id, start=None, end=None, granularity=None):
+        end = end or date.today().isoformat()
+        start = start or (date.fromisoformat(end) - timedelta(days=90)).isoformat()
+        key = ('series', card_id, start, end, granularity)
+        return self.cache.get_or_load(key, card_id, lambda: _encode(
+            self.backend.series(card_id, start, end, granularity)))
+
+    def summary(self, card_id):
+        return self.cache.get_or_load(('summary', card_id), card_id, lambda: _encode(
+            self.backend.summary(card_id)))
+
+    def serve(self, host='127.0.0.1', port=8787):
+        server = ThreadingHTTPServer((host, port), _handler(self))
+        server.daemon_threads = True
+        return server
+
+
+def _encode(data):
+    return json.dumps(data, default=str, separators=(',', ':')).encode('utf-8')
+
+
+def _handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out as two writes; with Nagle on, keep-alive clients wait ~40ms for the ACK
+        disable_nagle_algorithm = True
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                if parts == ['stats']:
+                    return self._send(200, _encode(service.cache.snapshot()))
+                if len(parts) == 3 and parts[0] == 'cards':
+                    card_id = int(parts[1])
+                    if parts[2] == 'series':
+                        return self._send(200, service.series(
+                            card_id, query.get('start'), query.get('end'), query.get('granularity')))
+                    if parts[2] == 'summary':
+                        return self._send(200, service.summary(card_id))
+            except ValueError as e:
+                return self._send(400, _encode({'error': str(e)}))
+            except Exception as e:
+                return self._send(502, _encode({'error': str(e)}))
+            self._send(404, _encode({'error': 'not found'}))
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/invalidate':
+                return self._send(404, _encode({'error': 'not found'}))
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                card_ids = [int(c) for c in json.loads(self.rfile.read(length) or b'{}').get('card_ids', [])]
+            except (ValueError, TypeError, AttributeError) as e:
+                return self._send(400, _encode({'error': str(e)}))
+            self._send(200, _encode({'dropped': service.cache.invalidate(card_ids)}))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class ChangedCardsTracker:
+    """Card ids written by an import run; notify() tells the read service to drop them"""
+
+    def __init__(self, url=READ_SERVICE_URL):
+        self.url = url
+        self.card_ids = set()
+
+    def track(self, rows, columns=None):
+        self.card_ids.update(row_fields(rows, columns, 'card_id'))
+
+    def notify(self):
+        """Returns entries dropped, or None when no service is configured / reachable"""
+        if not self.url or not self.card_ids:
+            return None
+        req = urllib.request.Request(
+            self.url.rstrip('/') + '/invalidate',
+            data=_encode({'card_ids': sorted(self.card_ids)}),
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=10) as res:
+                dropped = json.load(res)['dropped']
+        except OSError as e:
+            print(f"Read service not notified: {e}")
+            return None
+        self.card_ids.clear()
+        return dropped
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='Cached price read service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--cache-mb', type=float, default=CACHE_MB)
+    args = parser.parse_args()
+
+    from supabase_client import get_client
+    service = PriceReadService(SupabaseBackend(get_client()), max_bytes=int(args.cache_mb * 1024 * 1024))
+    server = service.serve(args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port} (cache {args.cache_mb:g} MB, TTL {CACHE_TTL}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Retention job for price_history: archive raw daily rows, keep weekly points.
+
+Months older than --months (default RETENTION_MONTHS or 24) are exported to
+ARCHIVE_DIR/price_history_YYYY_MM.ndjson.gz and then replaced server-side by
+one averaged point per card/source/price_type/week
+(downsample_price_history_month in partition_price_history.sql). The weekly
+and monthly rollups of the archived cards are then recomputed from those
+points (refresh_price_rollups), so long-range charts match price_history.
+
+card_views (one row per card page visit) is pruned to the last --view-days
+days (default VIEW_RETENTION_DAYS or 30, never below hot_set.HOT_VIEW_DAYS).
+
+    python price_retention.py [--months 24] [--view-days 30] [--dry-run]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+from supabase_client import get_client, fetch_all
+from price_partitions import month_start, next_month
+from price_rollups import RollupTracker
+from hot_set import HOT_VIEW_DAYS
+
+RETENTION_MONTHS = int(os.getenv('RETENTION_MONTHS', 24))
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+VIEW_RETENTION_DAYS = int(os.getenv('VIEW_RETENTION_DAYS', 30))
+PAGE_SIZE = 1000
+
+
+def months_to_downsample(client, keep_months):
+    """Months older than the retention window that haven't been downsampled yet"""
+    this_month = month_start(date.today())
+    years, month = divmod(this_month.month - 1 - keep_months, 12)
+    cutoff = date(this_month.year + years, month + 1, 1)
+
+    res = client.table('price_history').select('scraped_at').order('scraped_at').limit(1).execute()
+    if not res.data:
+        return []
+    done = {row['month'] for row in fetch_all(client, 'price_history_retention', 'month', key='month')}
+
+    months = []
+    m = month_start(res.data[0]['scraped_at'])
+    while m < cutoff:
+        if m.isoformat() not in done:
+            months.append(m)
+        m = next_month(m)
+    return months
+
+
+def archive_month(client, month, rollups=None):
+    """Stream one month of raw rows to a gzip NDJSON file, keyset-paged on id.
+    rollups: RollupTracker that gets the (card, week/month) buckets of every row"""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, f"price_history_{month.strftime('%Y_%m')}.ndjson.gz")
+    end = next_month(month)
+    last_id = 0
+    rows = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        while True:
+            page = client.table('price_history').select('*') \
+                .gte('scraped_at', month.isoformat()) \
+                .lt('scraped_at', end.isoformat()) \
+                .gt('id', last_id) \
+                .order('id') \
+                .limit(PAGE_SIZE) \
+                .execute().data
+            for row in page:
+                f.write(json.dumps(row, default=str) + '\n')
+            if rollups is not None:
+                rollups.track(page)
+            rows += len(page)
+            if len(page) < PAGE_SIZE:
+                break
+            last_id = page[-1]['id']
+    return path, rows
+
+
+def prune_card_views(client, days, dry_run=False):
+    """Delete card_views older than `days` (the hot set only reads the last HOT_VIEW_DAYS). Returns rows"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=max(days, HOT_VIEW_DAYS))).isoformat()
+    if dry_run:
+        return client.table('card_views').select('id', count='exact').lt('viewed_at', cutoff).limit(1).execute().count
+    return client.table('card_views').delete(count='exact', returning='minimal').lt('viewed_at', cutoff).execute().count
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='Archive + downsample old price_history months')
+    parser.add_argument('--months', type=int, default=RETENTION_MONTHS, help='months of daily data to keep')
+    parser.add_argument('--view-days', type=int, default=VIEW_RETENTION_DAYS, help='days of card_views to keep')
+    parser.add_argument('--dry-run', action='store_true', help='archive only, do not touch the DB')
+    args = parser.parse_args()
+
+    client = get_client()
+    months = months_to_downsample(client, args.months)
+    print(f"Months to downsample (keeping {args.months}): {len(months)}")
+
+    for month in months:
+        rollups = RollupTracker()
+        path, archived = archive_month(client, month, rollups)
+        print(f"{month:%Y-%m}: archived {archived} rows -> {path}")
+        if args.dry_run or not archived:
+            continue
+        removed = client.rpc('downsample_price_history_month', {
+            'p_month': month.isoformat(), 'p_archive_path': path
+        }).execute().data or 0
+        if removed != archived:
+            # Rows landed in this month between archive and delete: keep the file, flag it
+            print(f"  WARNING: archived {archived} but downsampled {removed} raw rows")
+        print(f"  downsampled {removed} raw rows to weekly points")
+        print(f"  rollups refreshed: {rollups.refresh(client)} rows")
+
+    views = prune_card_views(client, args.view_days, args.dry_run)
+    print(f"card_views older than {max(args.view_days, HOT_VIEW_DAYS)} days: {views or 0} "
+          + ("to delete" if args.dry_run else "deleted"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+from datetime import date, timedelta
+from operator import itemgetter
+
+# Chart ranges up to this many days read raw daily rows; above, weekly; above that, monthly
+DAILY_MAX_DAYS = 120
+WEEKLY_MAX_DAYS = 730
+RPC_CHUNK = 1000  # (card_id, bucket) pairs per refresh_price_rollups call
+PENDING_LIMIT = 50000  # Full-history imports flush buckets as they go instead of at the end
+
+ROLLUP_TABLES = {
+    'week': 'price_history_weekly',
+    'month': 'price_history_monthly',
+}
+
+
+def _to_date(value):
+    """price_history.scraped_at comes as 'YYYY-MM-DD' or a full ISO timestamp"""
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def row_fields(rows, columns, *names):
+    """The named fields of each row of a sink batch, as itemgetter returns them
+    (a bare value for one name, a tuple for several). rows: dicts when columns
+    is None, else tuples laid out as `columns`. Shared by the import trackers."""
+    if columns is None:
+        return map(itemgetter(*names), rows)
+    return map(itemgetter(*(columns.index(n) for n in names)), rows)
+
+
+def week_start(d):
+    """Monday of d's week (matches Postgres date_trunc('week'))"""
+    return d - timedelta(days=d.weekday())
+
+
+def month_start(d):
+    return d.replace(day=1)
+
+
+class RollupTracker:
+    """Collects the (card_id, bucket) pairs touched by an import run.
+
+    Importers call track() with every batch they successfully write to
+    price_history and refresh() once at the end; only those buckets get
+    recomputed server-side.
+    """
+
+    def __init__(self):
+        self.weeks = set()
+        self.months = set()
+        self.retry_at = PENDING_LIMIT
+
+    def __len__(self):
+        return len(self.weeks) + len(self.months)
+
+    def track(self, rows, columns=None):
+        """rows: dicts, or tuples laid out as `columns` (PriceSink batches)"""
+        for card_id, scraped_at in row_fields(rows, columns, 'card_id', 'scraped_at'):
+            d = _to_date(scraped_at)
+            self.weeks.add((card_id, week_start(d).isoformat()))
+            self.months.add((card_id, month_start(d).isoformat()))
+
+    def refresh(self, client):
+        """Push all pending buckets to refresh_price_rollups. Returns rows upserted.
+
+        Pairs are dropped only once their RPC succeeded: after an error the
+        rest stays pending for the next refresh.
+        """
+        total = 0
+        for granularity, pending in (('week', self.weeks), ('month', self.months)):
+            pairs = sorted(pending)
+            for i in range(0, len(pairs), RPC_CHUNK):
+                chunk = pairs[i:i + RPC_CHUNK]
+                res = client.rpc('refresh_price_rollups', {
+                    'p_granularity': granularity,
+                    'p_card_ids': [c for c, _ in chunk],
+                    'p_buckets': [b for _, b in chunk],
+                }).execute()
+                total += res.data or 0
+                pending.difference_update(chunk)
+        return total
+
+    def refresh_if_full(self, client):
+        """Mid-import flush; an error is logged and retried a PENDING_LIMIT later or at the final refresh()"""
+        if len(self) < self.retry_at:
+            return 0
+        try:
+            total = self.refresh(client)
+        except Exception as e:
+            print(f"Rollup refresh failed ({len(self)} buckets kept pending): {e}")
+            self.retry_at = len(self) + PENDING_LIMIT
+            return 0
+        self.retry_at = PENDING_LIMIT
+        return total
+
+def pick_granularity(start, end):
+    """'day', 'week' or 'month' depending on how long the requested range is"""
+    days = (_to_date(end) - _to_date(start)).days
+    if days <= DAILY_MAX_DAYS:
+        return 'day'
+    if days <= WEEKLY_MAX_DAYS:
+        return 'week'
+    return 'month'
+
+
+def get_price_series(client, card_id, start, end, granularity=None):
+    """Price series for one card over [start, end] at the coarsest sensible granularity.
+
+    Returns (granularity, rows). Daily rows keep price_history's columns;
+    rollup rows carry bucket_start + open/high/low/close/avg_brl.
+    """
+    start, end = _to_date(start), _to_date(end)
+    granularity = granularity or pick_granularity(start, end)
+
+    if granularity == 'day':
+        res = client.table('price_history') \
+            .select('scraped_at, source, price_type, price_brl') \
+            .eq('card_id', card_id) \
+            .gte('scraped_at', start.isoformat()) \
+            .lte('scraped_at', end.isoformat()) \
+            .order('scraped_at') \
+            .execute()
+        return granularity, res.data
+
+    # Include the bucket that contains `start`
+    first_bucket = week_start(start) if granularity == 'week' else month_start(start)
+    res = client.table(ROLLUP_TABLES[granularity]) \
+        .select('bucket_start, source, price_type, open_brl, high_brl, low_brl, close_brl, avg_brl, points') \
+        .eq('card_id', card_id) \
+        .gte('bucket_start', first_bucket.isoformat()) \
+        .lte('bucket_start', end.isoformat()) \
+        .order('bucket_start') \
+        .execute()
+    return granularity, res.data
@@ -0,0 +1,460 @@
+import gzip
+import hashlib
+import json
+import math
+import os
+import time
+from datetime import date, datetime
+from supabase_client import get_client, is_schema_cache_error, reload_schema_cache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Column order of every row tuple handed to the sink
+PRICE_COLUMNS = ('card_id', 'source', 'price_type', 'price_raw', 'currency',
+                 'fx_rate_to_brl', 'price_brl', 'scraped_at')
+PRICE_CONFLICT = 'card_id,source,scraped_at,price_type'
+# Expected kind per column, checked before sending: 'int' | 'num' | 'str' | 'date'
+PRICE_TYPES = {
+    'card_id': 'int',
+    'source': 'str',
+    'price_type': 'str',
+    'price_raw': 'num',
+    'currency': 'str',
+    'fx_rate_to_brl': 'num',
+    'price_brl': 'num',
+    'scraped_at': 'date',
+}
+
+# 'orjson' (dicts built at flush time, C encoder) | 'template' (straight from row tuples) | 'json' (stdlib)
+ENCODER = os.getenv('SINK_ENCODER', 'orjson' if orjson else 'template')
+# 'auto' tries gzip and falls back for the rest of the run if the server rejects it
+COMPRESS = os.getenv('SINK_GZIP', 'auto').lower()
+GZIP_LEVEL = int(os.getenv('SINK_GZIP_LEVEL', 3))
+MAX_RETRIES = 3
+QUARANTINE_DIR = os.getenv('SINK_QUARANTINE_DIR', 'quarantine')
+DATA_ERROR_STATUSES = (400, 409, 422)
+FATAL_STATUSES = (401, 403, 404, 405)
+
+
+class SinkError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+    @property
+    def is_data_error(self):
+        """The payload was rejected (bad value, constraint): resending the same rows won't help"""
+        return self.status in DATA_ERROR_STATUSES
+
+    @property
+    def is_fatal(self):
+        """Bad key, RLS denial, missing table/RPC: every other batch would fail the same way"""
+        return self.status in FATAL_STATUSES
+
+
+def _valid(kind, value):
+    if kind == 'int':
+        return type(value) is int
+    if kind == 'num':
+        return type(value) in (int, float) and math.isfinite(value)
+    if kind == 'str':
+        return isinstance(value, str) and value != ''
+    if kind == 'date':
+        if isinstance(value, (date, datetime)):
+            return True
+        try:
+            date.fromisoformat(str(value)[:10])
+            return True
+        except ValueError:
+            return False
+    return True
+
+
+# --- Encoders: (columns, rows) -> bytes (JSON array of objects) ---
+
+def encode_json(columns, rows):
+    return json.dumps([dict(zip(columns, r)) for r in rows]).encode('utf-8')
+
+
+def encode_orjson(columns, rows):
+    return orjson.dumps([dict(zip(columns, r)) for r in rows])
+
+
+def _encode_column(values):
+    """JSON text for one column, picking a C-level path by the column's types"""
+    kinds = set(map(type, values))
+    if kinds <= {str, type(None)}:
+        # Sources, price types, currencies and dates repeat across the whole batch
+        lookup = {v: json.dumps(v) if v is not None else 'null' for v in set(values)}
+        return list(map(lookup.__getitem__, values))
+    if kinds <= {int}:
+        return list(map(str, values))
+    if kinds <= {int, float} and all(map(math.isfinite, values)):
+        return list(map(repr, values))
+    return [json.dumps(v if not isinstance(v, float) or math.isfinite(v) else None) for v in values]
+
+
+def encode_template(columns, rows):
+    """Writes JSON text column by column from row tuples, without building a dict per row"""
+    if not rows:
+        return b'[]'
+    template = '{' + ','.join(json.dumps(c) + ':%s' for c in columns) + '}'
+    encoded = [_encode_column(col) for col in zip(*rows)]
+    return ('[' + ','.join(map(template.__mod__, zip(*encoded))) + ']').encode('utf-8')
+
+
+ENCODERS = {
+    'json': encode_json,
+    'orjson': encode_orjson,
+    'template': encode_template,
+}
+
+
+class PriceSink:
+    """Buffered bulk upsert into a PostgREST table.
+
+    Rows are positional tuples in `columns` order (no per-row dicts while
+    importing). Each flush encodes the batch once, optionally gzips it and
+    POSTs it over the shared pooled session.
+
+    Before sending, rows with a bad type are quarantined and duplicate
+    conflict keys collapse to the last occurrence (Postgres rejects an
+    upsert that touches the same row twice). If the server still rejects
+    the batch, it is bisected until only the offending rows are left;
+    those go to a JSONL file under QUARANTINE_DIR instead of being dropped.
+    Auth and config errors (FATAL_STATUSES) raise instead: no row is to blame.
+    """
+
+    def __init__(self, table='price_history', columns=PRICE_COLUMNS, on_conflict=PRICE_CONFLICT,
+                 batch_size=2000, dry_run=False, encoder=ENCODER, compress=COMPRESS, on_written=None,
+                 types=PRICE_TYPES, before_write=None):
+        self.table = table
+        self.columns = tuple(columns)
+        self.on_conflict = on_conflict
+        self.key_index = [self.columns.index(c) for c in on_conflict.split(',')] if on_conflict else []
+        self.checks = [(i, types[c]) for i, c in enumerate(self.columns) if c in (types or {})]
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.encode = ENCODERS[encoder]
+        self.gzip = compress in ('auto', 'true')
+        self.gzip_auto = compress == 'auto'
+        self.on_written = on_written
+        self.before_write = before_write
+        self.buffer = []
+        self.stats = {
+            'rows': 0,
+            'failed_rows': 0,
+            'flushes': 0,
+            'bytes_raw': 0,
+            'bytes_sent': 0,
+            'encode_seconds': 0.0,
+            'retries': 0,
+            'duplicates': 0,
+            'invalid': 0,
+            'quarantined': 0,
+            'bisections': 0,
+            'hook_errors': 0,
+        }
+        self.quarantine_path = None
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def add(self, row):
+        """Dict row (compatibility path)"""
+        self.buffer.append(tuple(row.get(c) for c in self.columns))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def add_point(self, *values):
+        """Positional row in `columns` order"""
+        self.buffer.append(values)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return 0
+        rows = self._prepare(self.buffer)
+        self.buffer = []
+
+        if self.dry_run:
+            self.stats['rows'] += len(rows)
+            return len(rows)
+        if self.before_write and rows:
+            self.before_write(rows, self.columns)
+        return self._write(rows)
+
+    def _prepare(self, rows):
+        """Drop (quarantine) rows with bad types, keep the last row per conflict key"""
+        if self.checks:
+            bad = [r for r in rows if not all(_valid(kind, r[i]) for i, kind in self.checks)]
+            if bad:
+                self.stats['invalid'] += len(bad)
+                self._quarantine(bad, 'type validation failed')
+                bad_ids = set(map(id, bad))
+                rows = [r for r in rows if id(r) not in bad_ids]
+
+        if self.key_index:
+            key_index = self.key_index
+            unique = {tuple(r[i] for i in key_index): r for r in rows}
+            if len(unique) < len(rows):
+                self.stats['duplicates'] += len(rows) - len(unique)
+                rows = list(unique.values())
+        return rows
+
+    def _write(self, rows):
+        """Send rows; on a data error, split in half and retry each side"""
+        if not rows:
+            return 0
+        try:
+            self._send_with_retry(rows)
+        except Exception as e:
+            if isinstance(e, SinkError) and e.is_fatal:
+                raise
+            if len(rows) > 1 and isinstance(e, SinkError) and e.is_data_error:
+                self.stats['bisections'] += 1
+                mid = len(rows) // 2
+                return self._write(rows[:mid]) + self._write(rows[mid:])
+            # Single bad row, or a transport failure that outlived the retries
+            print(f"Sink flush error ({len(rows)} rows quarantined): {e}")
+            self.stats['failed_rows'] += len(rows)
+            self._quarantine(rows, str(e))
+            return 0
+
+        self.stats['rows'] += len(rows)
+        self.stats['flushes'] += 1
+        if self.on_written:
+            # The rows are in: a failing hook (rollups, alerts...) is not a write failure
+            try:
+                self.on_written(rows, self.columns)
+            except Exception as e:
+                self.stats['hook_errors'] += 1
+                print(f"Sink on_written hook failed: {e}")
+        return len(rows)
+
+    def _quarantine(self, rows, reason):
+        if self.quarantine_path is None:
+            os.makedirs(QUARANTINE_DIR, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            self.quarantine_path = os.path.join(QUARANTINE_DIR, f"{self.table}_{stamp}.jsonl")
+        with open(self.quarantine_path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps({'row': dict(zip(self.columns, row)), 'error': reason}, default=str) + '\n')
+        self.stats['quarantined'] += len(rows)
+
+    def checkpoint(self):
+        """Make every row added so far durable (before recording progress elsewhere)"""
+        self.flush()
+
+    def close(self):
+        self.flush()
+        return self.stats
+
+    # --- transport ---
+
+    def _encode(self, rows):
+        start = time.perf_counter()
+        body = self.encode(self.columns, rows)
+        self.stats['encode_seconds'] += time.perf_counter() - start
+        self.stats['bytes_raw'] += len(body)
+        return body
+
+    def _post(self, body, compressed):
+        session = get_client().postgrest.session
+        headers = {
+            'Content-Type': 'application/json',
+            'Prefer': 'resolution=merge-duplicates,return=minimal',
+        }
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+        params = {'on_conflict': self.on_conflict} if self.on_conflict else None
+        response = session.post(f'/{self.table}', params=params, content=body, headers=headers)
+        if response.status_code >= 400:
+            raise SinkError(response.status_code, response.text[:500])
+        self.stats['bytes_sent'] += len(body)
+
+    def _send(self, rows):
+        body = self._encode(rows)
+        probing = False
+        if self.gzip:
+            try:
+                self._post(gzip.compress(body, compresslevel=GZIP_LEVEL), True)
+                self.gzip_auto = False  # Confirmed accepted, no more fallback probing
+                return
+            except SinkError as e:
+                if not (self.gzip_auto and e.status in (400, 415)):
+                    raise
+                if e.status == 415:
+                    # Unsupported Media Type names the encoding itself, whatever the rows hold
+                    self._stop_gzip()
+                else:
+                    probing = True
+        # The uncompressed send raises like any other: _send_with_retry retries
+        # transport errors, _write bisects / quarantines data errors, fatal ones abort
+        self._post(body, False)
+        if probing:
+            # Same body accepted uncompressed: the 400 was the encoding, not the rows
+            self._stop_gzip()
+
+    def _stop_gzip(self):
+        print("gzip request bodies rejected, sending uncompressed from now on")
+        self.gzip = self.gzip_auto = False
+
+    def _send_with_retry(self, rows):
+        for attempt in range(MAX_RETRIES):
+            try:
+                return self._send(rows)
+            except Exception as e:
+                schema_error = is_schema_cache_error(e)
+                # Bad rows fail the same way every time: let _write bisect right away
+                if attempt == MAX_RETRIES - 1 or (
+                        isinstance(e, SinkError) and (e.is_data_error or e.is_fatal) and not schema_error):
+                    raise
+                self.stats['retries'] += 1
+                if schema_error:
+                    reload_schema_cache()
+                time.sleep(1 * (attempt + 1))
+
+
+# --- File export: build once, load later (load_price_chunks.py) ---
+
+EXPORT_FORMAT = os.getenv('EXPORT_FORMAT', 'ndjson')  # 'ndjson' | 'columnar'
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 100000))
+MANIFEST = 'manifest.json'
+LOAD_STATE = 'loaded.json'  # load_price_chunks.py progress
+
+
+class FileSink(PriceSink):
+    """PriceSink that writes numbered gzip chunks instead of POSTing.
+
+    Rows go through the same validation and conflict-key dedup as a live
+    import, so the chunks hold exactly what would have been sent.
+    manifest.json (rewritten after every chunk) lists the chunks with their
+    row counts and sha256; load_price_chunks.py uploads them.
+
+    checkpoint() writes the pending rows out and marks the chunk count in
+    the manifest. resume=True keeps the chunks up to the last checkpoint of an
+    interrupted export (the caller skips the cards behind it, e.g. a Shard);
+    otherwise an existing export in the directory is cleared and rewritten.
+    Chunks past the checkpoint are dropped and rebuilt, and any overlap is
+    harmless: the loader upserts on the conflict key.
+    """
+
+    def __init__(self, directory, fmt=EXPORT_FORMAT, chunk_rows=EXPORT_CHUNK_ROWS, resume=False, **kwargs):
+        if fmt not in ('ndjson', 'columnar'):
+            raise ValueError(f"Unknown export format: {fmt}")
+        # Nothing reaches the DB here: rollups / partitions are the loader's job
+        kwargs.update(on_written=None, before_write=None, dry_run=False)
+        super().__init__(**kwargs)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.format = fmt
+        self.chunk_rows = chunk_rows
+        self.pending = []
+        self.chunks = []
+        self.checkpointed = 0
+        self.complete = False
+        self._reset(resume)
+
+    def _reset(self, resume):
+        """Keep the checkpointed chunks of a previous run (resume) or clear them"""
+        path = os.path.join(self.directory, MANIFEST)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if resume:
+            if manifest['format'] != self.format or list(manifest['columns']) != list(self.columns):
+                raise ValueError(f"{self.directory}: export has another format/columns, can't resume")
+            keep = manifest['chunks'] if manifest.get('complete') else manifest['chunks'][:manifest.get('checkpoint', 0)]
+            self.chunks = list(keep)
+            self.checkpointed = len(self.chunks)
+        kept = {c['file'] for c in self.chunks}
+        for name in os.listdir(self.directory):
+            if name.startswith('chunk_') and name not in kept:
+                os.remove(os.path.join(self.directory, name))
+        if not resume:
+            # Upload progress of the old chunks means nothing for the new ones
+            for name in (MANIFEST, LOAD_STATE):
+                if os.path.exists(os.path.join(self.directory, name)):
+                    os.remove(os.path.join(self.directory, name))
+        else:
+            self._write_manifest()
+        print(f"{self.directory}: " + (f"resuming export after {len(self.chunks)} chunk(s)" if resume
+                                      else "clearing the previous export"))
+
+    def _write(self, rows):
+        self.pending.extend(rows)
+        while len(self.pending) >= self.chunk_rows:
+            self._write_chunk(self.pending[:self.chunk_rows])
+            del self.pending[:self.chunk_rows]
+        self.stats['rows'] += len(rows)
+        return len(rows)
+
+    def _write_chunk(self, rows):
+        name = f"chunk_{len(self.chunks) + 1:06d}.{'ndjson' if self.format == 'ndjson' else 'cols.json'}.gz"
+        path = os.path.join(self.directory, name)
+        start = time.perf_counter()
+        if self.format == 'ndjson':
+            dumps = (lambda r: orjson.dumps(dict(zip(self.columns, r)), default=str)) if orjson \
+                else (lambda r: json.dumps(dict(zip(self.columns, r)), default=str).encode('utf-8'))
+            body = b'\n'.join(map(dumps, rows)) + b'\n'
+        else:
+            body = json.dumps({'columns': self.columns, 'data': [list(c) for c in zip(*rows)]},
+                              default=str).encode('utf-8')
+        self.stats['encode_seconds'] += time.perf_counter() - start
+        self.stats['bytes_raw'] += len(body)
+
+        data = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        self.stats['bytes_sent'] += len(data)
+        self.stats['flushes'] += 1
+        self.chunks.append({'file': name, 'rows': len(rows), 'sha256': hashlib.sha256(data).hexdigest()})
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {
+            'table': self.table,
+            'columns': self.columns,
+            'on_conflict': self.on_conflict,
+            'format': self.format,
+            'rows': sum(c['rows'] for c in self.chunks),
+            'complete': self.complete,
+            'checkpoint': self.checkpointed,
+            'chunks': self.chunks,
+        }
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def checkpoint(self):
+        self.flush()
+        if self.pending:
+            self._write_chunk(self.pending)
+            self.pending = []
+        self.checkpointed = len(self.chunks)
+        self._write_manifest()
+
+    def close(self):
+        self.complete = True
+        self.checkpoint()
+        return self.stats
+
+
+def read_chunk(path, columns):
+    """Row tuples (in `columns` order) from a FileSink chunk"""
+    with gzip.open(path, 'rb') as f:
+        body = f.read()
+    if path.endswith('.ndjson.gz'):
+        loads = orjson.loads if orjson else json.loads
+        return [tuple(map(obj.get, columns)) for obj in map(loads, body.splitlines()) if obj]
+    doc = json.loads(body)
+    data = dict(zip(doc['columns'], doc['data']))
+    return list(zip(*(data[c] for c in columns)))
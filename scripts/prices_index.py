@@ -0,0 +1,271 @@
+"""Byte-offset index into an AllPrices file for single-card refreshes.
+
+    python prices_index.py build [--file AllPrices.json]
+    python prices_index.py show <uuid> [--file ...]
+    python prices_index.py refresh-card <uuid> [--file ...] [--dry-run]
+
+The sidecar (<file>.idx) maps every UUID under "data" to the (offset,
+length) of its JSON value: fixed-size records sorted by UUID, found by
+binary search, so refresh-card seeks, parses and upserts one card's history
+instead of loading the whole file. The index header stores the file's
+sha256; when size or mtime change the file is hashed again and the index
+rebuilt if the content differs.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+from import_shards import canonical_uuid
+from price_constants import FIXED_COST_BRL, DEFAULT_USD_BRL
+
+PRICES_FILE = os.getenv('PRICES_FILE', r'e:\Dev\App - Boost Homebroker\data\AllPrices.json')
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 1
+RECORD = struct.Struct('>16sQI')  # uuid, offset, length
+FX_RATE = float(os.getenv('FX_RATE', DEFAULT_USD_BRL))  # same fixed rate as the full importers
+
+# Entries are the only objects keyed by a UUID: "<uuid>": {
+_ENTRY = re.compile(rb'"([0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12})"\s*:\s*\{')
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}]')
+
+
+def normalize_uuid(uuid_str):
+    c = canonical_uuid(uuid_str)
+    return f"{c[:8]}-{c[8:12]}-{c[12:16]}-{c[16:20]}-{c[20:]}"
+
+
+def file_sha256(path, block=8 * 1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _object_end(buf, start):
+    """Offset just past the object starting at buf[start] == '{'"""
+    depth = 0
+    for m in _TOKEN.finditer(buf, start):
+        tok = m.group()
+        if tok == b'{':
+            depth += 1
+        elif tok == b'}':
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    raise ValueError(f"Unterminated object at byte {start}")
+
+
+def scan_entries(buf):
+    """{canonical uuid: (offset, length)} of every entry value in an AllPrices buffer"""
+    starts = [(m.group(1).decode('ascii'), m.start(), m.end() - 1) for m in _ENTRY.finditer(buf)]
+    entries = {}
+    for i, (uuid, _, start) in enumerate(starts):
+        if i + 1 < len(starts):
+            # Values sit back to back: this one ends at the last '}' before the next key
+            end = buf.rfind(b'}', start, starts[i + 1][1]) + 1
+        else:
+            end = _object_end(buf, start)
+        entries[canonical_uuid(uuid)] = (start, end - start)
+    return entries
+
+
+def index_path(prices_file):
+    return prices_file + INDEX_SUFFIX
+
+
+def _write_index(path, meta, records):
+    """One JSON header line, then fixed-size records sorted by UUID"""
+    meta = {**meta, 'version': INDEX_VERSION, 'count': len(records) // RECORD.size}
+    with open(path + '.tmp', 'wb') as f:
+        f.write(json.dumps(meta).encode('utf-8') + b'\n')
+        f.write(records)
+    os.replace(path + '.tmp', path)
+
+
+def _read_meta(path):
+    with open(path, 'rb') as f:
+        line = f.readline()
+    meta = json.loads(line)
+    meta['base'] = len(line)
+    return meta
+
+
+def build_index(prices_file, sha256=None):
+    start = time.perf_counter()
+    st = os.stat(prices_file)
+    with open(prices_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        entries = scan_entries(mm)
+    records = b''.join(RECORD.pack(bytes.fromhex(uuid), offset, length)
+                       for uuid, (offset, length) in sorted(entries.items()))
+    path = index_path(prices_file)
+    _write_index(path, {
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha256': sha256 or file_sha256(prices_file),
+        'built_at': datetime.now(timezone.utc).isoformat(),
+    }, records)
+    print(f"Indexed {len(entries)} UUIDs of {prices_file} in {time.perf_counter() - start:.1f}s -> {path}")
+    return _read_meta(path)
+
+
+def load_index(prices_file):
+    """Header of the index for the current content of prices_file, (re)built when needed"""
+    path = index_path(prices_file)
+    meta = _read_meta(path) if os.path.exists(path) else None
+    if meta is None or meta.get('version') != INDEX_VERSION:
+        return build_index(prices_file)
+
+    st = os.stat(prices_file)
+    if (meta['size'], meta['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+        return meta
+    # Touched: only a different checksum makes the offsets stale
+    sha256 = file_sha256(prices_file)
+    if sha256 != meta['sha256']:
+        print("Prices file changed, rebuilding index...")
+        return build_index(prices_file, sha256)
+    with open(path, 'rb') as f:
+        f.seek(meta.pop('base'))
+        records = f.read()
+    meta.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+    _write_index(path, meta, records)
+    return _read_meta(path)
+
+
+def lookup(prices_file, meta, uuid):
+    """(offset, length) of a UUID's entry, or None; binary search over the records"""
+    key = bytes.fromhex(canonical_uuid(uuid))
+    with open(index_path(prices_file), 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lo, hi = 0, meta['count']
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = meta['base'] + mid * RECORD.size
+            if mm[pos:pos + 16] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        pos = meta['base'] + lo * RECORD.size
+        if lo < meta['count'] and mm[pos:pos + 16] == key:
+            return RECORD.unpack_from(mm, pos)[1:]
+    return None
+
+
+def read_entry(prices_file, meta, uuid):
+    """Parsed price data of one UUID, or None when the file does not have it"""
+    loc = lookup(prices_file, meta, uuid)
+    if loc is None:
+        return None
+    offset, length = loc
+    with open(prices_file, 'rb') as f:
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+
+def card_points(card_id, is_foil, price_data, fx_rate=FX_RATE):
+    """CardKingdom buy/sell history of one card variant as PRICE_COLUMNS tuples"""
+    ck = price_data.get('paper', {}).get('cardkingdom', {})
+    finish = 'foil' if is_foil else 'normal'
+    points = []
+    for price_type, key in (('buy', 'buylist'), ('sell', 'retail')):
+        for day, price_usd in ck.get(key, {}).get(finish, {}).items():
+            if isinstance(price_usd, (int, float)):
+                points.append((card_id, 'CardKingdom', price_type, price_usd, 'USD', fx_rate,
+                               price_usd * fx_rate + FIXED_COST_BRL, day))
+    return points
+
+
+def refresh_card(uuid, prices_file=PRICES_FILE, dry_run=False):
+    from supabase_client import get_client
+    from price_rollups import RollupTracker
+    from price_alerts import AlertTracker
+    from price_read_service import ChangedCardsTracker
+    from price_sink import PriceSink
+    from price_partitions import PartitionRouter
+
+    start = time.perf_counter()
+    meta = load_index(prices_file)
+    price_data = read_entry(prices_file, meta, uuid)
+    if price_data is None:
+        print(f"{uuid}: not in {prices_file}")
+        return 1
+    read_ms = (time.perf_counter() - start) * 1000
+
+    client = get_client()
+    variants = client.table('cards').select('id, is_foil, ck_buy_usd') \
+        .eq('mtgjson_uuid', normalize_uuid(uuid)).execute().data
+    if not variants:
+        print(f"{uuid}: no card with this mtgjson_uuid")
+        return 1
+
+    # Same baseline as the daily import: the stored buylist price, so an unchanged one can't alert
+    previous = {v['id']: float(v['ck_buy_usd']) for v in variants if v.get('ck_buy_usd') is not None}
+    rollups, alerts, changed = RollupTracker(), AlertTracker(previous=previous), ChangedCardsTracker()
+    newest_buy = {}  # card_id -> newest buy point: the whole history is rewritten, only that one is news
+
+    def on_written(rows, columns):
+        rollups.track(rows, columns)
+        alerts.track([r for r in rows if newest_buy.get(r[0]) == r], columns)
+        changed.track(rows, columns)
+
+    sink = PriceSink(dry_run=dry_run, on_written=on_written, before_write=PartitionRouter())
+    for variant in variants:
+        points = card_points(variant['id'], variant['is_foil'], price_data)
+        latest = {}  # price_type -> newest point
+        for point in points:
+            if point[2] not in latest or point[7] > latest[point[2]][7]:
+                latest[point[2]] = point
+        if 'buy' in latest:
+            newest_buy[variant['id']] = latest['buy']
+        for point in points:
+            sink.add_point(*point)
+        if latest and not dry_run:
+            update = {'ck_last_update': max(p[7] for p in latest.values())}
+            if 'buy' in latest:
+                update.update(ck_buy_usd=latest['buy'][3], ck_buy_brl=latest['buy'][6])
+            if 'sell' in latest:
+                update.update(ck_retail_usd=latest['sell'][3], ck_retail_brl=latest['sell'][6])
+            client.table('cards').update(update).eq('id', variant['id']).execute()
+    sink.close()
+
+    if not dry_run:
+        rollups.refresh(client)
+        changed.notify()
+        alerts.evaluate(client)
+    print(f"{uuid}: {len(variants)} variant(s), {sink.stats['rows']} prices "
+          f"(read {read_ms:.1f} ms, total {(time.perf_counter() - start) * 1000:.0f} ms)"
+          + (" [dry run]" if dry_run else ""))
+    return 0
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='AllPrices byte-offset index')
+    parser.add_argument('--file', default=PRICES_FILE)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build')
+    show = sub.add_parser('show')
+    show.add_argument('uuid')
+    refresh = sub.add_parser('refresh-card')
+    refresh.add_argument('uuid')
+    refresh.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_index(args.file)
+    elif args.command == 'show':
+        entry = read_entry(args.file, load_index(args.file), args.uuid)
+        print(json.dumps(entry, indent=1) if entry is not None else f"{args.uuid}: not found")
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+        sys.exit(refresh_card(args.uuid, args.file, args.dry_run))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""Opt-in profiling for the importers and scrapers (--profile).
+
+    profiler = Profiler('import_prices', enabled=args.profile)
+    with profiler.stage('load'):
+        ...
+    profiler.close()   # also runs at exit
+
+Per stage: a cProfile dump (<stage>.prof, for pstats / snakeviz), wall and
+CPU time, peak RSS and peak traced Python memory. A background sampler
+records the stacks of every thread each PROFILE_INTERVAL seconds into
+collapsed.txt ('stage;thread;frame;...;frame count' lines, the input of
+flamegraph.pl and speedscope) and the top tracemalloc allocators every
+PROFILE_SNAPSHOT_SECONDS (stretched when snapshots themselves are slow). report.txt / report.json under
+PROFILE_DIR/<name>-<timestamp>/ summarize it all.
+
+cProfile only sees the thread that entered the stage; worker threads show
+up in the sampled stacks. tracemalloc slows allocation-heavy code down
+noticeably and grouping a snapshot takes ~4us per live block, so snapshots
+are skipped above PROFILE_MAX_SNAPSHOT_BLOCKS (e.g. with a whole AllPrices
+file in memory). Compare timings between profiled runs only. A disabled
+Profiler costs nothing: stage() is a no-op.
+"""
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.01))
+PROFILE_SNAPSHOT_SECONDS = float(os.getenv('PROFILE_SNAPSHOT_SECONDS', 30))
+# tracemalloc adds ~50 bytes per live block; PROFILE_TRACEMALLOC=0 for CPU / RSS only
+PROFILE_TRACEMALLOC = os.getenv('PROFILE_TRACEMALLOC', '1') != '0'
+MAX_SNAPSHOT_BLOCKS = int(os.getenv('PROFILE_MAX_SNAPSHOT_BLOCKS', 5_000_000))
+TRACE_BYTES_PER_BLOCK = 48
+TOP_FUNCTIONS = 30
+TOP_ALLOCATORS = 15
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def current_rss():
+    """Resident set size in bytes, or None where it cannot be read"""
+    if psutil:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_label(name):
+    # ThreadPoolExecutor-0_3 -> ThreadPoolExecutor-0: one flame per pool, not per worker
+    return re.sub(r'_\d+$', '', name).replace(';', ',')
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rss_start = None
+        self.rss_end = None
+        self.rss_peak = None
+        self.py_peak = None
+        self.profiles = []
+        self.allocators = []  # (seconds into the stage, [(where, bytes, count)])
+
+    def see_rss(self, rss):
+        if rss is not None and (self.rss_peak is None or rss > self.rss_peak):
+            self.rss_peak = rss
+
+
+class Profiler:
+    def __init__(self, name, enabled=True, directory=PROFILE_DIR, interval=PROFILE_INTERVAL,
+                 snapshot_seconds=PROFILE_SNAPSHOT_SECONDS, trace_memory=PROFILE_TRACEMALLOC):
+        self.name = name
+        self.enabled = enabled
+        self.closed = False
+        if not enabled:
+            return
+        self.directory = os.path.join(directory, f"{name}-{datetime.now():%Y%m%d-%H%M%S}")
+        self.interval = interval
+        self.snapshot_seconds = snapshot_seconds
+        self.stages = {}
+        self.active = []  # stack of (StageStats, entered_at)
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.next_snapshot = self.started + snapshot_seconds
+        self.snapshot_seconds_spent = 0.0
+        self.snapshots_skipped = 0
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._stop = threading.Event()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._sampler = threading.Thread(target=self._sample_loop, name='profiler', daemon=True)
+        self._sampler.start()
+        atexit.register(self.close)
+        print(f"Profiling to {self.directory}")
+
+    def stage(self, name):
+        if not self.enabled:
+            return nullcontext()
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name):
+        with self._lock:
+            st = self.stages.get(name) or self.stages.setdefault(name, StageStats(name))
+            # cProfile allows one active profiler per thread: nested stages share the outer one
+            profile = None if self.active else cProfile.Profile()
+            self.active.append((st, time.perf_counter()))
+        rss = current_rss()
+        if st.rss_start is None:
+            st.rss_start = rss
+        st.see_rss(rss)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield st
+        finally:
+            if profile:
+                profile.disable()
+                st.profiles.append(profile)
+            st.wall += time.perf_counter() - wall
+            st.cpu += time.process_time() - cpu
+            st.calls += 1
+            st.rss_end = current_rss()
+            st.see_rss(st.rss_end)
+            if tracemalloc.is_tracing():
+                st.py_peak = max(st.py_peak or 0, tracemalloc.get_traced_memory()[1])
+            elapsed = time.perf_counter() - wall
+            with self._lock:
+                self.active.pop()
+            # Every top-level stage gets at least one allocator snapshot
+            if profile:
+                self._snapshot(st, elapsed, force=not st.allocators)
+
+    def _snapshot(self, st, at, force=False):
+        """Top allocators into st.allocators, within the snapshot time budget"""
+        if not tracemalloc.is_tracing() or (not force and time.perf_counter() < self.next_snapshot):
+            return
+        if tracemalloc.get_tracemalloc_memory() / TRACE_BYTES_PER_BLOCK > MAX_SNAPSHOT_BLOCKS:
+            self.snapshots_skipped += 1
+            self.next_snapshot = time.perf_counter() + self.snapshot_seconds
+            return
+        if not self._snapshot_lock.acquire(blocking=False):
+            return
+        try:
+            t = time.perf_counter()
+            stats = tracemalloc.take_snapshot().statistics('lineno')
+            top = [(str(s.traceback), s.size, s.count) for s in stats[:TOP_ALLOCATORS + 5]
+                   if s.traceback[0].filename not in (tracemalloc.__file__, __file__)]
+            st.allocators.append((round(at, 1), top[:TOP_ALLOCATORS]))
+            # Grouping every live block holds the GIL (~5s per million blocks): keep it under ~5%
+            cost = time.perf_counter() - t
+            self.snapshot_seconds_spent += cost
+            self.next_snapshot = time.perf_counter() + max(self.snapshot_seconds, 20 * cost)
+        finally:
+            self._snapshot_lock.release()
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                if not self.active:
+                    continue
+                st, entered = self.active[-1]
+                stage = '/'.join(s.name for s, _ in self.active)
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                key = ';'.join([stage, _thread_label(names.get(ident, str(ident)))] + stack[::-1])
+                self.stacks[key] += 1
+            self.samples += 1
+            st.see_rss(current_rss())
+            self._snapshot(st, time.perf_counter() - entered)
+
+    def close(self):
+        if not self.enabled or self.closed:
+            return
+        self.closed = True
+        self._stop.set()
+        self._sampler.join()
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(os.path.join(self.directory, 'collapsed.txt'), 'w', encoding='utf-8') as f:
+            for key, count in self.stacks.most_common():
+                f.write(f"{key} {count}\n")
+
+        out = io.StringIO()
+        mb = lambda b: f"{b / 1e6:10.1f}" if b is not None else f"{'n/a':>10}"
+        out.write(f"Profile: {self.name}  {' '.join(sys.argv)}\n")
+        out.write(f"Total {time.perf_counter() - self.started:.1f}s, {self.samples} stack samples "
+                  f"every {self.interval * 1000:g} ms, {self.snapshot_seconds_spent:.1f}s in tracemalloc snapshots"
+                  + (f" ({self.snapshots_skipped} skipped, too many live blocks)" if self.snapshots_skipped else "")
+                  + "\n\n")
+        out.write(f"{'stage':<20}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'RSS peak MB':>14}"
+                  f"{'RSS delta MB':>14}{'py peak MB':>12}\n")
+        summary = []
+        for st in self.stages.values():
+            delta = st.rss_end - st.rss_start if st.rss_end is not None and st.rss_start is not None else None
+            out.write(f"{st.name:<20}{st.calls:>7}{st.wall:>10.2f}{st.cpu:>10.2f}{mb(st.rss_peak):>14}"
+                      f"{mb(delta):>14}{mb(st.py_peak):>12}\n")
+            summary.append({'stage': st.name, 'calls': st.calls, 'wall': round(st.wall, 3),
+                            'cpu': round(st.cpu, 3), 'rss_peak': st.rss_peak, 'rss_delta': delta,
+                            'py_peak': st.py_peak})
+
+        for st in self.stages.values():
+            if st.profiles:
+                stats = pstats.Stats(*st.profiles)
+                stats.dump_stats(os.path.join(self.directory, f"{st.name}.prof"))
+                out.write(f"\n== {st.name}: top {TOP_FUNCTIONS} by cumulative time ==\n")
+                stats.stream = out
+                stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            if st.allocators:
+                at, top = max(st.allocators, key=lambda a: sum(size for _, size, _ in a[1]))
+                out.write(f"\n== {st.name}: top allocators (tracemalloc, {at}s into the stage) ==\n")
+                for where, size, count in top:
+                    out.write(f"{size / 1e6:10.2f} MB {count:>10} blocks  {where}\n")
+
+        report = out.getvalue()
+        with open(os.path.join(self.directory, 'report.txt'), 'w', encoding='utf-8') as f:
+            f.write(report)
+        with open(os.path.join(self.directory, 'report.json'), 'w', encoding='utf-8') as f:
+            json.dump({'name': self.name, 'argv': sys.argv, 'stages': summary,
+                       'allocators': {st.name: st.allocators for st in self.stages.values()}}, f, indent=1)
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        print(f"\nProfile written to {self.directory} (report.txt, collapsed.txt, <stage>.prof)")
+        print(report.split('\n\n== ')[0].split('\n\n', 1)[-1])
@@ -0,0 +1,245 @@
+"""Find CardKingdom rows that are missing or wrong in price_history, without downloading it.
+
+Both sides hash (card_id, price_type, date, price in cents) tuples into
+card_id-range buckets (reconcile_price_history.sql). Buckets whose row count
+or hash sum differ are split again; once a range is small enough its DB rows
+are fetched and diffed. Missing/different rows become a repair batch
+(JSONL, PriceSink row layout) that --apply writes back. Missing rows get the
+--fx rate; rows that only differ keep the fx_rate stored with them (the daily
+importer writes the real day's rate), only price_raw/price_brl change.
+
+    python reconcile_prices.py [--file AllPrices.json] [--fanout 256] [--leaf 64] [--apply]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from dotenv import load_dotenv
+from supabase_client import get_client, fetch_all
+from price_sink import PriceSink, PRICE_COLUMNS
+from price_rollups import RollupTracker
+from price_partitions import PartitionRouter
+from price_constants import FIXED_COST_BRL, DEFAULT_USD_BRL
+
+load_dotenv()
+
+PRICES_FILE = os.getenv('PRICES_FILE', r'e:\Dev\App - Boost Homebroker\data\AllPrices.json')
+SOURCE = 'CardKingdom'
+PAGE_SIZE = 1000
+PRICE_TYPES = (('buylist', 'buy'), ('retail', 'sell'))
+
+
+def normalize_uuid(s):
+    if len(s) == 36: return s
+    if len(s) == 32: return f"{s[:8]}-{s[8:12]}-{s[12:16]}-{s[16:20]}-{s[20:]}"
+    return None
+
+
+def to_cents(price):
+    """Same as round(price_raw * 100) on a NUMERIC (half away from zero)"""
+    return int((Decimal(str(price)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def row_hash(card_id, price_type, day, cents):
+    digest = hashlib.md5(f"{card_id}|{price_type}|{day}|{cents}".encode()).hexdigest()
+    return int(digest[:15], 16)
+
+
+def bucket_of(card_id, id_from, id_to, buckets):
+    return (card_id - id_from) * buckets // (id_to - id_from + 1)
+
+
+class LocalSide:
+    """Per-card (rows, hash sum) from the AllPrices file, rows re-derived on demand for leaves"""
+
+    def __init__(self, prices_data, uuid_map):
+        self.prices_data = prices_data
+        self.cards = {}  # card_id -> (file uuid, finish)
+        self.aggregates = {}  # card_id -> (rows, hash sum)
+        self.first_day = self.last_day = None
+        for uuid, price_data in prices_data.items():
+            norm = normalize_uuid(uuid)
+            if not norm or norm not in uuid_map:
+                continue
+            for card_id, is_foil in uuid_map[norm]:
+                self.cards[card_id] = (uuid, 'foil' if is_foil else 'normal')
+                rows = hashes = 0
+                for price_type, day, price in self.points(card_id):
+                    rows += 1
+                    hashes += row_hash(card_id, price_type, day, to_cents(price))
+                    if self.first_day is None or day < self.first_day:
+                        self.first_day = day
+                    if self.last_day is None or day > self.last_day:
+                        self.last_day = day
+                if rows:
+                    self.aggregates[card_id] = (rows, hashes)
+
+    def points(self, card_id):
+        uuid, finish = self.cards[card_id]
+        ck = self.prices_data[uuid].get('paper', {}).get('cardkingdom', {})
+        for key, price_type in PRICE_TYPES:
+            for day, price in ck.get(key, {}).get(finish, {}).items():
+                if isinstance(price, (int, float)):
+                    yield price_type, day, price
+
+    def buckets(self, id_from, id_to, buckets):
+        out = {}
+        for card_id, (rows, hashes) in self.aggregates.items():
+            if id_from <= card_id <= id_to:
+                b = bucket_of(card_id, id_from, id_to, buckets)
+                r, h = out.get(b, (0, 0))
+                out[b] = (r + rows, h + hashes)
+        return out
+
+
+class Reconciler:
+    def __init__(self, client, local, fanout=256, leaf=64):
+        self.client = client
+        self.local = local
+        self.fanout = fanout
+        self.leaf = leaf
+        self.queries = 0
+        self.mismatched_buckets = 0
+        self.missing = []  # (card_id, price_type, day, price)
+        self.different = []  # (card_id, price_type, day, price, stored fx_rate)
+        self.extra = []  # in DB, not in the file (reported only)
+
+    def db_buckets(self, id_from, id_to, buckets):
+        self.queries += 1
+        res = self.client.rpc('price_history_bucket_hashes', {
+            'p_source': SOURCE,
+            'p_from': self.local.first_day,
+            'p_to': self.local.last_day,
+            'p_id_from': id_from,
+            'p_id_to': id_to,
+            'p_buckets': buckets,
+        }).execute()
+        return {r['bucket']: (r['rows'], int(r['hash'] or 0)) for r in res.data or []}
+
+    def db_rows(self, id_from, id_to):
+        """{(card_id, price_type, day): (cents, fx_rate)} for a small card range, keyset-paged on id"""
+        rows = {}
+        last_id = 0
+        while True:
+            self.queries += 1
+            page = self.client.table('price_history').select('id, card_id, price_type, scraped_at, price_raw, fx_rate_to_brl') \
+                .eq('source', SOURCE) \
+                .gte('card_id', id_from).lte('card_id', id_to) \
+                .gte('scraped_at', self.local.first_day) \
+                .lte('scraped_at', f"{self.local.last_day}T23:59:59.999999+00:00") \
+                .gt('id', last_id).order('id').limit(PAGE_SIZE).execute().data
+            for r in page:
+                cents = to_cents(r['price_raw']) if r['price_raw'] is not None else None
+                rows[(r['card_id'], r['price_type'], r['scraped_at'][:10])] = (cents, r['fx_rate_to_brl'])
+            if len(page) < PAGE_SIZE:
+                return rows
+            last_id = page[-1]['id']
+
+    def diff_leaf(self, id_from, id_to):
+        db = self.db_rows(id_from, id_to)
+        for card_id in range(id_from, id_to + 1):
+            if card_id not in self.local.cards:
+                continue
+            for price_type, day, price in self.local.points(card_id):
+                key = (card_id, price_type, day)
+                if key not in db:
+                    self.missing.append((card_id, price_type, day, price))
+                    continue
+                cents, fx_rate = db.pop(key)
+                if cents != to_cents(price):
+                    self.different.append((card_id, price_type, day, price, fx_rate))
+        self.extra.extend(db)
+
+    def run(self, id_from, id_to):
+        queue = deque([(id_from, id_to)])
+        while queue:
+            lo, hi = queue.popleft()
+            if hi - lo + 1 <= self.leaf:
+                self.diff_leaf(lo, hi)
+                continue
+            buckets = min(self.fanout, hi - lo + 1)
+            local = self.local.buckets(lo, hi, buckets)
+            remote = self.db_buckets(lo, hi, buckets)
+            for b in sorted(set(local) | set(remote)):
+                if local.get(b, (0, 0)) == remote.get(b, (0, 0)):
+                    continue
+                self.mismatched_buckets += 1
+                # Card ids in bucket b: the inverse of bucket_of
+                span = hi - lo + 1
+                b_lo = lo + -(-b * span // buckets)
+                b_hi = lo + -(-(b + 1) * span // buckets) - 1
+                queue.append((b_lo, b_hi))
+
+
+def repair_rows(reconciler, fx_rate):
+    """Missing + different rows in PriceSink column order; existing rows keep their stored rate"""
+    points = [(*m, fx_rate) for m in reconciler.missing]
+    points += [(card_id, price_type, day, price, fx_rate if stored is None else float(stored))
+               for card_id, price_type, day, price, stored in reconciler.different]
+    for card_id, price_type, day, price, rate in points:
+        yield (card_id, SOURCE, price_type, price, 'USD', rate, (price * rate) + FIXED_COST_BRL, day)
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='Reconcile AllPrices file vs price_history')
+    parser.add_argument('--file', default=PRICES_FILE)
+    parser.add_argument('--fanout', type=int, default=256, help='buckets per RPC call')
+    parser.add_argument('--leaf', type=int, default=64, help='card ids per range fetched row by row')
+    parser.add_argument('--fx', type=float, default=DEFAULT_USD_BRL, help='USD-BRL rate for rows missing from the DB')
+    parser.add_argument('--repair-file', default=f"repair_{date.today():%Y%m%d}.jsonl")
+    parser.add_argument('--apply', action='store_true', help='upsert the repair batch')
+    args = parser.parse_args()
+
+    client = get_client()
+    print("Loading cards...")
+    uuid_map = {}
+    for card in fetch_all(client, 'cards', 'id, mtgjson_uuid, is_foil'):
+        uuid_map.setdefault(str(card['mtgjson_uuid']), []).append((card['id'], card['is_foil']))
+    card_ids = [cid for pairs in uuid_map.values() for cid, _ in pairs]
+
+    print(f"Loading {args.file}...")
+    with open(args.file, 'r', encoding='utf-8') as f:
+        prices_data = json.load(f).get('data', {})
+
+    start = time.perf_counter()
+    local = LocalSide(prices_data, uuid_map)
+    print(f"Local: {len(local.aggregates)} cards, {sum(r for r, _ in local.aggregates.values())} rows, "
+          f"{local.first_day} .. {local.last_day} ({time.perf_counter() - start:.1f}s)")
+    if not local.aggregates:
+        return
+
+    start = time.perf_counter()
+    reconciler = Reconciler(client, local, args.fanout, args.leaf)
+    reconciler.run(min(card_ids), max(card_ids))
+    print(f"\nQueries: {reconciler.queries} | mismatched buckets: {reconciler.mismatched_buckets} "
+          f"| {time.perf_counter() - start:.1f}s")
+    print(f"Missing in DB: {len(reconciler.missing)} | different price: {len(reconciler.different)} "
+          f"| only in DB: {len(reconciler.extra)}")
+
+    rows = list(repair_rows(reconciler, args.fx))
+    if not rows:
+        print("price_history matches the file")
+        return
+    with open(args.repair_file, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(PRICE_COLUMNS, row))) + '\n')
+    print(f"Repair batch: {len(rows)} rows -> {args.repair_file}")
+
+    if args.apply:
+        rollups = RollupTracker()
+        sink = PriceSink(on_written=rollups.track, before_write=PartitionRouter())
+        for row in rows:
+            sink.add_point(*row)
+        sink.close()
+        rollups.refresh(client)
+        print(f"Applied: {sink.stats['rows']} rows (failed: {sink.stats['failed_rows']})")
+
+
+if __name__ == '__main__':
+    main()
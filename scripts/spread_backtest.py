@@ -0,0 +1,262 @@
+"""Vectorized backtest of the CK buylist vs LigaMagic sell spread (create_spread_backtest.sql).
+
+Loads both price series for the window into dense date x card matrices,
+forward-fills LigaMagic (scraped less often than daily) for up to
+LM_MAX_STALE_DAYS, and computes per card: current / rolling ROI, how often
+and how long ROI stayed above --min-roi, volatility and a rank score. The
+whole catalogue is a handful of NumPy passes; loading dominates.
+
+    python spread_backtest.py [--days 90] [--window 30] [--min-roi 0.10] [--dry-run]
+    python spread_backtest.py --synthetic 80000   # time the math on random data
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from dotenv import load_dotenv
+from supabase_client import get_client
+from price_constants import FIXED_COST_BRL, DEFAULT_USD_BRL
+
+load_dotenv()
+
+LM_MAX_STALE_DAYS = 7
+MIN_ROI = 0.10
+PAGE_SIZE = 1000
+BATCH_SIZE = 500
+ID_CHUNK = 300  # card ids per in_() filter when loading CK rows
+
+
+def _load_rows(query_fn):
+    """Keyset-page a price_history query on id"""
+    rows = []
+    last_id = 0
+    while True:
+        page = query_fn().gt('id', last_id).order('id').limit(PAGE_SIZE).execute().data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        last_id = page[-1]['id']
+
+
+def load_series(client, start, end):
+    """LM sell rows in [start, end], then CK buy rows only for the cards LM covers"""
+    cols = 'id, card_id, scraped_at, price_raw, fx_rate_to_brl, price_brl'
+    end_ts = f"{end.isoformat()}T23:59:59.999999+00:00"
+
+    def base(source, price_type):
+        return client.table('price_history').select(cols) \
+            .eq('source', source).eq('price_type', price_type) \
+            .gte('scraped_at', start.isoformat()).lte('scraped_at', end_ts)
+
+    lm = _load_rows(lambda: base('LigaMagic', 'sell'))
+    card_ids = sorted({r['card_id'] for r in lm})
+    ck = []
+    for i in range(0, len(card_ids), ID_CHUNK):
+        chunk = card_ids[i:i + ID_CHUNK]
+        ck.extend(_load_rows(lambda: base('CardKingdom', 'buy').in_('card_id', chunk)))
+    return ck, lm
+
+
+def to_matrix(rows, card_index, start, days, value_fn):
+    """rows -> float64 (days x cards) matrix, NaN where there is no price"""
+    m = np.full((days, len(card_index)), np.nan)
+    if not rows:
+        return m
+    d = np.array([(date.fromisoformat(r['scraped_at'][:10]) - start).days for r in rows])
+    c = np.array([card_index[r['card_id']] for r in rows])
+    v = np.array([value_fn(r) for r in rows], dtype=np.float64)
+    ok = (d >= 0) & (d < days)
+    # Several rows on the same day: the last one wins, like the daily upsert
+    m[d[ok], c[ok]] = v[ok]
+    return m
+
+
+def forward_fill(m, max_stale):
+    """Carry the last known value down the date axis for at most max_stale days"""
+    days = np.arange(m.shape[0])[:, None]
+    last = np.where(np.isfinite(m), days, -1)
+    np.maximum.accumulate(last, axis=0, out=last)
+    filled = m[np.maximum(last, 0), np.arange(m.shape[1])]
+    filled[(last < 0) | (days - last > max_stale)] = np.nan
+    return filled
+
+
+def rolling_nanmean(m, window):
+    """Mean of the last `window` rows at every row, ignoring NaN"""
+    valid = np.isfinite(m)
+    sums = np.cumsum(np.where(valid, m, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def run_lengths(mask):
+    """Length of the streak of True ending at each row (date axis)"""
+    total = np.cumsum(mask, axis=0, dtype=np.int32)
+    at_reset = np.where(mask, 0, total)
+    np.maximum.accumulate(at_reset, axis=0, out=at_reset)
+    return total - at_reset
+
+
+def log_return_std(m):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = np.diff(np.log(np.where(m > 0, m, np.nan)), axis=0)
+    valid = np.isfinite(r).sum(axis=0)
+    out = np.full(m.shape[1], np.nan)
+    has = valid > 1
+    out[has] = np.nanstd(r[:, has], axis=0)
+    return out
+
+
+def compute_metrics(ck_brl, lm_brl, window=30, min_roi=MIN_ROI):
+    """ck_brl / lm_brl: (days x cards) matrices. Returns dict of per-card arrays"""
+    ck_w, lm_w = ck_brl[-window:], lm_brl[-window:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cost = lm_brl + FIXED_COST_BRL
+        roi_all = (ck_brl - cost) / cost
+    roi = roi_all[-window:]
+    valid = np.isfinite(roi)
+    above = valid & (roi > min_roi)
+    days_with_data = valid.sum(axis=0)
+
+    # 7-day means over the whole history, so the first days of the window see
+    # the days before it; rows without 7 days behind them are not a 7-day mean
+    rolling_7 = rolling_nanmean(roi_all, 7)
+    rolling_7[:6] = np.nan
+    rolling_7 = rolling_7[-window:]
+    runs = run_lengths(above)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        persistence = np.where(days_with_data > 0, above.sum(axis=0) / days_with_data, np.nan)
+    has = days_with_data > 0
+    roi_window = np.full(roi.shape[1], np.nan)
+    roi_window[has] = np.nanmean(roi[:, has], axis=0)
+    best_7 = np.full(roi.shape[1], np.nan)
+    best_7[has] = np.nanmax(rolling_7[:, has], axis=0)
+    roi_vol = np.full(roi.shape[1], np.nan)
+    roi_vol[has] = np.nanstd(roi[:, has], axis=0)
+
+    # Reward spreads that are large, held most of the window and are not noise
+    score = np.where(has, np.nan_to_num(roi_window) * np.nan_to_num(persistence)
+                     / (1 + np.nan_to_num(roi_vol)), np.nan)
+
+    return {
+        'days_with_data': days_with_data,
+        'current_roi': roi[-1],
+        'roi_7d': rolling_7[-1],
+        'roi_window': roi_window,
+        'best_roi_7d': best_7,
+        'persistence': persistence,
+        'longest_run': runs.max(axis=0),
+        'current_run': runs[-1],
+        'ck_volatility': log_return_std(ck_w),
+        'lm_volatility': log_return_std(lm_w),
+        'roi_volatility': roi_vol,
+        'score': score,
+    }
+
+
+def _num(value):
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+
+def build_rows(card_ids, metrics, window, min_roi, computed_at):
+    has = metrics['days_with_data'] > 0
+    order = np.flatnonzero(has)
+    order = order[np.argsort(-metrics['score'][order], kind='stable')]
+    rows = []
+    for rank, i in enumerate(order, 1):
+        rows.append({
+            'card_id': int(card_ids[i]),
+            'window_days': window,
+            'days_with_data': int(metrics['days_with_data'][i]),
+            'current_roi': _num(metrics['current_roi'][i]),
+            'roi_7d': _num(metrics['roi_7d'][i]),
+            'roi_window': _num(metrics['roi_window'][i]),
+            'best_roi_7d': _num(metrics['best_roi_7d'][i]),
+            'min_roi': min_roi,
+            'persistence': _num(metrics['persistence'][i]),
+            'longest_run': int(metrics['longest_run'][i]),
+            'current_run': int(metrics['current_run'][i]),
+            'ck_volatility': _num(metrics['ck_volatility'][i]),
+            'lm_volatility': _num(metrics['lm_volatility'][i]),
+            'roi_volatility': _num(metrics['roi_volatility'][i]),
+            'score': _num(metrics['score'][i]),
+            'rank': rank,
+            'computed_at': computed_at,
+        })
+    return rows
+
+
+def write_results(client, rows, computed_at):
+    """Upsert this run, then drop cards left over from previous runs"""
+    for i in range(0, len(rows), BATCH_SIZE):
+        client.table('spread_backtest').upsert(rows[i:i + BATCH_SIZE], on_conflict='card_id').execute()
+    client.table('spread_backtest').delete().lt('computed_at', computed_at).execute()
+
+
+def synthetic(cards, days, seed=7):
+    """Random-walk CK/LM prices with LM scraped about every third day"""
+    rng = np.random.default_rng(seed)
+    base = rng.lognormal(1.5, 1.0, cards)
+    ck = base * np.exp(np.cumsum(rng.normal(0, 0.02, (days, cards)), axis=0)) * DEFAULT_USD_BRL
+    lm = base * rng.uniform(3.5, 6.5, cards) * np.exp(np.cumsum(rng.normal(0, 0.03, (days, cards)), axis=0))
+    ck[rng.random((days, cards)) < 0.05] = np.nan
+    lm[rng.random((days, cards)) < 0.66] = np.nan
+    return ck, lm
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    parser = argparse.ArgumentParser(description='CK vs LigaMagic spread backtest')
+    parser.add_argument('--days', type=int, default=90, help='history loaded')
+    parser.add_argument('--window', type=int, default=30, help='days the metrics cover')
+    parser.add_argument('--min-roi', type=float, default=MIN_ROI)
+    parser.add_argument('--dry-run', action='store_true', help='compute only, do not write')
+    parser.add_argument('--synthetic', type=int, metavar='CARDS', help='time the math on random data')
+    args = parser.parse_args()
+    window = min(args.window, args.days)
+
+    if args.synthetic:
+        ck, lm = synthetic(args.synthetic, args.days)
+        start = time.perf_counter()
+        metrics = compute_metrics(ck, forward_fill(lm, LM_MAX_STALE_DAYS), window, args.min_roi)
+        elapsed = time.perf_counter() - start
+        print(f"{args.synthetic} cards x {args.days} days: {elapsed:.2f}s "
+              f"| {int((metrics['persistence'] > 0.5).sum())} cards above {args.min_roi:.0%} on most days")
+        return
+
+    client = get_client()
+    end = date.today()
+    start_day = end - timedelta(days=args.days - 1)
+    t = time.perf_counter()
+    ck_rows, lm_rows = load_series(client, start_day, end)
+    print(f"Loaded {len(ck_rows)} CK / {len(lm_rows)} LM rows in {time.perf_counter() - t:.1f}s")
+
+    card_ids = np.array(sorted({r['card_id'] for r in lm_rows}), dtype=np.int64)
+    card_index = {int(c): i for i, c in enumerate(card_ids)}
+    t = time.perf_counter()
+    # CK revenue in BRL without the fixed cost baked into price_brl (cost side adds it)
+    ck = to_matrix(ck_rows, card_index, start_day, args.days,
+                   lambda r: (r['price_raw'] or np.nan) * (r['fx_rate_to_brl'] or np.nan))
+    lm = forward_fill(to_matrix(lm_rows, card_index, start_day, args.days,
+                                lambda r: r['price_brl'] if r['price_brl'] is not None else np.nan),
+                      LM_MAX_STALE_DAYS)
+    metrics = compute_metrics(ck, lm, window, args.min_roi)
+    print(f"Computed {len(card_ids)} cards x {args.days} days in {time.perf_counter() - t:.2f}s")
+
+    computed_at = datetime.now(timezone.utc).isoformat()
+    rows = build_rows(card_ids, metrics, window, args.min_roi, computed_at)
+    if args.dry_run:
+        for r in rows[:10]:
+            print(r)
+        return
+    write_results(client, rows, computed_at)
+    print(f"Wrote {len(rows)} rows to spread_backtest")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+import httpx
+from supabase import create_client
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
+SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
+POOL_SIZE = int(os.getenv('SUPABASE_POOL_SIZE', 10))
+KEEPALIVE_SECONDS = float(os.getenv('SUPABASE_KEEPALIVE', 120))
+TIMEOUT_SECONDS = float(os.getenv('SUPABASE_TIMEOUT', 60))
+HTTP2 = os.getenv('SUPABASE_HTTP2', 'true').lower() == 'true'
+PAGE_SIZE = 1000  # PostgREST max rows per request
+
+try:
+    import h2  # noqa: F401  (httpx only speaks HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client = None
+_lock = threading.Lock()
+
+
+def _pooled_session(original):
+    """httpx.Client with our pool settings, carrying over PostgREST's base_url/headers"""
+    session = httpx.Client(
+        base_url=original.base_url,
+        headers=original.headers,
+        http2=HTTP2 and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=POOL_SIZE,
+            max_keepalive_connections=POOL_SIZE,
+            keepalive_expiry=KEEPALIVE_SECONDS,
+        ),
+        timeout=TIMEOUT_SECONDS,
+    )
+    original.close()
+    return session
+
+
+def get_client():
+    """Process-wide Supabase client backed by one long-lived connection pool.
+
+    Created lazily on first use and never recreated: keep-alive connections
+    and TLS sessions survive for the whole run. Safe to share across threads.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                client = create_client(SUPABASE_URL, SUPABASE_KEY)
+                postgrest = client.postgrest
+                postgrest.session = _pooled_session(postgrest.session)
+                _client = client
+    return _client
+
+
+def health_check(client=None):
+    """Cheap round-trip on the pooled connection. Returns (ok, latency_ms, error)"""
+    client = client or get_client()
+    start = time.perf_counter()
+    try:
+        client.table('cards').select('id').limit(1).execute()
+        return True, (time.perf_counter() - start) * 1000, None
+    except Exception as e:
+        return False, (time.perf_counter() - start) * 1000, str(e)
+
+
+def is_schema_cache_error(error):
+    text = str(error)
+    return 'PGRST204' in text or 'schema cache' in text
+
+
+def reload_schema_cache(client=None):
+    """Ask PostgREST to reload its schema cache (see reload_schema_cache.sql).
+
+    Replaces the old "recreate the client" workaround for PGRST204: the
+    stale cache lives on the server, not in our connections.
+    """
+    client = client or get_client()
+    try:
+        client.rpc('reload_schema_cache', {}).execute()
+        return True
+    except Exception as e:
+        print(f"Schema cache reload failed: {e}")
+        return False
+
+
+def fetch_all(client, table, columns, key='id'):
+    """Read every row of a table/view, keyset-paged on `key`.
+
+    Unordered .range() pages can skip or repeat rows; `key` must be unique,
+    or the caller must only need its distinct values.
+    """
+    names = [c.strip() for c in columns.split(',')]
+    select = columns if key in names else f"{columns}, {key}"
+    rows = []
+    last = None
+    while True:
+        query = client.table(table).select(select).order(key).limit(PAGE_SIZE)
+        if last is not None:
+            query = query.gt(key, last)
+        page = query.execute().data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        last = page[-1][key]
+
+
+if __name__ == '__main__':
+    ok, latency, error = health_check()
+    print(f"HTTP/2: {HTTP2 and HTTP2_AVAILABLE} | Pool: {POOL_SIZE} | Keep-alive: {KEEPALIVE_SECONDS}s")
+    print(f"Health: {'OK' if ok else 'FAIL'} ({latency:.0f} ms){'' if ok else ' - ' + error}")
+    ok, latency, _ = health_check()
+    print(f"Warm:   {'OK' if ok else 'FAIL'} ({latency:.0f} ms)")
@@ -1,15 +1,11 @@
-import os
-from supabase import create_client
 from dotenv import load_dotenv
+from supabase_client import get_client, SUPABASE_URL
 import time
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
-
 print(f"Connecting to {SUPABASE_URL}")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = get_client()
 
 try:
     # 1. Select a card
@@ -1,17 +1,14 @@
 import os
 import sys
 from datetime import datetime
-from supabase import create_client
 from dotenv import load_dotenv
+from supabase_client import get_client
 
 sys.stdout.reconfigure(line_buffering=True)
 load_dotenv()
 
-SUPABASE_URL = os.getenv('VITE_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('VITE_SUPABASE_ANON_KEY')
-
 print("Conectando ao Supabase...")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = get_client()
 
 print("Buscando preços mais recentes de cada carta...\n")
 
@@ -48,6 +48,11 @@ interface PriceHistory {
     source: string;
 }
 
+// Keep in sync with DAILY_MAX_DAYS / WEEKLY_MAX_DAYS in scripts/price_rollups.py
+const DAILY_MAX_DAYS = 120;
+const WEEKLY_MAX_DAYS = 730;
+const DAY_MS = 24 * 60 * 60 * 1000;
+
 interface CardPrint {
     id: number;
     set_code: string;
@@ -75,6 +80,7 @@ export const CardDetails: React.FC = () => {
         if (id) {
             fetchCardDetails();
             fetchPriceHistory();
+            recordView();
         }
     }, [id]);
 
@@ -102,6 +108,14 @@ export const CardDetails: React.FC = () => {
         }
     };
 
+    // Recently viewed cards are imported first by the daily price job (card_views)
+    const recordView = async () => {
+        const { data: { session } } = await supabase.auth.getSession();
+        if (!session) return;
+        const { error } = await supabase.from('card_views').insert({ card_id: Number(id) });
+        if (error) console.error('Error recording card view:', error);
+    };
+
     const fetchScryfallData = async (language: string) => {
         if (!card) return;
         try {
@@ -122,14 +136,51 @@ export const CardDetails: React.FC = () => {
 
     const fetchPriceHistory = async () => {
         try {
-            const { data, error } = await supabase
-                .from('price_history')
-                .select('scraped_at, price_brl, source')
+            // Recent days come raw from price_history; older ones from the weekly/monthly
+            // rollups (same cutoffs as scripts/price_rollups.py pick_granularity)
+            const { data: oldest } = await supabase
+                .from('price_history_weekly')
+                .select('bucket_start')
                 .eq('card_id', id)
-                .order('scraped_at', { ascending: true });
-
-            if (error) throw error;
-            setHistory(data || []);
+                .order('bucket_start', { ascending: true })
+                .limit(1);
+
+            const recentSince = new Date(Date.now() - DAILY_MAX_DAYS * DAY_MS);
+            const spanDays = oldest?.length
+                ? (Date.now() - new Date(oldest[0].bucket_start).getTime()) / DAY_MS
+                : 0;
+            const monthly = spanDays > WEEKLY_MAX_DAYS;
+            // Raw rows start where the first rollup bucket left out begins
+            const boundary = monthly
+                ? new Date(Date.UTC(recentSince.getUTCFullYear(), recentSince.getUTCMonth(), 1))
+                : new Date(recentSince.getTime() - ((recentSince.getUTCDay() + 6) % 7) * DAY_MS);
+            const boundaryDate = boundary.toISOString().slice(0, 10);
+
+            const [raw, rollup] = await Promise.all([
+                supabase
+                    .from('price_history')
+                    .select('scraped_at, price_brl, source')
+                    .eq('card_id', id)
+                    .gte('scraped_at', boundaryDate)
+                    .order('scraped_at', { ascending: true }),
+                spanDays > DAILY_MAX_DAYS
+                    ? supabase
+                        .from(monthly ? 'price_history_monthly' : 'price_history_weekly')
+                        .select('bucket_start, close_brl, source')
+                        .eq('card_id', id)
+                        .lt('bucket_start', boundaryDate)
+                        .order('bucket_start', { ascending: true })
+                    : Promise.resolve({ data: [], error: null })
+            ]);
+
+            if (raw.error) throw raw.error;
+            if (rollup.error) throw rollup.error;
+            const older: PriceHistory[] = (rollup.data || []).map((r: any) => ({
+                scraped_at: r.bucket_start,
+                price_brl: r.close_brl,
+                source: r.source
+            }));
+            setHistory([...older, ...(raw.data || [])]);
         } catch (err) {
             console.error('Error fetching price history:', err);
         }
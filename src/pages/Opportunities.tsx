@@ -103,15 +103,14 @@ export const Opportunities: React.FC = () => {
     const fetchGlobalData = async () => {
         setLoading(true);
         try {
-            // Fetching a limit of items for now to avoid freezing browser.
-            // Ideally this should be a view sorted by potential profit, but we can't easily sort by calculated ROI in standard SQL view without a function.
-            // We'll fetch cards that have both prices.
+            // Precomputed + ranked by ROI after each import (scripts/build_opportunities.py).
             const { data, error } = await supabase
-                .from('all_opportunities_view')
+                .from('opportunities')
                 .select('*')
                 .gt('lm_sell_brl', 0)
                 .gt('ck_buylist_usd', 0)
-                .limit(1000); // Analyze top 1000 candidates with prices
+                .order('rank', { ascending: true })
+                .limit(1000); // Top 1000 by ROI
 
             if (error) throw error;
             setGlobalCards(data || []);
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('dotenv')
+pytest.importorskip('supabase')
+
+from build_opportunities import FIXED_COST_BRL, build_rows, compute_opportunities, load_price_arrays
+
+
+class FakeClient:
+    """fetch_all-compatible: table(...).select(...).gt(...).order(...).limit(...).execute().data"""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return _Query(self.tables[name])
+
+
+class _Query:
+    def __init__(self, rows):
+        self.rows = rows
+        self.data = None
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def gt(self, key, value):
+        self.rows = [r for r in self.rows if str(r[key]) > str(value)]
+        return self
+
+    def order(self, key, **kwargs):
+        self.rows = sorted(self.rows, key=lambda r: str(r[key]))
+        return self
+
+    def limit(self, n):
+        self.rows = self.rows[:n]
+        return self
+
+    def execute(self):
+        self.data = self.rows
+        return self
+
+
+def arrays(ck, lm, tcg=None, cm=None):
+    n = len(ck)
+    nan = [np.nan] * n
+    return {
+        'ck_usd': np.array(ck, dtype=float),
+        'lm_brl': np.array(lm, dtype=float),
+        'tcg_usd': np.array(tcg or nan, dtype=float),
+        'cm_eur': np.array(cm or nan, dtype=float),
+    }
+
+
+def test_roi_and_ranking():
+    a = arrays(ck=[10, 2, 5, np.nan], lm=[20, 20, 5, 1])
+    order, metrics = compute_opportunities(a, usd_brl=5.0, eur_brl=6.0, top_n=10)
+    cost = np.array([20, 20, 5, 1]) + FIXED_COST_BRL
+    np.testing.assert_allclose(metrics['roi'][:3], ((np.array([50, 10, 25]) - cost[:3]) / cost[:3]))
+    assert list(order) == [2, 0, 1]
+
+
+def test_top_n_keeps_the_best():
+    rng = np.random.default_rng(0)
+    a = arrays(ck=rng.uniform(1, 10, 1000), lm=rng.uniform(1, 50, 1000))
+    order, metrics = compute_opportunities(a, 5.0, 6.0, top_n=25)
+    best = np.argsort(-metrics['roi'], kind='stable')[:25]
+    assert list(order) == list(best)
+
+
+def test_ratios_skip_missing_prices():
+    a = arrays(ck=[10, 10], lm=[20, 20], tcg=[20, 0], cm=[10, np.nan])
+    _, metrics = compute_opportunities(a, 5.0, 6.0)
+    assert metrics['ck_tcg_ratio'][0] == pytest.approx(0.5)
+    assert np.isnan(metrics['ck_tcg_ratio'][1])
+    assert metrics['ck_cardmarket_ratio'][0] == pytest.approx(50 / 60)
+    assert np.isnan(metrics['ck_cardmarket_ratio'][1])
+
+
+def test_prices_follow_the_row_finish():
+    uuid = '00000000-0000-4000-8000-000000000001'
+    cards = [{'id': 1, 'mtgjson_uuid': uuid, 'is_foil': False, 'lm_sell_brl': 10},
+             {'id': 2, 'mtgjson_uuid': uuid, 'is_foil': True, 'lm_sell_brl': 30},
+             {'id': 3, 'mtgjson_uuid': 'missing', 'is_foil': False, 'lm_sell_brl': 5}]
+    prices = [{'mtgjson_uuid': uuid, 'ck_buylist_usd': 1.0, 'ck_buylist_foil_usd': 4.0,
+               'tcgplayer_market_usd': 2.0, 'tcgplayer_market_foil_usd': 8.0,
+               'cardmarket_avg_eur': 1.5, 'cardmarket_avg_foil_eur': None, 'updated_at': None}]
+    a = load_price_arrays(FakeClient({'all_cards': cards, 'card_prices': prices}))
+    np.testing.assert_array_equal(a['ck_usd'], [1.0, 4.0, np.nan])
+    np.testing.assert_array_equal(a['tcg_usd'], [2.0, 8.0, np.nan])
+    np.testing.assert_array_equal(a['cm_eur'], [1.5, np.nan, np.nan])
+
+    order, metrics = compute_opportunities(a, 5.0, 6.0)
+    rows = build_rows(a, order, metrics, 5.0, 6.0, 'now')
+    assert [r['id'] for r in rows] == [1, 2] or [r['id'] for r in rows] == [2, 1]
+    foil = next(r for r in rows if r['id'] == 2)
+    assert foil['ck_tcg_ratio'] == pytest.approx(0.5)
+    assert foil['cardmarket_avg_eur'] is None
@@ -0,0 +1,58 @@
+from card_matcher import CardIndex, name_keys, normalize_collector_number, normalize_name
+from edition_scheduler import match_edition
+from ligamagic import CardInfo
+
+
+def row(card_id, name, number, set_code='TLE', is_foil=False):
+    return {'id': card_id, 'name': name, 'set_code': set_code, 'collector_number': number, 'is_foil': is_foil}
+
+
+def test_normalize_name_folds_case_accents_and_punctuation():
+    assert normalize_name('Æther Vial') == 'aether vial'
+    assert normalize_name("Urza's  Saga") == 'urzas saga'
+    assert normalize_name('Fire//Ice') == 'fire // ice'
+    assert normalize_name('Jötun Grunt') == 'jotun grunt'
+
+
+def test_name_keys_include_each_face():
+    assert name_keys('Fire // Ice') == {'fire // ice', 'fire', 'ice'}
+
+
+def test_normalize_collector_number():
+    assert normalize_collector_number('007') == '7'
+    assert normalize_collector_number('0') == '0'
+    assert normalize_collector_number(None) is None
+
+
+def test_exact_match_treats_foil_rows_as_one_printing():
+    index = CardIndex([row(1, 'Sol Ring', '1'), row(2, 'Sol Ring', '1', is_foil=True)])
+    result = index.match('sol ring')
+    assert result.status == 'exact'
+    assert {c.id for c in result.cards} == {1, 2}
+
+
+def test_set_and_number_narrow_reprints():
+    index = CardIndex([row(1, 'Island', '3'), row(2, 'Island', '4'), row(3, 'Island', '250', set_code='M21')])
+    assert index.match('Island').status == 'ambiguous'
+    assert index.match('Island', set_code='m21').card.id == 3
+    assert index.match('Island', set_code='TLE', collector_number='004').card.id == 2
+    assert index.match('Island', set_code='XXX').status == 'none'
+
+
+def test_fuzzy_match_and_no_match():
+    index = CardIndex([row(1, 'Counterspell', '5'), row(2, 'Lightning Bolt', '6')])
+    result = index.match('Counterspel')
+    assert result.status == 'fuzzy'
+    assert result.card.id == 1
+    assert index.match('Zzzz qqq').status == 'none'
+
+
+def test_match_edition_skips_ambiguous_unmatched_and_shared_cards():
+    rows = [row(1, 'Sol Ring', '1'), row(2, 'Fire // Ice', '2'), row(3, 'Island', '3'),
+            row(4, 'Island', '4'), row(5, 'Counterspell', '5')]
+    cards = [CardInfo('Sol Ring', 10.0), CardInfo('Fire', 3.0), CardInfo('Island', 1.0),
+             CardInfo('Counterspell', 2.0), CardInfo('Counterspell', 5.0), CardInfo('Zzzz qqq', 1.0),
+             CardInfo('Sol Ring', 0.0)]
+    prices, skipped = match_edition(cards, rows)
+    assert prices == {1: 10.0, 2: 3.0}
+    assert skipped == {'none': 1, 'ambiguous': 1, 'duplicate': 2}
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import edition_scheduler as es
+from edition_scheduler import EditionScheduler, change_fraction, ewma, price_map, set_code_of
+from ligamagic import CardInfo
+
+NOW = datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    return EditionScheduler(str(tmp_path / 'editions.json'))
+
+
+def url(code):
+    return f"https://www.ligamagic.com.br/?view=cards/search&card=edid=1%20ed={code}"
+
+
+def test_set_code_and_price_map():
+    assert set_code_of(url('TLE')) == 'tle'
+    assert set_code_of('https://example.com/') is None
+    cards = [CardInfo('Island', 1.0), CardInfo('Island', 2.0), CardInfo('Sol Ring', 5.0)]
+    assert price_map(cards) == {'Island': 1.0, 'Island#2': 2.0, 'Sol Ring': 5.0}
+
+
+def test_change_fraction_and_ewma():
+    assert change_fraction({}, {'a': 1.0}) is None
+    old = {'a': 10.0, 'b': 10.0, 'c': 10.0, 'd': 10.0}
+    new = {'a': 10.1, 'b': 12.0, 'c': 10.0, 'e': 1.0}
+    # b moved past the threshold, d left, e arrived; a's 1% is noise
+    assert change_fraction(old, new) == pytest.approx(3 / 5)
+    assert ewma(None, 0.4) == 0.4
+    assert ewma(0.2, 0.4) == pytest.approx(es.RATE_ALPHA * 0.4 + (1 - es.RATE_ALPHA) * 0.2)
+
+
+def test_interval_follows_rate_and_tracked_cards(scheduler):
+    low, high = timedelta(hours=es.MIN_INTERVAL_HOURS), timedelta(days=es.MAX_INTERVAL_DAYS)
+    assert scheduler.interval({}) == high
+    assert scheduler.interval({'change_rate': 10.0}) == low
+    rate = es.TARGET_CHANGE / 4  # ~4 days until 5% of the cards moved
+    assert scheduler.interval({'change_rate': rate}) == timedelta(days=4)
+    tracked = {'change_rate': rate, 'tracked': es.TRACKED_WEIGHT}
+    assert scheduler.interval(tracked) == timedelta(days=2)
+
+
+def test_plan_orders_by_priority_within_budget(scheduler):
+    for code in ('new', 'late', 'slow', 'later', 'future'):
+        scheduler.add(url(code))
+    eds = {ed['set_code']: ed for ed in scheduler.editions.values()}
+    eds['late'].update(next_due=(NOW - timedelta(days=1)).isoformat(), change_rate=es.TARGET_CHANGE, seconds=10)
+    eds['later'].update(next_due=(NOW - timedelta(days=1)).isoformat(), change_rate=es.TARGET_CHANGE,
+                        seconds=10, tracked=es.TRACKED_WEIGHT)
+    eds['slow'].update(next_due=(NOW - timedelta(days=1)).isoformat(), mode='browser')
+    eds['future'].update(next_due=(NOW + timedelta(days=1)).isoformat())
+
+    plan = [scheduler.editions[u]['set_code'] for u in scheduler.plan(budget_seconds=25, now=NOW)]
+    # new first, then the tracked one; the browser edition (30 s) no longer fits
+    assert plan == ['new', 'later', 'late']
+    assert [scheduler.editions[u]['set_code'] for u in scheduler.plan(0, NOW)] == ['new']
+
+
+def test_record_updates_rate_cost_and_backoff(scheduler):
+    scheduler.add(url('tle'))
+    u = url('tle')
+    scheduler.record(u, 'TLE', [CardInfo('a', 1.0), CardInfo('b', 1.0)], 'http', 2.0, NOW)
+    ed = scheduler.editions[u]
+    assert 'change_rate' not in ed and ed['seconds'] == 2.0
+
+    later = NOW + timedelta(days=2)
+    scheduler.record(u, 'TLE', [CardInfo('a', 2.0), CardInfo('b', 1.0)], 'http', 4.0, later)
+    assert ed['change_rate'] == pytest.approx(0.5 / 2)
+    assert ed['seconds'] == pytest.approx(ewma(2.0, 4.0))
+    assert datetime.fromisoformat(ed['next_due']) == later + scheduler.interval(ed)
+
+    scheduler.record(u, 'TLE', [], 'failed', 0, later)
+    scheduler.record(u, 'TLE', [], 'failed', 0, later)
+    assert ed['failures'] == 2
+    assert datetime.fromisoformat(ed['next_due']) == later + timedelta(hours=2 * es.MIN_INTERVAL_HOURS)
+
+
+def test_state_round_trips(scheduler):
+    scheduler.add(url('tle'))
+    scheduler.save()
+    assert EditionScheduler(scheduler.path).editions == scheduler.editions
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from import_shards import Shard, canonical_uuid, checkpoint_path, parse_shard, shard_of, verify
+
+UUIDS = [f"{i:08x}-0000-4000-8000-{i:012x}" for i in range(200)]
+
+
+def test_shard_of_ignores_uuid_form_and_is_stable():
+    uuid = UUIDS[7]
+    assert shard_of(uuid, 4) == shard_of(uuid.replace('-', '').upper(), 4)
+    assert [shard_of(u, 4) for u in UUIDS] == [shard_of(u, 4) for u in UUIDS]
+    assert {shard_of(u, 4) for u in UUIDS} == {0, 1, 2, 3}
+
+
+def test_canonical_uuid_rejects_bad_length():
+    with pytest.raises(ValueError):
+        canonical_uuid('abc')
+
+
+def test_parse_shard():
+    assert parse_shard('2/4') == (2, 4)
+    for bad in ('0/4', '5/4', 'x'):
+        with pytest.raises(Exception):
+            parse_shard(bad)
+
+
+def run_shards(tmp_path, count, stats=None):
+    data = {u: {} for u in UUIDS}
+    for index in range(1, count + 1):
+        shard = Shard(index, count, directory=str(tmp_path))
+        todo = shard.select(data)
+        shard.save(len(todo), dict(stats or {'rows': len(todo)}))
+    return data
+
+
+def test_shards_partition_the_file_and_verify(tmp_path):
+    data = {u: {} for u in UUIDS}
+    seen = []
+    for index in range(1, 4):
+        seen += Shard(index, 3, directory=str(tmp_path), persist=False).select(data)
+    assert sorted(seen) == sorted(UUIDS)
+
+    run_shards(tmp_path, 3)
+    problems, checkpoints = verify(3, str(tmp_path))
+    assert problems == []
+    assert sum(cp['stats']['rows'] for cp in checkpoints) == len(UUIDS)
+
+
+def test_resume_skips_saved_cards(tmp_path):
+    data = {u: {} for u in UUIDS}
+    shard = Shard(1, 2, directory=str(tmp_path))
+    todo = shard.select(data)
+    shard.save(10, {'rows': 10})
+    resumed = Shard(1, 2, directory=str(tmp_path))
+    assert resumed.select(data) == todo[10:]
+    resumed.save(len(todo) - 10, {'rows': 5})
+    assert resumed.state['complete']
+    assert resumed.state['stats']['rows'] == 15
+
+
+def test_verify_blocks_missing_incomplete_and_lost_rows(tmp_path):
+    assert verify(2, str(tmp_path))[0]
+
+    run_shards(tmp_path, 2, {'rows': 1, 'failed_rows': 0, 'quarantined': 0, 'errors': 3})
+    problems, _ = verify(2, str(tmp_path))
+    assert any('skipped by errors' in p for p in problems)
+
+    run_shards(tmp_path, 2, {'rows': 1, 'quarantined': 2})
+    problems, _ = verify(2, str(tmp_path))
+    assert any('quarantined' in p for p in problems)
+
+    path = checkpoint_path(1, 2, str(tmp_path))
+    with open(path, encoding='utf-8') as f:
+        cp = json.load(f)
+    cp.update(done=0, complete=False, stats={})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(cp, f)
+    problems, _ = verify(2, str(tmp_path))
+    assert any('incomplete' in p for p in problems)
@@ -0,0 +1,22 @@
+from price_alerts import AlertTracker
+
+# price_sink.PRICE_COLUMNS, without importing the Supabase client
+PRICE_COLUMNS = ('card_id', 'source', 'price_type', 'price_raw', 'currency',
+                 'fx_rate_to_brl', 'price_brl', 'scraped_at')
+
+
+def point(card_id, price, source='CardKingdom', price_type='buy'):
+    return (card_id, source, price_type, price, 'USD', 5.0, price * 5, '2026-01-01')
+
+
+def test_only_changed_buylist_prices_are_tracked():
+    alerts = AlertTracker(previous={1: 2.0, 2: 3.0})
+    alerts.track([point(1, 2.0), point(2, 3.5), point(3, 1.0), point(4, 9.0, price_type='sell'),
+                  point(5, 9.0, source='LigaMagic')], PRICE_COLUMNS)
+    assert alerts.card_ids == {2, 3}
+
+
+def test_dict_rows():
+    alerts = AlertTracker()
+    alerts.track([dict(zip(PRICE_COLUMNS, point(7, 1.0)))])
+    assert len(alerts) == 1
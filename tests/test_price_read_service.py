@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from price_read_service import LRUCache, PriceReadService
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = LRUCache(max_bytes=10)
+    cache.get_or_load('a', 1, lambda: b'aaaa')
+    cache.get_or_load('b', 2, lambda: b'bbbb')
+    cache.get_or_load('a', 1, lambda: b'never')  # hit: 'a' becomes most recent
+    cache.get_or_load('c', 3, lambda: b'cccc')
+    assert list(cache.entries) == ['a', 'c']
+    assert cache.bytes == 8
+    assert cache.stats['hits'] == 1 and cache.stats['evictions'] == 1
+
+
+def test_oversized_body_is_served_but_not_kept():
+    cache = LRUCache(max_bytes=3)
+    assert cache.get_or_load('k', 1, lambda: b'too long') == b'too long'
+    assert not cache.entries
+
+
+def test_ttl_expires_entries(monkeypatch):
+    cache = LRUCache(max_bytes=100, ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache.get_or_load('k', 1, lambda: b'old')
+    now[0] += 11
+    assert cache.get_or_load('k', 1, lambda: b'new') == b'new'
+
+
+def test_invalidate_drops_every_key_of_the_card():
+    cache = LRUCache(max_bytes=100)
+    cache.get_or_load(('series', 1), 1, lambda: b'x')
+    cache.get_or_load(('summary', 1), 1, lambda: b'y')
+    cache.get_or_load(('summary', 2), 2, lambda: b'z')
+    assert cache.invalidate([1]) == 2
+    assert list(cache.entries) == [('summary', 2)]
+    assert 1 not in cache.by_card
+
+
+def test_concurrent_misses_share_one_load():
+    cache = LRUCache(max_bytes=100)
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return b'body'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', 1, loader)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    while cache.stats['misses'] < 5:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == [b'body'] * 5
+    assert len(calls) == 1 and cache.stats['coalesced'] == 4
+
+
+def test_load_errors_reach_every_waiter_and_are_not_cached():
+    cache = LRUCache(max_bytes=100)
+    with pytest.raises(RuntimeError):
+        cache.get_or_load('k', 1, lambda: (_ for _ in ()).throw(RuntimeError('db down')))
+    assert cache.get_or_load('k', 1, lambda: b'ok') == b'ok'
+
+
+def test_invalidated_while_loading_is_not_stored():
+    cache = LRUCache(max_bytes=100)
+
+    def loader():
+        cache.invalidate([1])  # an import lands mid-query
+        return b'stale'
+
+    assert cache.get_or_load('k', 1, loader) == b'stale'
+    assert not cache.entries
+
+
+def test_service_caches_per_range():
+    class Backend:
+        calls = 0
+
+        def series(self, card_id, start, end, granularity=None):
+            Backend.calls += 1
+            return {'card_id': card_id, 'start': start, 'end': end}
+
+    service = PriceReadService(Backend(), max_bytes=10_000)
+    first = service.series(1, '2026-01-01', '2026-02-01')
+    assert service.series(1, '2026-01-01', '2026-02-01') == first
+    service.series(1, '2025-01-01', '2026-02-01')
+    assert Backend.calls == 2
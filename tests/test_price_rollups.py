@@ -0,0 +1,54 @@
+from datetime import date
+
+from price_rollups import RollupTracker, pick_granularity, row_fields, week_start
+
+
+def test_pick_granularity_by_range_length():
+    assert pick_granularity('2026-01-01', '2026-04-30') == 'day'
+    assert pick_granularity('2026-01-01', '2026-05-02') == 'week'
+    assert pick_granularity(date(2024, 1, 1), date(2025, 12, 31)) == 'week'
+    assert pick_granularity('2020-01-01', '2026-01-01T10:00:00+00:00') == 'month'
+
+
+def test_week_start_is_monday():
+    assert week_start(date(2026, 10, 18)) == date(2026, 10, 12)
+    assert week_start(date(2026, 10, 12)) == date(2026, 10, 12)
+
+
+def test_row_fields_reads_dicts_and_tuples():
+    columns = ('card_id', 'source', 'scraped_at')
+    assert list(row_fields([(1, 'CK', 'd')], columns, 'card_id', 'scraped_at')) == [(1, 'd')]
+    assert list(row_fields([{'card_id': 1}], None, 'card_id')) == [1]
+
+
+def test_tracker_collects_week_and_month_buckets():
+    tracker = RollupTracker()
+    tracker.track([{'card_id': 1, 'scraped_at': '2026-10-01T00:00:00+00:00'},
+                   {'card_id': 1, 'scraped_at': '2026-10-02'},
+                   {'card_id': 2, 'scraped_at': '2026-09-30'}])
+    assert tracker.weeks == {(1, '2026-09-28'), (2, '2026-09-28')}
+    assert tracker.months == {(1, '2026-10-01'), (2, '2026-09-01')}
+
+
+def test_refresh_keeps_pairs_pending_after_an_error():
+    class Client:
+        calls = 0
+
+        def rpc(self, name, params):
+            Client.calls += 1
+            if params['p_granularity'] == 'month':
+                raise RuntimeError('timeout')
+            return self
+
+        def execute(self):
+            class Res:
+                data = 3
+            return Res()
+
+    tracker = RollupTracker()
+    tracker.track([{'card_id': 1, 'scraped_at': '2026-10-01'}])
+    try:
+        tracker.refresh(Client())
+    except RuntimeError:
+        pass
+    assert not tracker.weeks and tracker.months == {(1, '2026-10-01')}
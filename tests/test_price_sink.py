@@ -0,0 +1,158 @@
+import json
+
+import pytest
+
+pytest.importorskip('httpx')
+pytest.importorskip('dotenv')
+pytest.importorskip('supabase')
+
+import price_sink
+from price_sink import FileSink, PriceSink, SinkError, read_chunk
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+class FakeSession:
+    """Rejects any batch holding a card_id in `bad` (400); `gzip_status` answers gzip bodies"""
+
+    def __init__(self, bad=(), gzip_status=None, statuses=()):
+        self.bad = set(bad)
+        self.gzip_status = gzip_status
+        self.statuses = list(statuses)  # forced answers for the first requests
+        self.posts = []
+        self.written = []
+
+    def post(self, path, params=None, content=b'', headers=None):
+        compressed = headers.get('Content-Encoding') == 'gzip'
+        self.posts.append(compressed)
+        if self.statuses:
+            return FakeResponse(self.statuses.pop(0), 'forced')
+        if compressed and self.gzip_status:
+            return FakeResponse(self.gzip_status, 'no gzip')
+        body = price_sink.gzip.decompress(content) if compressed else content
+        rows = json.loads(body)
+        if any(r['card_id'] in self.bad for r in rows):
+            return FakeResponse(400, 'bad row')
+        self.written.extend(rows)
+        return FakeResponse(201)
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path):
+    holder = {}
+
+    class Client:
+        class postgrest:
+            pass
+
+    def get_client():
+        Client.postgrest.session = holder['session']
+        return Client
+
+    monkeypatch.setattr(price_sink, 'get_client', get_client)
+    monkeypatch.setattr(price_sink, 'QUARANTINE_DIR', str(tmp_path / 'quarantine'))
+    monkeypatch.setattr(price_sink.time, 'sleep', lambda s: None)
+
+    def make(**kwargs):
+        holder['session'] = FakeSession(**kwargs)
+        return holder['session']
+    return make
+
+
+def point(card_id, day='2026-01-01', price=1.0):
+    return (card_id, 'CardKingdom', 'buy', price, 'USD', 5.0, price * 5, day)
+
+
+def quarantined(sink):
+    with open(sink.quarantine_path, encoding='utf-8') as f:
+        return [json.loads(line)['row']['card_id'] for line in f]
+
+
+def test_bisection_quarantines_only_the_bad_rows(session):
+    fake = session(bad={3, 6})
+    written = []
+    sink = PriceSink(batch_size=8, compress='false', on_written=lambda rows, cols: written.extend(rows))
+    for card_id in range(1, 9):
+        sink.add_point(*point(card_id))
+    sink.close()
+    assert sorted(r['card_id'] for r in fake.written) == [1, 2, 4, 5, 7, 8]
+    assert sorted(quarantined(sink)) == [3, 6]
+    assert sink.stats['rows'] == 6 and sink.stats['failed_rows'] == 2
+    assert len(written) == 6
+
+
+def test_invalid_and_duplicate_rows_never_reach_the_server(session):
+    fake = session()
+    sink = PriceSink(compress='false')
+    sink.add_point(*point(1, price=1.0))
+    sink.add_point(*point(1, price=2.0))  # same conflict key: last one wins
+    sink.add_point(*point('x'))
+    sink.add_point(*point(2, price=float('nan')))
+    sink.close()
+    assert [(r['card_id'], r['price_raw']) for r in fake.written] == [(1, 2.0)]
+    assert sink.stats['duplicates'] == 1 and sink.stats['invalid'] == 2
+    assert sorted(map(str, quarantined(sink))) == ['2', 'x']
+
+
+def test_fatal_status_raises(session):
+    session(statuses=[401])
+    sink = PriceSink(compress='false')
+    sink.add_point(*point(1))
+    with pytest.raises(SinkError):
+        sink.close()
+
+
+def test_gzip_rejected_falls_back_for_the_run(session):
+    fake = session(gzip_status=415)
+    sink = PriceSink(batch_size=1, compress='auto')
+    sink.add_point(*point(1))
+    sink.add_point(*point(2))
+    sink.close()
+    assert fake.posts == [True, False, False]
+    assert not sink.gzip and sink.stats['rows'] == 2
+
+
+def test_uncompressed_resend_failure_is_retried(session):
+    # gzip 400, then the plain resend hits a 503: retried, not aborted or quarantined
+    fake = session(statuses=[400, 503])
+    sink = PriceSink(compress='auto')
+    sink.add_point(*point(1))
+    sink.close()
+    assert sink.stats['rows'] == 1 and sink.stats['retries'] == 1
+    assert sink.quarantine_path is None
+    assert [r['card_id'] for r in fake.written] == [1]
+
+
+def test_uncompressed_resend_data_error_is_quarantined(session):
+    fake = session(bad={2}, gzip_status=400)
+    sink = PriceSink(compress='auto')
+    sink.add_point(*point(1))
+    sink.add_point(*point(2))
+    sink.close()
+    assert [r['card_id'] for r in fake.written] == [1]
+    assert quarantined(sink) == [2]
+
+
+def test_file_sink_resume_keeps_checkpointed_chunks(tmp_path):
+    directory = str(tmp_path / 'export')
+    sink = FileSink(directory, chunk_rows=2, batch_size=2)
+    for card_id in range(1, 6):
+        sink.add_point(*point(card_id))
+    sink.checkpoint()  # chunks: [1,2] [3,4] [5]
+    sink.add_point(*point(6))
+    sink.add_point(*point(7))
+    sink.flush()  # chunk [6,7] written after the checkpoint
+
+    resumed = FileSink(directory, chunk_rows=2, batch_size=2, resume=True)
+    assert len(resumed.chunks) == 3
+    resumed.add_point(*point(6))
+    resumed.close()
+    rows = [r for c in resumed.chunks for r in read_chunk(f"{directory}/{c['file']}", resumed.columns)]
+    assert [r[0] for r in rows] == [1, 2, 3, 4, 5, 6]
+
+    fresh = FileSink(directory, chunk_rows=2)
+    assert fresh.chunks == []
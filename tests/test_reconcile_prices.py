@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip('dotenv')
+pytest.importorskip('supabase')
+
+from reconcile_prices import SOURCE, bucket_of, repair_rows, to_cents
+from price_constants import FIXED_COST_BRL
+
+
+def test_to_cents_rounds_half_away_from_zero():
+    assert to_cents(1.005) == 101
+    assert to_cents(0.125) == 13
+    assert to_cents(2) == 200
+
+
+def test_bucket_of_spreads_the_range():
+    buckets = [bucket_of(card_id, 10, 109, 4) for card_id in range(10, 110)]
+    assert buckets[0] == 0 and buckets[-1] == 3
+    assert buckets == sorted(buckets)
+    assert {b: buckets.count(b) for b in set(buckets)} == {0: 25, 1: 25, 2: 25, 3: 25}
+
+
+def test_repair_rows_keep_stored_fx_for_existing_rows():
+    class Reconciler:
+        missing = [(1, 'buy', '2026-01-01', 2.0)]
+        different = [(2, 'sell', '2026-01-02', 3.0, '5.1'), (3, 'buy', '2026-01-03', 1.0, None)]
+
+    rows = list(repair_rows(Reconciler, 5.5))
+    assert rows[0] == (1, SOURCE, 'buy', 2.0, 'USD', 5.5, 2.0 * 5.5 + FIXED_COST_BRL, '2026-01-01')
+    assert rows[1][5] == 5.1 and rows[1][6] == pytest.approx(3.0 * 5.1 + FIXED_COST_BRL)
+    assert rows[2][5] == 5.5